@@ -0,0 +1,131 @@
+import asyncio
+import builtins
+from collections.abc import Iterable
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask
+
+
+class AsyncTaskListExecutor:
+    """Alternative to TaskListExecutor that runs a fixed list of shell tasks
+    as asyncio subprocesses, within the calling process.
+
+    The stdout and stderr pipes are read line by line as the output arrives,
+    and passed to the text callback in the same "[idx] OUT/ERR ..." format,
+    followed by "[idx] SUCCESS" or "[idx] FAILURE". No worker processes or
+    output files are used; concurrency is bounded by a semaphore.
+
+    As with TaskListExecutor, the running tasks are stopped at the global
+    deadline, deadline_secs after run() starts, and tasks not started by then
+    are cancelled. cancel() may be called from any thread, or from the text
+    callback: it stops starting tasks, and terminates the running ones.
+    """
+    _tasks: list[ShellTask]
+    _max_in_flight: int
+    _self_is_running: bool
+    _succeeded: set[int]
+    _failed: set[int]
+    _cancelled: set[int]
+    _deadline_secs: Optional[float]
+    _deadline: Optional[float]
+    _cancel_event: threading.Event
+    _cancel_path: Optional[Path]
+    _text_callback: Callable[[str], None]
+
+    def __init__(
+        self,
+        tasks: Iterable[ShellTask],
+        max_in_flight: int,
+        text_callback: Optional[Callable[[str], None]] = None,
+        deadline_secs: Optional[float] = None,
+    ) -> None:
+        self._tasks = list(tasks)
+        assert all(isinstance(task, ShellTask) for task in self._tasks)
+        assert isinstance(max_in_flight, int) and max_in_flight >= 1
+        assert deadline_secs is None or deadline_secs > 0.0
+        self._max_in_flight = int(max_in_flight)
+        self._self_is_running = False
+        self._succeeded = set()
+        self._failed = set()
+        self._cancelled = set()
+        self._deadline_secs = deadline_secs
+        self._deadline = None
+        self._cancel_event = threading.Event()
+        self._cancel_path = None
+        self._text_callback = text_callback or self._text_callback_default
+
+    def run(self) -> None:
+        """Runs all tasks in a new event loop, and returns when all are done."""
+        asyncio.run(self.run_async())
+
+    async def run_async(self) -> None:
+        """Runs all tasks on the current event loop."""
+        if self._self_is_running:
+            raise Exception("Already running.")
+        self._self_is_running = True
+        if self._deadline_secs is not None:
+            self._deadline = time.time() + self._deadline_secs
+        try:
+            with tempfile.TemporaryDirectory() as cancel_dir:
+                self._cancel_path = Path(cancel_dir) / "cancel"
+                if self._cancel_event.is_set():
+                    self._cancel_path.touch()
+                semaphore = asyncio.Semaphore(self._max_in_flight)
+                await asyncio.gather(*(
+                    self._run_one(idx, semaphore) for idx in range(len(self._tasks))
+                ))
+        finally:
+            self._cancel_path = None
+            self._self_is_running = False
+
+    def cancel(self) -> None:
+        """Stops starting new tasks and terminates the running ones."""
+        self._cancel_event.set()
+        cancel_path = self._cancel_path
+        if cancel_path is None:
+            return
+        try:
+            cancel_path.touch()
+        except OSError:
+            ### Already finished.
+            pass
+
+    async def _run_one(self, idx: int, semaphore: asyncio.Semaphore) -> None:
+        task = self._tasks[idx]
+        text_callback = self._text_callback
+        async with semaphore:
+            if self._cancel_event.is_set():
+                self._cancel_not_started(idx, "cancel() called")
+                return
+            if self._deadline is not None and time.time() >= self._deadline:
+                self._cancel_not_started(idx, "deadline reached")
+                return
+            task.set_limits(self._deadline, self._cancel_path)
+            outcome = await task.run_async(
+                lambda line: text_callback(f"[{idx}] OUT {line}"),
+                lambda line: text_callback(f"[{idx}] ERR {line}"),
+            )
+        if isinstance(outcome, Exception):
+            text_callback(f"[{idx}] EXC {type(outcome).__name__}: {outcome}")
+        stop_reason = task.stats.stop_reason if task.stats is not None else None
+        if stop_reason == "cancelled":
+            self._cancelled.add(idx)
+            text_callback(f"[{idx}] CANCELLED")
+        elif outcome == 0:
+            self._succeeded.add(idx)
+            text_callback(f"[{idx}] SUCCESS")
+        else:
+            self._failed.add(idx)
+            suffix = f" ({stop_reason})" if stop_reason is not None else ""
+            text_callback(f"[{idx}] FAILURE{suffix}")
+
+    def _cancel_not_started(self, idx: int, reason: str) -> None:
+        self._cancelled.add(idx)
+        self._text_callback(f"[{idx}] CANCELLED ({reason})")
+
+    def _text_callback_default(self, s: str) -> None:
+        builtins.print(s)
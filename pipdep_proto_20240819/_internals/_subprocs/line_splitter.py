@@ -0,0 +1,40 @@
+class LineSplitter:
+    """Splits a byte stream, fed in arbitrary chunks, into decoded text lines.
+
+    Lines are split on "\n"; a trailing "\r" is removed along with it unless
+    keep_ends is set. Since "\n" never occurs inside a multi-byte UTF-8
+    sequence, each line can be decoded on its own.
+    """
+    _keep_ends: bool
+    _pending: list[bytes]
+
+    def __init__(self, keep_ends: bool = False) -> None:
+        self._keep_ends = keep_ends
+        self._pending = list[bytes]()
+
+    def feed(self, data: bytes) -> list[str]:
+        """Returns the lines completed by data."""
+        *parts, tail = bytes(data).split(b"\n")
+        lines = list[str]()
+        if parts:
+            self._pending.append(parts[0])
+            parts[0] = b"".join(self._pending)
+            self._pending.clear()
+            for part in parts:
+                lines.append(self._decode(part + b"\n"))
+        if tail:
+            self._pending.append(tail)
+        return lines
+
+    def flush(self) -> list[str]:
+        """Returns the last line if it was not terminated, once the stream ended."""
+        if not self._pending:
+            return []
+        last = b"".join(self._pending)
+        self._pending.clear()
+        return [self._decode(last)]
+
+    def _decode(self, raw: bytes) -> str:
+        if not self._keep_ends:
+            raw = raw.rstrip(b"\r\n")
+        return raw.decode("utf-8", errors="replace")
@@ -0,0 +1,398 @@
+from collections.abc import Iterable
+import multiprocessing
+import multiprocessing.connection
+import os
+from pathlib import Path
+import signal
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional, Union
+
+from pipdep_proto_20240819._internals._subprocs.process_group import SIGKILL, signal_process_group
+from pipdep_proto_20240819._internals._subprocs.shell_task import (
+    CANCEL_POLL_SECS,
+    KILL_GRACE_SECS,
+    ShellTask,
+    ShellTaskReturnCode,
+    ShellTaskStats,
+)
+
+###
+### pip is not meant to be run more than once per process: it keeps module
+### level caches (e.g. of the installed distributions), and an exception may
+### leave it in any state. Workers are therefore recycled after a number of
+### commands, and after any command that raised, crashed or was stopped.
+###
+
+DEFAULT_MAX_COMMANDS_PER_WORKER = 50
+
+PIP_MODULE_ARGS = [sys.executable, "-m", "pip"]
+
+
+def _pip_worker_main(conn: multiprocessing.connection.Connection) -> None:
+    """Entry point of a worker process. Imports pip once, then runs the pip
+    commands received on conn until it receives None.
+
+    Each request is (pip_args, out_path, err_path); the reply is ("done",
+    returncode, user_cpu_secs, sys_cpu_secs) or ("error", message), after
+    which the worker exits.
+    """
+    ### Own process group, so that stopping the worker also stops the
+    ### processes that pip started (e.g. build backends).
+    if os.name == "posix":
+        os.setsid()
+    from pip._internal.cli.main import main as pip_main
+    while True:
+        request = conn.recv()
+        if request is None:
+            return
+        pip_args, out_path, err_path = request
+        times_before = os.times()
+        try:
+            returncode = _run_redirected(pip_main, pip_args, out_path, err_path)
+        except BaseException as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            return
+        times_after = os.times()
+        conn.send((
+            "done",
+            returncode,
+            (times_after.user + times_after.children_user) - (times_before.user + times_before.children_user),
+            (times_after.system + times_after.children_system) - (times_before.system + times_before.children_system),
+        ))
+
+
+def _run_redirected(pip_main, pip_args: list[str], out_path: str, err_path: str) -> int:
+    """Runs pip_main with file descriptors 1 and 2 redirected to the files, so
+    that the output of pip and of its subprocesses is captured alike.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = (os.dup(1), os.dup(2))
+    try:
+        with open(out_path, "wb") as out_file:
+            os.dup2(out_file.fileno(), 1)
+            if err_path == out_path:
+                os.dup2(out_file.fileno(), 2)
+                return _call_pip_main(pip_main, pip_args)
+            with open(err_path, "wb") as err_file:
+                os.dup2(err_file.fileno(), 2)
+                return _call_pip_main(pip_main, pip_args)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        os.close(saved_fds[0])
+        os.close(saved_fds[1])
+
+
+def _call_pip_main(pip_main, pip_args: list[str]) -> int:
+    try:
+        return pip_main(list(pip_args))
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+
+
+class _PipWorker:
+    process: multiprocessing.process.BaseProcess
+    conn: multiprocessing.connection.Connection
+    command_count: int
+
+    def __init__(self, context: multiprocessing.context.BaseContext) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_pip_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.command_count = 0
+
+    def stop(self, graceful: bool) -> None:
+        """Asks the worker to exit if graceful, otherwise (or if it does not
+        exit in time) terminates its process group.
+        """
+        if self.conn.closed:
+            return
+        if graceful:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.process.join(KILL_GRACE_SECS)
+        if self.process.is_alive():
+            signal_process_group(self.process, signal.SIGTERM)
+            self.process.join(KILL_GRACE_SECS)
+        if self.process.is_alive():
+            signal_process_group(self.process, SIGKILL)
+            self.process.join()
+        self.conn.close()
+
+
+class PipWorkerPool:
+    """Long-lived worker processes that have imported pip, and run pip
+    commands in-process, with stdout and stderr written to files.
+
+    At most max_workers commands run at a time; further callers of run()
+    block until a worker is free. Workers are started on demand (the first
+    command on each worker also pays for importing pip), and replaced after
+    max_commands_per_worker commands, or after a command that failed with an
+    exception, crashed the worker, or was stopped.
+
+    The pool is shared by reference, so the tasks that use it must run in the
+    process that owns it, e.g. on a ThreadPool.
+    """
+    _max_workers: int
+    _max_commands_per_worker: int
+    _context: multiprocessing.context.BaseContext
+    _lock: threading.Lock
+    _slots: threading.Semaphore
+    _idle: list[_PipWorker]
+    _busy: set[_PipWorker]
+    _closed: bool
+    _workers_started: int
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_commands_per_worker: int = DEFAULT_MAX_COMMANDS_PER_WORKER,
+    ) -> None:
+        assert isinstance(max_workers, int) and max_workers >= 1
+        assert isinstance(max_commands_per_worker, int) and max_commands_per_worker >= 1
+        self._max_workers = max_workers
+        self._max_commands_per_worker = max_commands_per_worker
+        ### Not fork: the pool is typically used from several threads.
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max_workers)
+        self._idle = list[_PipWorker]()
+        self._busy = set[_PipWorker]()
+        self._closed = False
+        self._workers_started = 0
+
+    def __enter__(self) -> "PipWorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def workers_started(self) -> int:
+        """Number of worker processes started so far, including replacements."""
+        return self._workers_started
+
+    def run(
+        self,
+        pip_args: Iterable[str],
+        out_path: Path,
+        err_path: Path,
+        stats: Optional[ShellTaskStats] = None,
+        deadline: Optional[float] = None,
+        cancel_path: Optional[Path] = None,
+    ) -> int:
+        """Runs "pip <pip_args>" in a worker, and returns its exit code.
+
+        At the deadline (from time.time()), or when cancel_path appears, the
+        worker is terminated; the exit code is then that of the worker, and
+        stats.stop_reason is set. If stats is given, the CPU times of the
+        command are filled in. Raises if pip raised, or the worker died.
+        """
+        assert not isinstance(pip_args, str)
+        request = (list(pip_args), str(out_path), str(err_path))
+        with self._slots:
+            worker = self._checkout()
+            healthy = False
+            try:
+                worker.conn.send(request)
+                reply, stop_reason = self._wait_for_reply(worker, deadline, cancel_path)
+                if stop_reason is not None:
+                    worker.stop(graceful=False)
+                    if stats is not None:
+                        stats.stop_reason = stop_reason
+                    return ShellTaskReturnCode(worker.process.exitcode)
+                if reply is None:
+                    raise Exception(f"pip worker exited with code {worker.process.exitcode}.")
+                if reply[0] == "error":
+                    raise Exception(f"pip {request[0]} raised {reply[1]}")
+                _, returncode, user_cpu_secs, sys_cpu_secs = reply
+                if stats is not None:
+                    stats.user_cpu_secs = user_cpu_secs
+                    stats.sys_cpu_secs = sys_cpu_secs
+                healthy = True
+                return returncode
+            finally:
+                self._checkin(worker, healthy)
+
+    def run_with_outtext(
+        self,
+        pip_args: Iterable[str],
+        merge_stderr: bool = True,
+        check: bool = True,
+        timeout_secs: Optional[float] = None,
+    ) -> list[str]:
+        """Like executor_funcs.subprocess_run_with_outtext(), for a pip command:
+        returns the lines of stdout, and of stderr if merge_stderr, and with
+        check, raises if pip failed. With timeout_secs, the worker is killed
+        on expiry, and TimeoutError is raised.
+        """
+        tmp_fd, tmp_name = tempfile.mkstemp(text=True)
+        os.close(tmp_fd)
+        try:
+            err_path = Path(tmp_name) if merge_stderr else Path(os.devnull)
+            stats = ShellTaskStats()
+            deadline = time.time() + timeout_secs if timeout_secs is not None else None
+            returncode = self.run(pip_args, Path(tmp_name), err_path, stats=stats, deadline=deadline)
+            if stats.stop_reason == "timeout":
+                raise TimeoutError(f"command pip {list(pip_args)} did not finish in {timeout_secs} seconds.")
+            if returncode != 0 and check:
+                raise Exception(f"command pip {list(pip_args)} failed with code {returncode}.")
+            with open(tmp_name, "r") as f:
+                return [line.rstrip("\n") for line in f.readlines()]
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+
+    def run_with_outerr(
+        self,
+        pip_args: Iterable[str],
+        timeout_secs: Optional[float] = None,
+    ) -> tuple[int, list[str], list[str]]:
+        """Like executor_funcs.subprocess_run_with_outerr(), for a pip command:
+        returns the exit code and the lines of stdout and stderr, without 
+        raising if pip failed. With timeout_secs, the worker is killed on 
+        expiry, and TimeoutError is raised.
+        """
+        out_fd, out_name = tempfile.mkstemp(text=True)
+        err_fd, err_name = tempfile.mkstemp(text=True)
+        os.close(out_fd)
+        os.close(err_fd)
+        try:
+            stats = ShellTaskStats()
+            deadline = time.time() + timeout_secs if timeout_secs is not None else None
+            returncode = self.run(pip_args, Path(out_name), Path(err_name), stats=stats, deadline=deadline)
+            if stats.stop_reason == "timeout":
+                raise TimeoutError(f"command pip {list(pip_args)} did not finish in {timeout_secs} seconds.")
+            with open(out_name, "r") as f:
+                out_lines = [line.rstrip("\n") for line in f.readlines()]
+            with open(err_name, "r") as f:
+                err_lines = [line.rstrip("\n") for line in f.readlines()]
+            return returncode, out_lines, err_lines
+        finally:
+            Path(out_name).unlink(missing_ok=True)
+            Path(err_name).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Stops the idle workers; busy workers are stopped when their command
+        finishes.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, list[_PipWorker]()
+        for worker in idle:
+            worker.stop(graceful=True)
+
+    def _checkout(self) -> _PipWorker:
+        with self._lock:
+            if self._closed:
+                raise Exception("PipWorkerPool is closed.")
+            worker = self._idle.pop() if self._idle else None
+            if worker is None:
+                self._workers_started += 1
+        if worker is None:
+            worker = _PipWorker(self._context)
+        with self._lock:
+            self._busy.add(worker)
+        return worker
+
+    def _checkin(self, worker: _PipWorker, healthy: bool) -> None:
+        worker.command_count += 1
+        with self._lock:
+            self._busy.discard(worker)
+            keep = (
+                healthy
+                and not self._closed
+                and worker.command_count < self._max_commands_per_worker
+                and worker.process.is_alive()
+            )
+            if keep:
+                self._idle.append(worker)
+        if not keep:
+            worker.stop(graceful=healthy)
+
+    def _wait_for_reply(
+        self,
+        worker: _PipWorker,
+        deadline: Optional[float],
+        cancel_path: Optional[Path],
+    ) -> tuple[Optional[tuple], Optional[str]]:
+        """Returns (reply, None), (None, None) if the worker died, or
+        (None, stop_reason) if the command has to be stopped.
+        """
+        while True:
+            wait_secs = None
+            if cancel_path is not None:
+                wait_secs = CANCEL_POLL_SECS
+            if deadline is not None:
+                until_deadline = max(0.0, deadline - time.time())
+                wait_secs = until_deadline if wait_secs is None else min(wait_secs, until_deadline)
+            try:
+                if worker.conn.poll(wait_secs):
+                    return worker.conn.recv(), None
+            except (EOFError, OSError):
+                return None, None
+            if deadline is not None and time.time() >= deadline:
+                return None, "timeout"
+            if cancel_path is not None and cancel_path.exists():
+                return None, "cancelled"
+
+
+class PipWorkerTask(ShellTask):
+    """Runs "pip <pip_args>" in a warm worker of a PipWorkerPool, as a drop-in
+    replacement for a ShellTask running "python -m pip <pip_args>". Without a
+    pool, or with run_async(), the command runs as a subprocess instead.
+
+    With a pool, the task must run in the process that owns the pool (e.g. on
+    a ThreadPool), and the max RSS is not reported.
+    """
+    _pool: Optional[PipWorkerPool]
+
+    def __init__(
+        self,
+        pip_args: Iterable[str],
+        pool: Optional[PipWorkerPool] = None,
+        timeout_secs: Optional[float] = None,
+    ) -> None:
+        assert not isinstance(pip_args, str)
+        super().__init__(PIP_MODULE_ARGS + list(pip_args), timeout_secs=timeout_secs)
+        self._pool = pool
+
+    @property
+    def pip_args(self) -> list[str]:
+        return self._args[len(PIP_MODULE_ARGS):]
+
+    def run(self) -> Union[ShellTaskReturnCode, Exception]:
+        if self._pool is None:
+            return super().run()
+        if self._out_path is None:
+            raise Exception("out_path not set.")
+        if self._err_path is None:
+            raise Exception("err_path not set.")
+        stats = ShellTaskStats()
+        start_time = time.perf_counter()
+        try:
+            self._outcome = ShellTaskReturnCode(self._pool.run(
+                self.pip_args,
+                self._out_path,
+                self._err_path,
+                stats=stats,
+                deadline=self._effective_deadline(),
+                cancel_path=self._cancel_path,
+            ))
+            stats.out_bytes = self._out_path.stat().st_size
+            stats.err_bytes = self._err_path.stat().st_size
+        except Exception as e:
+            self._outcome = e
+        self._elapsed_secs = stats.wall_secs = time.perf_counter() - start_time
+        self._stats = stats
+        return self._outcome
@@ -0,0 +1,39 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+from typing import Union
+
+###
+### Commands are started in their own process group (a new session on POSIX),
+### so that a timeout or cancellation can stop the whole tree of processes
+### that the command started, not only the command itself.
+###
+
+SIGKILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+
+def new_process_group_kwargs() -> dict:
+    """Keyword arguments for subprocess.Popen (or asyncio's subprocess
+    functions) that start the command in a new process group.
+    """
+    if os.name == "posix":
+        return {"start_new_session": True}
+    return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+def signal_process_group(
+    proc: Union[subprocess.Popen, asyncio.subprocess.Process, multiprocessing.Process],
+    sig: int,
+) -> None:
+    """Sends the signal to the process group led by proc; on Windows, only 
+    the process itself is terminated.
+    """
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, sig)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
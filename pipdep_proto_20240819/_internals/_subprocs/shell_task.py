@@ -1,30 +1,102 @@
+import asyncio
 from collections.abc import Iterable
+from dataclasses import dataclass
 import io
+import os
 from pathlib import Path
+import signal
 import subprocess
-from typing import NewType, Optional, Union, TypeAlias
+import sys
+import threading
+import time
+from typing import Callable, NewType, Optional, Union, TypeAlias
 
+from pipdep_proto_20240819._internals._subprocs.line_splitter import LineSplitter
+from pipdep_proto_20240819._internals._subprocs.process_group import (
+    SIGKILL,
+    new_process_group_kwargs,
+    signal_process_group,
+)
 from pipdep_proto_20240819._internals._subprocs.task_protocol import TaskProtocol
 
 ShellTaskReturnCode = int
 
+PIPE_READ_CHUNK_SIZE = 64 * 1024
+
+### Time between SIGTERM and SIGKILL when a task is stopped.
+KILL_GRACE_SECS = 3.0
+
+### How often the watchdog checks for the cancel file.
+CANCEL_POLL_SECS = 0.2
+
+
+@dataclass
+class ShellTaskStats:
+    """Resources used by one run of a ShellTask.
+
+    The CPU times and max RSS are those of the child process, as reported by
+    os.wait4(); they are None where wait4 is not available (Windows), and for
+    run_async().
+
+    Attributes:
+        wall_secs: float
+        user_cpu_secs: Optional[float]
+        sys_cpu_secs: Optional[float]
+        max_rss_kib: Optional[int]
+        out_bytes: int
+            Bytes written to stdout.
+        err_bytes: int
+            Bytes written to stderr.
+        stop_reason: Optional[str]
+            "timeout" or "cancelled" if the process group was terminated by
+            the task, otherwise None.
+    """
+    wall_secs: float = 0.0
+    user_cpu_secs: Optional[float] = None
+    sys_cpu_secs: Optional[float] = None
+    max_rss_kib: Optional[int] = None
+    out_bytes: int = 0
+    err_bytes: int = 0
+    stop_reason: Optional[str] = None
+
+
 class ShellTask(TaskProtocol):
+    """Runs one command, with stdout and stderr written to the fio paths.
+
+    The command runs in its own process group (session), so that a timeout or
+    cancellation stops the whole tree of processes it started. A task stops
+    at the earliest of its timeout_secs, the deadline given to set_limits(),
+    and the appearance of the cancel file given to set_limits(); the file is
+    used because the task may run in a pool worker process.
+    """
     _args: Iterable[str]
+    _timeout_secs: Optional[float]
+    _deadline: Optional[float]
+    _cancel_path: Optional[Path]
     _out_path: Optional[Path]
     _err_path: Optional[Path]
     _outcome: Union[None, ShellTaskReturnCode, Exception]
+    _elapsed_secs: Optional[float]
+    _stats: Optional[ShellTaskStats]
 
     def __init__(
         self,
         args: Iterable[str],
+        timeout_secs: Optional[float] = None,
     ):
         assert not isinstance(args, str)
         assert isinstance(args, Iterable)
         assert all(isinstance(arg, str) for arg in args)
+        assert timeout_secs is None or timeout_secs > 0.0
         self._args = list(args)
+        self._timeout_secs = timeout_secs
+        self._deadline = None
+        self._cancel_path = None
         self._out_path = None
         self._err_path = None
         self._outcome = None
+        self._elapsed_secs = None
+        self._stats = None
 
     def set_fio_paths(self, out_path: Path, err_path: Path) -> None:
         if self._out_path is not None:
@@ -36,27 +108,177 @@ class ShellTask(TaskProtocol):
         self._out_path = out_path
         self._err_path = err_path
 
+    def set_limits(self, deadline: Optional[float], cancel_path: Optional[Path]) -> None:
+        """Sets an absolute deadline (from time.time()) and a cancel file, in
+        addition to timeout_secs.
+        """
+        self._deadline = deadline
+        self._cancel_path = cancel_path
+
+    def reset(self) -> None:
+        """Clears the fio paths and the results, so that the task can be run 
+        again (e.g. retried).
+        """
+        self._out_path = None
+        self._err_path = None
+        self._outcome = None
+        self._elapsed_secs = None
+        self._stats = None
+
     def run(self) -> Union[ShellTaskReturnCode, Exception]:
         if self._out_path is None:
             raise Exception("out_path not set.")
         if self._err_path is None:
             raise Exception("err_path not set.")
+        stats = ShellTaskStats()
+        start_time = time.perf_counter()
         try:
             with self._out_path.open("wb+") as _out_pyfio:
                 with self._err_path.open("wb+") as _err_pyfio:
-                    subp_result = subprocess.run(
+                    with subprocess.Popen(
                         self._args,
                         stderr=_err_pyfio,
                         stdout=_out_pyfio,
-                    )
-                    self._outcome = ShellTaskReturnCode(subp_result.returncode)
+                        **new_process_group_kwargs(),
+                    ) as proc:
+                        exited = threading.Event()
+                        watchdog = self._start_watchdog(proc, exited, stats)
+                        try:
+                            self._outcome = ShellTaskReturnCode(_wait_with_rusage(proc, stats))
+                        finally:
+                            exited.set()
+                            if watchdog is not None:
+                                watchdog.join()
+                    stats.out_bytes = os.fstat(_out_pyfio.fileno()).st_size
+                    stats.err_bytes = os.fstat(_err_pyfio.fileno()).st_size
+        except Exception as e:
+            self._outcome = e
+        self._elapsed_secs = stats.wall_secs = time.perf_counter() - start_time
+        self._stats = stats
+        return self._outcome
+
+    async def run_async(
+        self,
+        fn_out_line: Callable[[str], None],
+        fn_err_line: Callable[[str], None],
+    ) -> Union[ShellTaskReturnCode, Exception]:
+        """Runs the command as an asyncio subprocess, and passes its stdout and
+        stderr lines to the callbacks as they arrive, without temp files. The
+        fio paths are not used. The timeout, deadline and cancel file stop the
+        command as in run().
+        """
+        stats = ShellTaskStats()
+        start_time = time.perf_counter()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self._args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **new_process_group_kwargs(),
+            )
+            pumps = asyncio.gather(
+                _pump_lines(proc.stdout, fn_out_line),
+                _pump_lines(proc.stderr, fn_err_line),
+            )
+            deadline = self._effective_deadline()
+            cancel_path = self._cancel_path
+            while not pumps.done():
+                wait_secs = CANCEL_POLL_SECS if cancel_path is not None else None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.time())
+                    wait_secs = remaining if wait_secs is None else min(wait_secs, remaining)
+                await asyncio.wait({pumps}, timeout=wait_secs)
+                if pumps.done():
+                    break
+                if deadline is not None and time.time() >= deadline:
+                    stats.stop_reason = "timeout"
+                elif cancel_path is not None and cancel_path.exists():
+                    stats.stop_reason = "cancelled"
+                if stats.stop_reason is not None:
+                    signal_process_group(proc, signal.SIGTERM)
+                    try:
+                        await asyncio.wait_for(proc.wait(), KILL_GRACE_SECS)
+                    except asyncio.TimeoutError:
+                        signal_process_group(proc, SIGKILL)
+                    break
+            stats.out_bytes, stats.err_bytes = await pumps
+            self._outcome = ShellTaskReturnCode(await proc.wait())
         except Exception as e:
             self._outcome = e
+        self._elapsed_secs = stats.wall_secs = time.perf_counter() - start_time
+        self._stats = stats
         return self._outcome
 
     def has_exited(self) -> bool:
         return self._outcome is not None
 
+    def _effective_deadline(self) -> Optional[float]:
+        deadlines = list[float]()
+        if self._timeout_secs is not None:
+            deadlines.append(time.time() + self._timeout_secs)
+        if self._deadline is not None:
+            deadlines.append(self._deadline)
+        return min(deadlines) if deadlines else None
+
+    def _start_watchdog(
+        self,
+        proc: subprocess.Popen,
+        exited: threading.Event,
+        stats: ShellTaskStats,
+    ) -> Optional[threading.Thread]:
+        deadline = self._effective_deadline()
+        cancel_path = self._cancel_path
+        if deadline is None and cancel_path is None:
+            return None
+
+        def watch() -> None:
+            while not exited.is_set():
+                now = time.time()
+                if deadline is not None and now >= deadline:
+                    stats.stop_reason = "timeout"
+                elif cancel_path is not None and cancel_path.exists():
+                    stats.stop_reason = "cancelled"
+                if stats.stop_reason is not None:
+                    signal_process_group(proc, signal.SIGTERM)
+                    if not exited.wait(KILL_GRACE_SECS):
+                        signal_process_group(proc, SIGKILL)
+                    return
+                wait_secs = CANCEL_POLL_SECS if cancel_path is not None else deadline - now
+                if deadline is not None:
+                    wait_secs = min(wait_secs, deadline - now)
+                exited.wait(max(0.0, wait_secs))
+
+        watchdog = threading.Thread(target=watch, daemon=True)
+        watchdog.start()
+        return watchdog
+
+    @property
+    def args(self) -> list[str]:
+        return self._args
+
+    @property
+    def outcome(self) -> Union[None, ShellTaskReturnCode, Exception]:
+        """Return code or exception of run(). Only visible to the caller when 
+        the task runs in the same process, e.g. on a ThreadPool.
+        """
+        return self._outcome
+
+    @property
+    def elapsed_secs(self) -> Optional[float]:
+        """Wall time of run(). Only visible to the caller when the task runs 
+        in the same process, e.g. on a ThreadPool.
+        """
+        return self._elapsed_secs
+
+    @property
+    def stats(self) -> Optional[ShellTaskStats]:
+        """Resources used by the last run. Only visible to the caller when the
+        task runs in the same process; TaskListExecutor passes them back from
+        worker processes.
+        """
+        return self._stats
+
     @property
     def out_path(self) -> Optional[Path]:
         return self._out_path
@@ -64,3 +286,38 @@ class ShellTask(TaskProtocol):
     @property
     def err_path(self) -> Optional[Path]:
         return self._err_path
+
+
+def _wait_with_rusage(proc: subprocess.Popen, stats: ShellTaskStats) -> int:
+    """Waits for the process, and fills in the CPU times and max RSS of the
+    child where os.wait4() is available. Returns the exit code.
+    """
+    if not hasattr(os, "wait4"):
+        return proc.wait()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    ### Let Popen know that the child has been reaped.
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    stats.user_cpu_secs = rusage.ru_utime
+    stats.sys_cpu_secs = rusage.ru_stime
+    ### ru_maxrss is in bytes on macOS, and in KiB elsewhere.
+    stats.max_rss_kib = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    return proc.returncode
+
+
+async def _pump_lines(stream: asyncio.StreamReader, fn_line: Callable[[str], None]) -> int:
+    """Reads the stream in chunks, and passes each complete line (without its
+    line ending) to fn_line. Unlike StreamReader.readline(), this has no line
+    length limit. Returns the number of bytes read.
+    """
+    splitter = LineSplitter()
+    byte_count = 0
+    while True:
+        chunk = await stream.read(PIPE_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        byte_count += len(chunk)
+        for line in splitter.feed(chunk):
+            fn_line(line)
+    for line in splitter.flush():
+        fn_line(line)
+    return byte_count
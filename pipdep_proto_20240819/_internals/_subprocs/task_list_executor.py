@@ -1,38 +1,110 @@
 import builtins
-from collections import deque
 from collections.abc import Iterable
+from collections.abc import Mapping
+from functools import partial
+import heapq
 import multiprocessing
 import multiprocessing.pool
 import os
 from pathlib import Path
+import queue
 import tempfile
+import threading
 import time
 import traceback
-from typing import Callable, Optional, Union
+from typing import Any, Callable, Optional, Union
 
 
-from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask, ShellTaskReturnCode
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask, ShellTaskReturnCode, ShellTaskStats
 from pipdep_proto_20240819._internals._subprocs.task_protocol import TaskProtocol
 from pipdep_proto_20240819._internals._subprocs.pool_protocol import PoolProtocol
 from pipdep_proto_20240819._internals._subprocs.task_pipe_reader import TaskPipeReader
+from pipdep_proto_20240819._internals._subprocs.task_run_report import TaskRunRecord, write_run_report
+
+
+def _run_task_timed(task: TaskProtocol) -> tuple[float, Any, Optional[ShellTaskStats]]:
+    """Runs the task in the pool worker, and returns its start time and stats
+    along with the outcome, since the task object itself is not sent back from
+    worker processes.
+    """
+    started_at = time.time()
+    outcome = task.run()
+    return started_at, outcome, getattr(task, "stats", None)
 
 
 class TaskListExecutor:
     """External process execution controller for a fixed list of tasks,
     with concurrent text output handling.
+
+    Task completion is signalled by the apply_async callbacks, which run on
+    the pool's result thread and push onto a queue. The run loop blocks on
+    that queue, so a finished task's slot is refilled immediately; sleep_secs
+    only bounds how long the output of running tasks may lag behind.
+
+    Tasks may have prerequisites, given as a mapping from a task index to the
+    indices of the tasks that must succeed before it can start. Among the 
+    tasks that are ready, the one with the longest chain of dependent tasks
+    (critical path) is started first; ties keep the list order. When a task
+    fails, all tasks that transitively depend on it are skipped.
+
+    Tasks that support set_limits() (e.g. ShellTask) are stopped at the global
+    deadline, deadline_secs after run() starts; tasks not started by then are
+    cancelled. A failed task is retried up to max_attempts times in total, 
+    after retry_backoff_secs, multiplied by retry_backoff_factor for each
+    further attempt; with max_attempts above 1, every task must have a reset()
+    method (e.g. ShellTask), or TypeError is raised. cancel() may be called
+    from any thread: it stops starting tasks, terminates the running ones, and
+    run() returns once their output is drained.
+
+    Output lines go to text_callback one at a time, formatted as "[idx] OUT 
+    ..." or "[idx] ERR ...". With batch_callback, they are instead delivered as
+    one list of (idx, "OUT" or "ERR", line) tuples per tick, and text_callback
+    only receives the status messages. max_lines_per_task caps the lines kept
+    in memory per task between ticks, dropping the oldest; with spill_dir, the
+    complete output of each task is also written to "task_<idx>.out.gz" and
+    "task_<idx>.err.gz" in that directory.
+
+    Each task's queue wait, slot time and resource usage are recorded, and
+    summarized by run_report(). With report_path, the report is also written
+    at the end of run(), as CSV or JSON depending on the file extension.
     """
     _tasks: list[TaskProtocol]
     _fios: list[TaskPipeReader]
     _ar: list[multiprocessing.pool.ApplyResult]
     _max_in_flight: int
-    _not_started: deque[int]
+    _ready: list[tuple[int, int]]
+    _successors: list[list[int]]
+    _waiting_on: list[int]
+    _critical_path: list[int]
     _self_is_running: bool
     _in_flight: set[int]
     _succeeded: set[int]
     _failed: set[int]
+    _skipped: set[int]
+    _cancelled: set[int]
+    _attempts: list[int]
+    _retry_at: list[tuple[float, int]]
+    _max_attempts: int
+    _retry_backoff_secs: float
+    _retry_backoff_factor: float
+    _deadline_secs: Optional[float]
+    _deadline: Optional[float]
+    _cancel_event: threading.Event
+    _is_stopping: bool
+    _completions: queue.SimpleQueue[tuple[int, bool, Optional[float], Optional[ShellTaskStats], float]]
+    _stopped: dict[int, bool]
     _fio_folder: tempfile.TemporaryDirectory
     _sleep_secs: float
     _text_callback: Callable[[str], None]
+    _batch_callback: Optional[Callable[[list[tuple[int, str, str]]], None]]
+    _batch: list[tuple[int, str, str]]
+    _max_lines_per_task: Optional[int]
+    _spill_dir: Optional[Path]
+    _records: list[TaskRunRecord]
+    _run_started_at: Optional[float]
+    _run_finished_at: Optional[float]
+    _peak_in_flight: int
+    _report_path: Optional[Path]
 
     def __init__(
         self, 
@@ -40,6 +112,15 @@ class TaskListExecutor:
         max_in_flight: int,
         text_callback: Optional[Callable[[str], None]] = None,
         sleep_secs: float=0.1,
+        report_path: Union[Path, str, None] = None,
+        prerequisites: Optional[Mapping[int, Iterable[int]]] = None,
+        deadline_secs: Optional[float] = None,
+        max_attempts: int = 1,
+        retry_backoff_secs: float = 1.0,
+        retry_backoff_factor: float = 2.0,
+        batch_callback: Optional[Callable[[list[tuple[int, str, str]]], None]] = None,
+        max_lines_per_task: Optional[int] = None,
+        spill_dir: Union[Path, str, None] = None,
     ) -> None:
         """ Initialize the executor with a multiprocessing.Pool, a list of tasks, and the 
         maximum number of tasks to run concurrently.
@@ -47,94 +128,357 @@ class TaskListExecutor:
         assert all(isinstance(task, TaskProtocol) for task in tasks)
         assert isinstance(max_in_flight, int) and max_in_flight >= 1
         assert isinstance(sleep_secs, (int, float)) and sleep_secs > 0.0
+        assert deadline_secs is None or deadline_secs > 0.0
+        assert isinstance(max_attempts, int) and max_attempts >= 1
+        assert retry_backoff_secs >= 0.0 and retry_backoff_factor >= 1.0
         self._tasks = list(tasks)
+        if max_attempts > 1:
+            for idx, task in enumerate(self._tasks):
+                if not callable(getattr(task, "reset", None)):
+                    raise TypeError(
+                        f"Task {idx} ({type(task).__name__}) has no reset() method, "
+                        f"so it cannot be retried (max_attempts={max_attempts})."
+                    )
         count = len(self._tasks)
         self._fios = [None] * count
         self._ar = [None] * count
         self._max_in_flight = int(max_in_flight)
-        self._not_started = deque(range(count))
+        self._init_schedule(count, prerequisites or {})
         self._self_is_running = False
         self._in_flight = set()
         self._succeeded = set()
         self._failed = set()
+        self._skipped = set()
+        self._cancelled = set()
+        self._attempts = [0] * count
+        self._retry_at = list[tuple[float, int]]()
+        self._max_attempts = max_attempts
+        self._retry_backoff_secs = float(retry_backoff_secs)
+        self._retry_backoff_factor = float(retry_backoff_factor)
+        self._deadline_secs = deadline_secs
+        self._deadline = None
+        self._cancel_event = threading.Event()
+        self._is_stopping = False
+        self._completions = queue.SimpleQueue()
+        self._stopped = dict[int, bool]()
         self._fio_folder = tempfile.TemporaryDirectory()
         self._sleep_secs = float(sleep_secs)
         self._text_callback = text_callback or self._text_callback_default
+        self._batch_callback = batch_callback
+        self._batch = list[tuple[int, str, str]]()
+        self._max_lines_per_task = max_lines_per_task
+        self._spill_dir = Path(spill_dir) if spill_dir is not None else None
+        self._records = [
+            TaskRunRecord(idx, args=list(getattr(task, "args", None) or []) or None)
+            for idx, task in enumerate(self._tasks)
+        ]
+        self._run_started_at = None
+        self._run_finished_at = None
+        self._peak_in_flight = 0
+        self._report_path = Path(report_path) if report_path is not None else None
 
     def run(self, pool: PoolProtocol) -> None:
         if self._self_is_running:
             raise Exception("Already running.")
         assert isinstance(pool, PoolProtocol)
         self._self_is_running = True
+        self._run_started_at = time.time()
+        if self._deadline_secs is not None:
+            self._deadline = self._run_started_at + self._deadline_secs
         with self._fio_folder:
             while not self._has_completed():
+                self._check_stop_conditions()
+                self._promote_due_retries()
                 self._try_start_more(pool)
+                self._wait_for_completions()
                 self._process_output()
-                time.sleep(self._sleep_secs)
+        self._run_finished_at = time.time()
         self._report_cleanup_failures()
+        if self._report_path is not None:
+            report = self.run_report()
+            write_run_report(self._report_path, report["summary"], self._records)
         self._self_is_running = False
 
+    @property
+    def records(self) -> list[TaskRunRecord]:
+        return self._records
+
+    def cancel(self) -> None:
+        """Stops starting new tasks and terminates the running ones. Safe to 
+        call from another thread, or from the text callback.
+        """
+        self._cancel_event.set()
+        try:
+            self._cancel_path.touch()
+        except OSError:
+            ### Not running, or already finished.
+            pass
+
+    @property
+    def _cancel_path(self) -> Path:
+        return Path(self._fio_folder.name) / "cancel"
+
+    def run_report(self) -> dict[str, Any]:
+        """Summary of the run, and one row per task.
+
+        The mean slot occupancy is the total time that tasks held a slot,
+        divided by the run's wall time multiplied by max_in_flight; values well
+        below 1.0 mean that the slots were mostly idle.
+        """
+        wall_secs = None
+        if self._run_started_at is not None and self._run_finished_at is not None:
+            wall_secs = self._run_finished_at - self._run_started_at
+        finished = [record for record in self._records if record.finished_at is not None]
+        slot_secs = sum(record.slot_secs for record in finished)
+        queue_waits = [record.queue_wait_secs for record in finished if record.queue_wait_secs is not None]
+        stats = [record.stats for record in finished if record.stats is not None]
+        summary = {
+            "task_count": len(self._tasks),
+            "succeeded": len(self._succeeded),
+            "failed": len(self._failed),
+            "skipped": len(self._skipped),
+            "cancelled": len(self._cancelled),
+            "retries": sum(max(0, attempts - 1) for attempts in self._attempts),
+            "max_in_flight": self._max_in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "wall_secs": wall_secs,
+            "mean_slot_occupancy": (
+                slot_secs / (wall_secs * self._max_in_flight) if wall_secs else None
+            ),
+            "mean_queue_wait_secs": sum(queue_waits) / len(queue_waits) if queue_waits else None,
+            "max_queue_wait_secs": max(queue_waits) if queue_waits else None,
+            "total_user_cpu_secs": sum(s.user_cpu_secs for s in stats if s.user_cpu_secs is not None),
+            "total_sys_cpu_secs": sum(s.sys_cpu_secs for s in stats if s.sys_cpu_secs is not None),
+            "max_rss_kib": max((s.max_rss_kib for s in stats if s.max_rss_kib is not None), default=None),
+            "total_out_bytes": sum(s.out_bytes for s in stats),
+            "total_err_bytes": sum(s.err_bytes for s in stats),
+            "dropped_lines": sum(record.dropped_lines for record in self._records),
+        }
+        return {"summary": summary, "tasks": [record.to_row() for record in self._records]}
+
     def _try_start_more(self, pool: PoolProtocol) -> None:
         assert isinstance(pool, PoolProtocol)
+        if self._is_stopping:
+            return
         while self._has_startable() and self._can_start_more():
-            idx = self._not_started.popleft()
+            _, idx = heapq.heappop(self._ready)
             task = self._tasks[idx]
-            fio = TaskPipeReader(folder=Path(self._fio_folder.name))
+            self._attempts[idx] += 1
+            if self._attempts[idx] >= 2:
+                task.reset()
+            fio = TaskPipeReader(
+                folder=Path(self._fio_folder.name),
+                max_lines=self._max_lines_per_task,
+                spill_prefix=self._spill_dir / f"task_{idx}" if self._spill_dir is not None else None,
+            )
             self._fios[idx] = fio
             task.set_fio_paths(fio._out_path, fio._err_path)
-            self._ar[idx] = pool.apply_async(task.run)
+            set_limits = getattr(task, "set_limits", None)
+            if set_limits is not None:
+                set_limits(self._deadline, self._cancel_path)
+            record = self._records[idx]
+            record.status = "RUNNING"
+            record.attempts = self._attempts[idx]
+            record.submitted_at = time.time()
+            self._ar[idx] = pool.apply_async(
+                _run_task_timed,
+                (task,),
+                callback=partial(self._on_task_done, idx),
+                error_callback=partial(self._on_task_error, idx),
+            )
             self._in_flight.add(idx)
+            self._peak_in_flight = max(self._peak_in_flight, len(self._in_flight))
+
+    def _on_task_done(self, idx: int, result: tuple[float, Any, Optional[ShellTaskStats]]) -> None:
+        ### Called on the pool's result handler thread.
+        started_at, outcome, stats = result
+        is_success = isinstance(outcome, ShellTaskReturnCode) and outcome == 0
+        self._completions.put((idx, is_success, started_at, stats, time.time()))
+
+    def _on_task_error(self, idx: int, exc: BaseException) -> None:
+        ### Called on the pool's result handler thread.
+        self._completions.put((idx, False, None, None, time.time()))
+
+    def _wait_for_completions(self) -> None:
+        """Blocks until a task completes, or until sleep_secs have passed so 
+        that the output of running tasks can be caught up.
+        """
+        timeout = self._sleep_secs
+        if self._retry_at:
+            timeout = min(timeout, max(0.0, self._retry_at[0][0] - time.time()))
+        if not self._has_in_flight():
+            if self._retry_at:
+                ### Only retries are pending; wake early on cancel().
+                self._cancel_event.wait(timeout)
+            return
+        try:
+            completion = self._completions.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            idx, is_success, started_at, stats, finished_at = completion
+            self._stopped[idx] = is_success
+            record = self._records[idx]
+            record.started_at = started_at
+            record.stats = stats
+            record.finished_at = finished_at
+            record.status = "SUCCESS" if is_success else "FAILURE"
+            try:
+                completion = self._completions.get_nowait()
+            except queue.Empty:
+                break
 
     def _process_output(self) -> None:
         if not self._has_in_flight():
             return
-        running_set, success_set, failure_set = self._classify_status()
+        running_set = set[int]()
         for idx in self._in_flight:
             fio = self._fios[idx]
-            is_stopped = idx not in running_set
+            is_stopped = idx in self._stopped
             if is_stopped:
                 fio.mark_closed()
+            else:
+                running_set.add(idx)
             fio.catch_up()
-            for out_line in fio.readline_out():
-                self._text_callback(f"[{idx}] OUT {out_line}")
-            for out_line in fio.readline_err():
-                self._text_callback(f"[{idx}] ERR {out_line}")
+            if self._batch_callback is not None:
+                batch = self._batch
+                batch.extend((idx, "OUT", line) for line in fio.readline_out())
+                batch.extend((idx, "ERR", line) for line in fio.readline_err())
+            else:
+                for out_line in fio.readline_out():
+                    self._text_callback(f"[{idx}] OUT {out_line}")
+                for out_line in fio.readline_err():
+                    self._text_callback(f"[{idx}] ERR {out_line}")
             if is_stopped:
-                ### "RUNNING" is not used: contradicts with if(is_stopped).
-                msg = "SUCCESS" if idx in success_set else "FAILURE" if idx in failure_set else "RUNNING"
-                self._text_callback(f"[{idx}] {msg}")
+                is_success = self._stopped.pop(idx)
+                self._records[idx].dropped_lines += fio.dropped_line_count
                 fio.unlink()
+                ### Deliver the task's last lines before its status message.
+                self._flush_batch()
+                self._finish_task(idx, is_success)
+        self._flush_batch()
         self._in_flight = running_set
-        self._succeeded.update(success_set)
-        self._failed.update(failure_set)
 
-    def _classify_status(self) -> tuple[set[int], set[int], set[int]]:
-        running_set = set[int]()
-        success_set = set[int]()
-        failure_set = set[int]()
-        for idx in self._in_flight:
-            ar = self._ar[idx]
-            if not ar.ready():
-                running_set.add(idx)
+    def _flush_batch(self) -> None:
+        if self._batch:
+            batch = self._batch
+            self._batch = list[tuple[int, str, str]]()
+            self._batch_callback(batch)
+
+    def _finish_task(self, idx: int, is_success: bool) -> None:
+        record = self._records[idx]
+        if record.dropped_lines > 0:
+            self._text_callback(f"[{idx}] DROPPED {record.dropped_lines} lines")
+        if is_success:
+            self._text_callback(f"[{idx}] SUCCESS")
+            self._succeeded.add(idx)
+            self._release_successors(idx)
+            return
+        stop_reason = record.stats.stop_reason if record.stats is not None else None
+        if stop_reason == "cancelled":
+            self._text_callback(f"[{idx}] CANCELLED")
+            record.status = "CANCELLED"
+            self._cancelled.add(idx)
+            return
+        suffix = f" ({stop_reason})" if stop_reason is not None else ""
+        can_retry = not self._is_stopping and (self._deadline is None or time.time() < self._deadline)
+        if self._attempts[idx] < self._max_attempts and can_retry:
+            delay = self._retry_backoff_secs * self._retry_backoff_factor ** (self._attempts[idx] - 1)
+            self._text_callback(
+                f"[{idx}] FAILURE{suffix}, RETRY {self._attempts[idx] + 1}/{self._max_attempts} in {delay:.1f}s"
+            )
+            record.status = "RETRY_PENDING"
+            heapq.heappush(self._retry_at, (time.time() + delay, idx))
+            return
+        self._text_callback(f"[{idx}] FAILURE{suffix}")
+        self._failed.add(idx)
+        self._skip_descendants(idx)
+
+    def _promote_due_retries(self) -> None:
+        now = time.time()
+        while self._retry_at and self._retry_at[0][0] <= now:
+            _, idx = heapq.heappop(self._retry_at)
+            heapq.heappush(self._ready, (-self._critical_path[idx], idx))
+
+    def _check_stop_conditions(self) -> None:
+        """On cancel() or at the deadline, cancels every task that has not
+        started. The running tasks stop on their own, through the cancel file
+        or the deadline given to set_limits().
+        """
+        if self._is_stopping:
+            return
+        if self._cancel_event.is_set():
+            reason = "cancel() called"
+        elif self._deadline is not None and time.time() >= self._deadline:
+            reason = "deadline reached"
+        else:
+            return
+        self._is_stopping = True
+        self._ready.clear()
+        self._retry_at.clear()
+        finished = self._succeeded | self._failed | self._skipped | self._in_flight
+        for idx in range(len(self._tasks)):
+            if idx in finished:
                 continue
-            if not ar.successful():
-                failure_set.add(idx)
+            self._cancelled.add(idx)
+            self._records[idx].status = "CANCELLED"
+            self._text_callback(f"[{idx}] CANCELLED ({reason})")
+
+    def _init_schedule(self, count: int, prerequisites: Mapping[int, Iterable[int]]) -> None:
+        """Builds the successor lists, and the critical path length of each task
+        (the number of tasks on the longest chain that starts with it). Raises
+        ValueError if the prerequisites are cyclic.
+        """
+        successors = [list[int]() for _ in range(count)]
+        waiting_on = [0] * count
+        for idx, pre_idxs in prerequisites.items():
+            for pre_idx in set(pre_idxs):
+                if not (0 <= idx < count and 0 <= pre_idx < count):
+                    raise ValueError(f"Invalid prerequisite: task {idx} after task {pre_idx}")
+                successors[pre_idx].append(idx)
+                waiting_on[idx] += 1
+        ### Kahn's algorithm, then the critical paths in reverse order.
+        remaining = waiting_on.copy()
+        order = [idx for idx in range(count) if remaining[idx] == 0]
+        for idx in order:
+            for succ_idx in successors[idx]:
+                remaining[succ_idx] -= 1
+                if remaining[succ_idx] == 0:
+                    order.append(succ_idx)
+        if len(order) != count:
+            raise ValueError("The task prerequisites contain a cycle.")
+        critical_path = [1] * count
+        for idx in reversed(order):
+            for succ_idx in successors[idx]:
+                if critical_path[succ_idx] + 1 > critical_path[idx]:
+                    critical_path[idx] = critical_path[succ_idx] + 1
+        self._successors = successors
+        self._waiting_on = waiting_on
+        self._critical_path = critical_path
+        self._ready = [(-critical_path[idx], idx) for idx in range(count) if waiting_on[idx] == 0]
+        heapq.heapify(self._ready)
+
+    def _release_successors(self, idx: int) -> None:
+        for succ_idx in self._successors[idx]:
+            self._waiting_on[succ_idx] -= 1
+            if self._waiting_on[succ_idx] == 0:
+                heapq.heappush(self._ready, (-self._critical_path[succ_idx], succ_idx))
+
+    def _skip_descendants(self, idx: int) -> None:
+        ### A descendant cannot have started, since one of its prerequisites 
+        ### (transitively) has not succeeded.
+        stack = list(self._successors[idx])
+        while stack:
+            succ_idx = stack.pop()
+            if succ_idx in self._skipped or succ_idx in self._cancelled:
                 continue
-            outcome: Union[None, ShellTaskReturnCode, Exception] = None
-            try:
-                outcome = ar.get()
-            except Exception as e:
-                outcome = e
-            if isinstance(outcome, ShellTaskReturnCode):
-                if outcome == 0:
-                    success_set.add(idx)
-                    continue
-            failure_set.add(idx)
-            continue
-        return running_set, success_set, failure_set
+            self._skipped.add(succ_idx)
+            self._records[succ_idx].status = "SKIPPED"
+            self._text_callback(f"[{succ_idx}] SKIPPED (after [{idx}] failed)")
+            stack.extend(self._successors[succ_idx])
 
     def _has_startable(self) -> bool:
-        return len(self._not_started) > 0
+        return len(self._ready) > 0
 
     def _can_start_more(self) -> bool:
         return len(self._in_flight) < self._max_in_flight
@@ -146,7 +490,9 @@ class TaskListExecutor:
         task_count = len(self._tasks)
         success_count = len(self._succeeded)
         failure_count = len(self._failed)
-        return success_count + failure_count == task_count
+        skip_count = len(self._skipped)
+        cancel_count = len(self._cancelled)
+        return success_count + failure_count + skip_count + cancel_count == task_count
 
     def _text_callback_default(self, s: str) -> None:
         builtins.print(s)
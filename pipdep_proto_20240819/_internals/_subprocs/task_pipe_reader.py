@@ -1,40 +1,123 @@
 from collections import deque
-from collections.abc import Iterable
-import multiprocessing
-import multiprocessing.pool
+from collections.abc import Iterable, Iterator
+import gzip
 import os
 from pathlib import Path
 import tempfile
-import time
+from typing import BinaryIO, Optional
 
+from pipdep_proto_20240819._internals._subprocs.line_splitter import LineSplitter
 
-from pipdep_proto_20240819._internals._subprocs.task_protocol import TaskProtocol
-from pipdep_proto_20240819._internals._subprocs.pool_protocol import PoolProtocol
-from catchup_reader_20240825.catchup_reader.src.catchup_reader import CatchUpReader
+READ_BUFFER_SIZE = 64 * 1024
+
+
+class _OutputFileTail:
+    """Incremental reader of an output file that another process appends to.
+
+    The file is kept open for the lifetime of the task. Each read first checks
+    the size with fstat, and returns immediately if the file has not grown;
+    otherwise only the bytes after the last offset are read, into a reusable
+    buffer. With a spill path, the raw bytes are also appended to a gzip file.
+    """
+    _path: Path
+    _file: Optional[BinaryIO]
+    _offset: int
+    _buffer: bytearray
+    _splitter: LineSplitter
+    _spill_path: Optional[Path]
+    _spill_file: Optional[gzip.GzipFile]
+
+    def __init__(self, path: Path, keep_ends: bool, spill_path: Optional[Path] = None) -> None:
+        self._path = path
+        self._file = None
+        self._offset = 0
+        self._buffer = bytearray(READ_BUFFER_SIZE)
+        self._splitter = LineSplitter(keep_ends)
+        self._spill_path = spill_path
+        self._spill_file = None
+
+    def iter_lines(self, is_closed: bool) -> Iterator[list[str]]:
+        """Yields the new complete lines, one list per chunk read."""
+        if self._file is None and self._path.is_file():
+            self._file = open(self._path, "rb", buffering=0)
+        if self._file is not None:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < self._offset:
+                ### Truncated by the writer (reopened with "wb+"); start over.
+                self._offset = 0
+            if size > self._offset:
+                self._file.seek(self._offset)
+                view = memoryview(self._buffer)
+                while self._offset < size:
+                    count = self._file.readinto(view)
+                    if not count:
+                        break
+                    self._offset += count
+                    if self._spill_path is not None:
+                        self._spill(view[:count])
+                    yield self._splitter.feed(view[:count])
+        if is_closed:
+            yield self._splitter.flush()
+
+    def _spill(self, data: memoryview) -> None:
+        if self._spill_file is None:
+            self._spill_path.parent.mkdir(parents=True, exist_ok=True)
+            ### Appending adds a gzip member per attempt; readers concatenate them.
+            self._spill_file = gzip.open(self._spill_path, "ab", compresslevel=6)
+        self._spill_file.write(data)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
 
 
 class TaskPipeReader:
+    """Reads the stdout and stderr files of a running task as text lines.
+
+    The lines are queued until consumed with readline_out() and readline_err().
+    With max_lines, each queue is a ring buffer that keeps only the newest
+    lines, and the number of lines evicted before being consumed is counted
+    by dropped_line_count. With spill_prefix, the complete output is also
+    written to "<spill_prefix>.out.gz" and "<spill_prefix>.err.gz".
+    """
     _fio_folder: Path
     _keep_ends: bool
     _is_closed: bool
     _out_path: Path
     _err_path: Path
-    _out_reader: CatchUpReader
-    _err_reader: CatchUpReader
+    _out_tail: _OutputFileTail
+    _err_tail: _OutputFileTail
     _out_text_deque: deque[str]
     _err_text_deque: deque[str]
+    _dropped_line_count: int
     _excs: list[Exception]
 
-    def __init__(self, folder: Path, keep_ends: bool = False) -> None:
+    def __init__(
+        self,
+        folder: Path,
+        keep_ends: bool = False,
+        max_lines: Optional[int] = None,
+        spill_prefix: Optional[Path] = None,
+    ) -> None:
+        assert max_lines is None or max_lines >= 1
         self._fio_folder = folder if folder is not None else Path(tempfile.mkdtemp())
         self._keep_ends = keep_ends
         self._is_closed = False
         self._out_path = self._mkstemp_internal()
         self._err_path = self._mkstemp_internal()
-        self._out_reader = CatchUpReader(seekable=True, keepends=keep_ends)
-        self._err_reader = CatchUpReader(seekable=True, keepends=keep_ends)
-        self._out_text_deque = deque()
-        self._err_text_deque = deque()
+        out_spill_path = err_spill_path = None
+        if spill_prefix is not None:
+            out_spill_path = spill_prefix.with_name(spill_prefix.name + ".out.gz")
+            err_spill_path = spill_prefix.with_name(spill_prefix.name + ".err.gz")
+        self._out_tail = _OutputFileTail(self._out_path, keep_ends, out_spill_path)
+        self._err_tail = _OutputFileTail(self._err_path, keep_ends, err_spill_path)
+        self._out_text_deque = deque(maxlen=max_lines)
+        self._err_text_deque = deque(maxlen=max_lines)
+        self._dropped_line_count = 0
         self._excs = list[Exception]()
 
     def mark_closed(self):
@@ -44,20 +127,23 @@ class TaskPipeReader:
         if len(self._excs) > 0:
             return
         try:
-            self._catch_up_internal(self._out_path, self._out_reader, self._out_text_deque)
-            self._catch_up_internal(self._err_path, self._err_reader, self._err_text_deque)
+            for lines in self._out_tail.iter_lines(self._is_closed):
+                self._extend_capped(self._out_text_deque, lines)
+            for lines in self._err_tail.iter_lines(self._is_closed):
+                self._extend_capped(self._err_text_deque, lines)
         except Exception as e:
             self._excs.append(e)
 
-    def _catch_up_internal(self, path: Path, reader: CatchUpReader, text_deque: deque[str]):
-        if self._is_closed:
-            reader.set_writer_as_stopped()
-        if path.is_file():
-            with path.open("rb") as file:
-                reader.read(file)
-        else:
-            reader.read(None)
-        text_deque.extend(reader.readlines())
+    def _extend_capped(self, text_deque: deque[str], lines: list[str]) -> None:
+        if text_deque.maxlen is not None:
+            overflow = len(text_deque) + len(lines) - text_deque.maxlen
+            if overflow > 0:
+                self._dropped_line_count += overflow
+        text_deque.extend(lines)
+
+    @property
+    def dropped_line_count(self) -> int:
+        return self._dropped_line_count
 
     def _mkstemp_internal(self) -> Path:
         filehandle, filepath = tempfile.mkstemp(dir=self._fio_folder.as_posix())
@@ -72,7 +158,12 @@ class TaskPipeReader:
         while len(self._err_text_deque) > 0:
             yield self._err_text_deque.popleft()
 
+    def close(self) -> None:
+        self._out_tail.close()
+        self._err_tail.close()
+
     def unlink(self) -> None:
+        self.close()
         if self._out_path.is_file():
             self._out_path.unlink()
         if self._err_path.is_file():
@@ -0,0 +1,102 @@
+import csv
+from dataclasses import asdict, dataclass
+import json
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTaskStats
+
+
+@dataclass
+class TaskRunRecord:
+    """Timeline and resource usage of one task in a TaskListExecutor run.
+
+    Timestamps are from time.time(), so that they are comparable between
+    the executor and the pool worker processes.
+
+    Attributes:
+        idx: int
+            Position of the task in the task list.
+        args: Optional[list[str]]
+            Command line, for tasks that have one.
+        status: str
+            "NOT_STARTED", "RUNNING", "RETRY_PENDING", "SUCCESS", "FAILURE",
+            "SKIPPED" (a prerequisite failed), or "CANCELLED".
+        attempts: int
+            Number of times the task was started.
+        submitted_at: Optional[float]
+            When the task was handed to the pool.
+        started_at: Optional[float]
+            When a pool worker started running the task.
+        finished_at: Optional[float]
+            When the executor was notified of the completion.
+        stats: Optional[ShellTaskStats]
+            Resources used by the task, if it reports them.
+        dropped_lines: int
+            Output lines evicted from the executor's per-task line buffer.
+    """
+    idx: int
+    args: Optional[list[str]] = None
+    status: str = "NOT_STARTED"
+    attempts: int = 0
+    submitted_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stats: Optional[ShellTaskStats] = None
+    dropped_lines: int = 0
+
+    @property
+    def queue_wait_secs(self) -> Optional[float]:
+        """Time between submission and the start in a pool worker."""
+        if self.submitted_at is None or self.started_at is None:
+            return None
+        return max(0.0, self.started_at - self.submitted_at)
+
+    @property
+    def slot_secs(self) -> Optional[float]:
+        """Time that the task occupied one of the executor's slots."""
+        if self.submitted_at is None or self.finished_at is None:
+            return None
+        return max(0.0, self.finished_at - self.submitted_at)
+
+    def to_row(self) -> dict[str, Any]:
+        """Flat dict, for JSON and CSV reports."""
+        row = {
+            "idx": self.idx,
+            "args": " ".join(self.args) if self.args is not None else None,
+            "status": self.status,
+            "attempts": self.attempts,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait_secs": self.queue_wait_secs,
+            "slot_secs": self.slot_secs,
+            "dropped_lines": self.dropped_lines,
+        }
+        stats = self.stats if self.stats is not None else ShellTaskStats(wall_secs=None, out_bytes=None, err_bytes=None)
+        row.update(asdict(stats))
+        return row
+
+
+def write_run_report(
+    path: Union[Path, str],
+    summary: dict[str, Any],
+    records: list[TaskRunRecord],
+) -> Path:
+    """Writes a run report, as CSV if the path ends with ".csv" (one row per
+    task; the summary is not included), otherwise as JSON with "summary" and
+    "tasks" keys.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = [record.to_row() for record in records]
+    if path.suffix.lower() == ".csv":
+        fieldnames = list(TaskRunRecord(0).to_row().keys())
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with path.open("w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "tasks": rows}, f, indent=2)
+    return path
@@ -0,0 +1,183 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+import multiprocessing.pool
+import os
+from pathlib import Path
+import time
+from typing import Callable, Optional, Union
+
+from pipdep_proto_20240819._internals._graphviz.graphviz_setup import init_graphviz_binpath
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask
+from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.dependency_graph_exporter import DependencyGraphExporter
+from pipdep_proto_20240819._internals.package_info import PackageInfo
+from pipdep_proto_20240819._internals.package_set import IndexedPackageSet, PackageSet
+from pipdep_proto_20240819._internals.render_cache import RenderCache
+
+
+@dataclass
+class BatchExportItem:
+    """One root of a batch export, with its outputs and timings.
+
+    Attributes:
+        name: str
+            Output name; the DOT source is written to this file name, and the
+            rendered output to this name plus the format extension.
+        included: PackageSet
+            Root packages of the exported graph.
+        source_path: Optional[Path]
+            Path of the DOT source, once written.
+        output_path: Optional[Path]
+            Path of the rendered output, once rendered.
+        node_count: int
+            Number of packages in the exported graph.
+        edge_count: int
+            Number of edges in the exported graph.
+        dropped_edge_count: int
+            Number of edges removed by the transitive reduction, if enabled.
+        build_secs: Optional[float]
+            Time to compute the closure and write the DOT source.
+        render_secs: Optional[float]
+            Time spent in the "dot" layout process.
+        succeeded: Optional[bool]
+            Whether rendering succeeded; None if not rendered.
+        cache_hit: bool
+            Whether the rendered output was copied from the render cache.
+    """
+    name: str
+    included: PackageSet
+    source_path: Optional[Path] = None
+    output_path: Optional[Path] = None
+    node_count: int = 0
+    edge_count: int = 0
+    dropped_edge_count: int = 0
+    build_secs: Optional[float] = None
+    render_secs: Optional[float] = None
+    succeeded: Optional[bool] = None
+    cache_hit: bool = False
+
+
+class BatchGraphExporter:
+    """Exports the dependency graphs of many roots, and runs the "dot" layouts
+    concurrently.
+
+    The closures of all roots are answered from the graph's shared reachability
+    index, which is computed once for the whole batch. Rendering runs one "dot"
+    process per root on a TaskListExecutor backed by a thread pool, since the
+    work is bound by the external processes.
+    """
+    _dg: DependencyGraph
+    _excluded: Optional[PackageSet]
+    _items: list[BatchExportItem]
+    _exporters: list[DependencyGraphExporter]
+
+    def __init__(
+        self,
+        dg: DependencyGraph,
+        roots: Iterable[Union[int, str, PackageInfo, PackageSet]],
+        excluded: Optional[PackageSet] = None,
+        fn_output_name: Optional[Callable[[PackageSet], str]] = None,
+        reduce_edges: bool = False,
+    ) -> None:
+        assert isinstance(dg, DependencyGraph)
+        self._dg = dg
+        self._excluded = excluded
+        self._items = list[BatchExportItem]()
+        self._exporters = list[DependencyGraphExporter]()
+        fn_output_name = fn_output_name or self._output_name_default
+        for root in roots:
+            if isinstance(root, PackageSet):
+                included = root
+            else:
+                included = IndexedPackageSet(dg, [root])
+            self._items.append(BatchExportItem(fn_output_name(included), included))
+            self._exporters.append(DependencyGraphExporter(dg, included, excluded, reduce_edges))
+
+    @property
+    def items(self) -> list[BatchExportItem]:
+        return self._items
+
+    def write_sources(self, directory: Union[Path, str], format: str = "dot") -> list[BatchExportItem]:
+        """Writes one graph source per root, streamed without graphviz.Digraph.
+        Only "dot" sources can be rendered by render_all; "json" and "graphml"
+        are for other tools.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for item, exporter in zip(self._items, self._exporters):
+            start_time = time.perf_counter()
+            source_name = item.name if format == "dot" else f"{item.name}.{format}"
+            item.source_path = directory / source_name
+            exporter.write(item.source_path, format)
+            item.node_count = exporter.node_count
+            item.edge_count = exporter.edge_count
+            item.dropped_edge_count = exporter.dropped_edge_count
+            item.build_secs = time.perf_counter() - start_time
+        return self._items
+
+    def render_all(
+        self,
+        directory: Union[Path, str],
+        format: str = "png",
+        max_workers: Optional[int] = None,
+        text_callback: Optional[Callable[[str], None]] = None,
+        sleep_secs: float = 0.1,
+        cache: Optional[RenderCache] = None,
+    ) -> list[BatchExportItem]:
+        """Writes the DOT sources, then renders them with at most max_workers
+        concurrent "dot" processes (default: the CPU count). With a cache, 
+        roots whose subgraph was already rendered are copied from the cache,
+        and only the others are laid out.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        directory = Path(directory)
+        self.write_sources(directory)
+        init_graphviz_binpath()
+        tasks = list[ShellTask]()
+        pending = list[tuple[BatchExportItem, ShellTask, Optional[str]]]()
+        for item, exporter in zip(self._items, self._exporters):
+            item.output_path = item.source_path.with_name(item.source_path.name + "." + format)
+            key = None
+            if cache is not None:
+                key = exporter.subgraph_key(format)
+                if cache.get_to(key, format, item.output_path) is not None:
+                    item.cache_hit = True
+                    item.render_secs = 0.0
+                    item.succeeded = True
+                    continue
+            task = ShellTask(["dot", f"-T{format}", "-o", str(item.output_path), str(item.source_path)])
+            tasks.append(task)
+            pending.append((item, task, key))
+        if tasks:
+            tle = TaskListExecutor(tasks, max_workers, text_callback, sleep_secs)
+            with multiprocessing.pool.ThreadPool(max_workers) as pool:
+                tle.run(pool)
+        for item, task, key in pending:
+            item.render_secs = task.elapsed_secs
+            item.succeeded = task.outcome == 0
+            if cache is not None and item.succeeded:
+                cache.put(key, format, item.output_path)
+        return self._items
+
+    def format_report(self) -> list[str]:
+        """One line per root, with its node count and timings."""
+        lines = list[str]()
+        for item in self._items:
+            build = f"{item.build_secs:.3f}s" if item.build_secs is not None else "-"
+            render = f"{item.render_secs:.3f}s" if item.render_secs is not None else "-"
+            status = "SUCCESS" if item.succeeded else "FAILURE" if item.succeeded is not None else "-"
+            if item.cache_hit:
+                status += " (cached)"
+            edges = f"{item.edge_count}"
+            if item.dropped_edge_count > 0:
+                edges += f" (-{item.dropped_edge_count})"
+            lines.append(f"{item.name}: nodes={item.node_count} edges={edges} build={build} render={render} {status}")
+        return lines
+
+    def _output_name_default(self, included: PackageSet) -> str:
+        infos = list(included)
+        name = infos[0].path_safe_name + "_deps"
+        if len(infos) >= 2:
+            name += f"_and_{len(infos) - 1}_more"
+        return name
@@ -0,0 +1,150 @@
+from array import array
+from collections.abc import Iterable
+from typing import Optional
+
+from pipdep_proto_20240819._internals.csr_adjacency import CsrAdjacency
+from pipdep_proto_20240819._internals.graph_algorithms import condensation
+
+
+class CondensedGraph:
+    """Condensation of a dependency graph, where each strongly connected
+    component (dependency cycle) is collapsed into a single node, together
+    with a topological layering of the resulting DAG.
+
+    Layer 0 holds the components without dependencies; every other component
+    is in the layer after the deepest of its dependencies. Installing or
+    rebuilding the layers in ascending order therefore always has the
+    dependencies done first, and the components within one layer do not
+    depend on each other.
+    """
+    _node_count: int
+    _components: list[list[int]]
+    _comp_of: array
+    _comp_adj: CsrAdjacency
+    _cyclic: list[bool]
+    _sinks_first: bool
+    _comp_layer: Optional[array]
+    _layers: Optional[list[list[int]]]
+
+    def __init__(self, adj: CsrAdjacency) -> None:
+        assert isinstance(adj, CsrAdjacency)
+        components, comp_of, comp_adj = condensation(adj)
+        cyclic = [len(component) >= 2 for component in components]
+        for idx in range(adj.node_count):
+            if adj.has_edge(idx, idx):
+                cyclic[comp_of[idx]] = True
+        self._init_from(adj.node_count, components, comp_of, comp_adj, cyclic, sinks_first=True)
+
+    def _init_from(
+        self,
+        node_count: int,
+        components: list[list[int]],
+        comp_of: array,
+        comp_adj: CsrAdjacency,
+        cyclic: list[bool],
+        sinks_first: bool,
+    ) -> None:
+        self._node_count = node_count
+        self._components = components
+        self._comp_of = comp_of
+        self._comp_adj = comp_adj
+        self._cyclic = cyclic
+        self._sinks_first = sinks_first
+        self._comp_layer = None
+        self._layers = None
+
+    def reversed(self) -> "CondensedGraph":
+        """Condensation of the reverse graph. The components are the same, so
+        this only transposes the component DAG, without another SCC pass.
+        """
+        rev = CondensedGraph.__new__(CondensedGraph)
+        rev._init_from(
+            self._node_count,
+            self._components,
+            self._comp_of,
+            self._comp_adj.transpose(),
+            self._cyclic,
+            sinks_first=not self._sinks_first,
+        )
+        return rev
+
+    @property
+    def node_count(self) -> int:
+        return self._node_count
+
+    @property
+    def component_count(self) -> int:
+        return len(self._components)
+
+    @property
+    def components(self) -> list[list[int]]:
+        """Members of each component, each sorted."""
+        return self._components
+
+    @property
+    def component_adjacency(self) -> CsrAdjacency:
+        """Edges between components. This is a DAG without self-loops."""
+        return self._comp_adj
+
+    def component_of(self, idx: int) -> int:
+        return self._comp_of[idx]
+
+    def is_cyclic(self, comp_idx: int) -> bool:
+        """Whether the component is a cycle, including a single node with a self-loop."""
+        return self._cyclic[comp_idx]
+
+    def cycles(self) -> list[list[int]]:
+        """Members of each cyclic component."""
+        return [
+            component for comp_idx, component in enumerate(self._components)
+            if self._cyclic[comp_idx]
+        ]
+
+    def sinks_first_order(self) -> Iterable[int]:
+        """Component indices, where every component comes after all components
+        that it has an edge to.
+        """
+        count = len(self._components)
+        return range(count) if self._sinks_first else range(count - 1, -1, -1)
+
+    def layer_of(self, idx: int) -> int:
+        self._ensure_layers()
+        return self._comp_layer[self._comp_of[idx]]
+
+    @property
+    def layer_count(self) -> int:
+        self._ensure_layers()
+        return len(self._layers)
+
+    def layers(self, idxs: Optional[Iterable[int]] = None) -> list[list[int]]:
+        """Node indices per layer, dependencies first. With idxs, only those
+        nodes are kept, and empty layers are dropped.
+        """
+        self._ensure_layers()
+        if idxs is None:
+            return [list(layer) for layer in self._layers]
+        comp_layer = self._comp_layer
+        comp_of = self._comp_of
+        grouped = dict[int, list[int]]()
+        for idx in idxs:
+            grouped.setdefault(comp_layer[comp_of[idx]], list[int]()).append(idx)
+        return [sorted(grouped[layer_idx]) for layer_idx in sorted(grouped)]
+
+    def _ensure_layers(self) -> None:
+        if self._layers is not None:
+            return
+        comp_adj = self._comp_adj
+        comp_layer = array("i", [0]) * len(self._components)
+        layer_count = 0
+        for comp_idx in self.sinks_first_order():
+            layer_idx = 0
+            for succ_idx in comp_adj.neighbors(comp_idx):
+                if comp_layer[succ_idx] >= layer_idx:
+                    layer_idx = comp_layer[succ_idx] + 1
+            comp_layer[comp_idx] = layer_idx
+            layer_count = max(layer_count, layer_idx + 1)
+        layers = [list[int]() for _ in range(layer_count)]
+        for idx in range(self._node_count):
+            layers[comp_layer[self._comp_of[idx]]].append(idx)
+        self._comp_layer = comp_layer
+        self._layers = layers
@@ -0,0 +1,132 @@
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Any, Optional
+
+
+class CsrAdjacency:
+    """Immutable adjacency lists in compressed sparse row (CSR) form.
+
+    The neighbors of node i are targets[offsets[i]:offsets[i + 1]], sorted
+    in ascending order and without duplicates. Both arrays are array("i").
+    """
+    _offsets: array
+    _targets: array
+
+    def __init__(self, offsets: array, targets: array) -> None:
+        assert isinstance(offsets, array) and offsets.typecode == "i"
+        assert isinstance(targets, array) and targets.typecode == "i"
+        assert len(offsets) >= 1 and offsets[0] == 0 and offsets[-1] == len(targets)
+        self._offsets = offsets
+        self._targets = targets
+
+    @classmethod
+    def from_lists(cls, lists: Iterable[Iterable[int]]) -> "CsrAdjacency":
+        offsets = array("i", [0])
+        targets = array("i")
+        for neighbors in lists:
+            targets.extend(sorted(set(neighbors)))
+            offsets.append(len(targets))
+        return cls(offsets, targets)
+
+    @property
+    def offsets(self) -> array:
+        return self._offsets
+
+    @property
+    def targets(self) -> array:
+        return self._targets
+
+    @property
+    def node_count(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._targets)
+
+    def neighbors(self, idx: int) -> array:
+        offsets = self._offsets
+        return self._targets[offsets[idx]:offsets[idx + 1]]
+
+    def degree(self, idx: int) -> int:
+        return self._offsets[idx + 1] - self._offsets[idx]
+
+    def has_edge(self, idx: int, target: int) -> bool:
+        offsets = self._offsets
+        return target in self._targets[offsets[idx]:offsets[idx + 1]]
+
+    def with_replaced(
+        self,
+        replacements: Mapping[int, Iterable[int]],
+        node_count: Optional[int] = None,
+    ) -> "CsrAdjacency":
+        """Returns a copy where the neighbors of some nodes are replaced.
+        Nodes at or beyond the current node_count (up to the new node_count)
+        have no neighbors unless replaced.
+        """
+        if node_count is None:
+            node_count = self.node_count
+        assert node_count >= self.node_count
+        old_count = self.node_count
+        offsets = array("i", [0])
+        targets = array("i")
+        for idx in range(node_count):
+            replacement = replacements.get(idx)
+            if replacement is not None:
+                targets.extend(sorted(set(replacement)))
+            elif idx < old_count:
+                targets.extend(self.neighbors(idx))
+            offsets.append(len(targets))
+        return CsrAdjacency(offsets, targets)
+
+    def transpose(self) -> "CsrAdjacency":
+        """Returns the adjacency with every edge reversed."""
+        node_count = self.node_count
+        src_offsets = self._offsets
+        src_targets = self._targets
+        counts = [0] * (node_count + 1)
+        for target in src_targets:
+            counts[target + 1] += 1
+        for idx in range(node_count):
+            counts[idx + 1] += counts[idx]
+        offsets = array("i", counts)
+        targets = array("i", [0]) * len(src_targets)
+        positions = counts[:-1]
+        for idx in range(node_count):
+            for pos in range(src_offsets[idx], src_offsets[idx + 1]):
+                target = src_targets[pos]
+                targets[positions[target]] = idx
+                positions[target] += 1
+        return CsrAdjacency(offsets, targets)
+
+    def to_numpy(self) -> tuple[Any, Any]:
+        """Returns (offsets, targets) as NumPy int32 arrays sharing the same memory.
+        Requires NumPy, which is imported lazily.
+        """
+        import numpy as np
+        return (
+            np.frombuffer(self._offsets, dtype=np.int32),
+            np.frombuffer(self._targets, dtype=np.int32),
+        )
+
+
+class CsrAdjacencyView(Mapping[int, frozenset[int]]):
+    """Read-only Mapping view of a CsrAdjacency, in the shape of dict[int, set[int]]."""
+    _adj: CsrAdjacency
+
+    def __init__(self, adj: CsrAdjacency) -> None:
+        self._adj = adj
+
+    def __getitem__(self, idx: int) -> frozenset[int]:
+        if not isinstance(idx, int) or not (0 <= idx < self._adj.node_count):
+            raise KeyError(idx)
+        return frozenset(self._adj.neighbors(idx))
+
+    def __len__(self) -> int:
+        return self._adj.node_count
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._adj.node_count))
+
+    def __contains__(self, idx: object) -> bool:
+        return isinstance(idx, int) and 0 <= idx < self._adj.node_count
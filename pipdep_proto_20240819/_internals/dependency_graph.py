@@ -1,29 +1,461 @@
-from collections.abc import Mapping
+from array import array
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+import hashlib
 import json
 from os.path import isdir
 from pathlib import Path
 from typing import Optional, Union
 
 from pipdep_proto_20240819._internals.package_info import PackageInfo
+from pipdep_proto_20240819._internals.condensed_graph import CondensedGraph
+from pipdep_proto_20240819._internals.csr_adjacency import CsrAdjacency, CsrAdjacencyView
+from pipdep_proto_20240819._internals.reachability_index import ReachabilityIndex, iter_bits, transitive_reduction
+from pipdep_proto_20240819._internals.trigram_index import TrigramIndex
+from pipdep_proto_20240819._internals.dependency_graph_snapshot import (
+    DependencyGraphSnapshot,
+    default_snapshot_path,
+    stat_source_files,
+    write_snapshot,
+    SECTION_FILE_NAMES,
+    SECTION_FILE_NODES,
+    SECTION_NODE_NAMES,
+    SECTION_NODE_PATH_SAFE_NAMES,
+    SECTION_NODE_VERSIONS,
+    SECTION_ALIAS_OFFSETS,
+    SECTION_ALIAS_TARGETS,
+    SECTION_DEPNAME_OFFSETS,
+    SECTION_DEPNAME_TARGETS,
+    SECTION_REQBY_OFFSETS,
+    SECTION_REQBY_TARGETS,
+    SECTION_LOOKUP_KEYS,
+    SECTION_LOOKUP_VALUES,
+    SECTION_DEPS_OFFSETS,
+    SECTION_DEPS_TARGETS,
+)
+
+@dataclass
+class SourceFileEntry:
+    """Index entry for one json file in the source dir.
+
+    Attributes:
+        path: Path
+            Path to the json file.
+        mtime_ns: int
+        size: int
+            File stats when the json file was last parsed.
+        digest: Optional[str]
+            Hash of the file content when it was last parsed. None if the graph
+            was loaded from a snapshot and the file has not been read since.
+        _internal_id: int = -1
+            Internal identifier of the package parsed from the file.
+    """
+    path: Path
+    mtime_ns: int
+    size: int
+    digest: Optional[str] = None
+    _internal_id: int = -1
+
 
 class DependencyGraph:
     """
         installed: list[PackageInfo]
-            List of installed packages.
+            List of installed packages. Packages removed by refresh() keep their 
+            slot, so that the indices of other packages stay stable; a removed 
+            package has no version and no entry in lookup. Use iter_installed()
+            to skip the removed packages.
         lookup: dict[str, int]
             Lookup table for package names and aliases. Each is mapped into the index
             on the installed list.
-        deps: dict[int, set[int]]
-            Dependency graph. The key is the index of the package on the installed list.
-            The value is the set of indices of the dependent packages.
+        deps: Mapping[int, frozenset[int]]
+            Dependency graph, as a read-only view. The key is the index of the package
+            on the installed list. The value is the set of indices of the dependent packages.
+            Traversals should prefer iter_dependencies() and iter_dependents(), which
+            read the underlying CSR arrays without building sets.
     """
     source_dir: Path
     json_files: list[Path]
     installed: list[PackageInfo]
     lookup: dict[str, int]
-    deps: dict[int, set[int]]
+    _file_index: dict[str, SourceFileEntry]
+    _fwd: CsrAdjacency
+    _rev: CsrAdjacency
+    _condensed: Optional[CondensedGraph]
+    _reachability: Optional[ReachabilityIndex]
+    _reverse_reachability: Optional[ReachabilityIndex]
+    _name_index: Optional[TrigramIndex]
+    _unresolved: Optional[dict[str, set[int]]]
+    _removed_slots: dict[str, int]
+    _generation: int
 
     def __init__(self, source_dir: Union[Path, str]):
+        self._init_empty(source_dir)
+        self._list_json_files()
+        self._parse_json_files()
+        self._compute_dependencies()
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        source_dir: Union[Path, str],
+        snapshot_path: Union[Path, str, None] = None,
+        rebuild_if_stale: bool = True,
+    ) -> "DependencyGraph":
+        """Loads the graph from a compiled snapshot file, without opening any 
+        of the json files.
+
+        The snapshot is validated against the json file names, mtimes and sizes
+        in the source dir. If the snapshot is missing, stale or corrupt, the 
+        graph is rebuilt from the json files and the snapshot is rewritten, unless
+        rebuild_if_stale is False, in which case ValueError is raised.
+        """
+        if snapshot_path is None:
+            snapshot_path = default_snapshot_path(source_dir)
+        snapshot_path = Path(snapshot_path)
+        dg = cls.__new__(cls)
+        dg._init_empty(source_dir)
+        if snapshot_path.is_file():
+            try:
+                with DependencyGraphSnapshot(snapshot_path) as snapshot:
+                    if snapshot.is_valid_for(dg.source_dir):
+                        dg._load_snapshot(snapshot)
+                        return dg
+            except (ValueError, IndexError) as exc:
+                ### ValueError for a malformed file; IndexError for section
+                ### contents that refer outside of other sections.
+                if not rebuild_if_stale:
+                    raise
+                print(f"Warning: snapshot {snapshot_path} is unreadable ({exc}); rebuilding.")
+        if not rebuild_if_stale:
+            raise ValueError(f"Snapshot {snapshot_path} is missing or stale.")
+        dg = cls(source_dir)
+        dg.to_snapshot(snapshot_path)
+        return dg
+
+    def to_snapshot(self, snapshot_path: Union[Path, str, None] = None) -> Path:
+        """Writes the graph into a compiled snapshot file, and returns its path."""
+        if snapshot_path is None:
+            snapshot_path = default_snapshot_path(self.source_dir)
+        snapshot_path = Path(snapshot_path)
+        write_snapshot(
+            snapshot_path,
+            source_files={
+                name: (entry.mtime_ns, entry.size) for name, entry in self._file_index.items()
+            },
+            file_names=list(self._file_index.keys()),
+            file_nodes=[entry._internal_id for entry in self._file_index.values()],
+            installed=self.installed,
+            lookup=self.lookup,
+            deps_offsets=self._fwd.offsets,
+            deps_targets=self._fwd.targets,
+        )
+        return snapshot_path
+
+    @property
+    def deps(self) -> Mapping[int, frozenset[int]]:
+        return CsrAdjacencyView(self._fwd)
+
+    @property
+    def forward_adjacency(self) -> CsrAdjacency:
+        """Dependencies of each package, in CSR form."""
+        return self._fwd
+
+    @property
+    def reverse_adjacency(self) -> CsrAdjacency:
+        """Dependents of each package, in CSR form."""
+        return self._rev
+
+    def iter_installed(self) -> Iterable[PackageInfo]:
+        """Iterates over the installed packages in index order, skipping the
+        slots of packages removed by refresh().
+        """
+        removed_idxs = set[int](self._removed_slots.values())
+        return (pkinfo for pkinfo in self.installed if pkinfo._internal_id not in removed_idxs)
+
+    def is_removed(self, idx: int) -> bool:
+        """Whether the slot belongs to a package removed by refresh()."""
+        return self._removed_slots.get(self.installed[idx].path_safe_name) == idx
+
+    def iter_dependencies(self, idx: int) -> Iterable[int]:
+        """Iterates over the indices of the packages that the package depends on."""
+        return self._fwd.neighbors(idx)
+
+    def iter_dependents(self, idx: int) -> Iterable[int]:
+        """Iterates over the indices of the packages that depend on the package."""
+        return self._rev.neighbors(idx)
+
+    @property
+    def condensed(self) -> CondensedGraph:
+        """Dependency cycles collapsed into single nodes, with a topological 
+        layering. Built on first use, and rebuilt after the graph changes.
+        """
+        if self._condensed is None:
+            self._condensed = CondensedGraph(self._fwd)
+        return self._condensed
+
+    def dependency_cycles(self) -> list[list[int]]:
+        """Indices of the packages in each dependency cycle."""
+        return self.condensed.cycles()
+
+    def install_layers(
+        self,
+        items: Optional[Iterable[Union[int, str, PackageInfo]]] = None,
+    ) -> list[list[int]]:
+        """Package indices grouped into layers, dependencies first. The packages
+        within a layer do not depend on each other, except for the members of a
+        dependency cycle, which always share a layer.
+
+        Args:
+            items: Optional[Iterable[Union[int, str, PackageInfo]]]
+                If given, only these packages and everything they transitively 
+                depend on are included. Otherwise, all installed packages.
+        """
+        if items is None:
+            idxs = set(self.lookup.values())
+        else:
+            idxs = self.closure_union(items, include_self=True)
+        return self.condensed.layers(idxs)
+
+    def install_order(
+        self,
+        items: Optional[Iterable[Union[int, str, PackageInfo]]] = None,
+    ) -> list[int]:
+        """Package indices in install order, i.e. install_layers() flattened."""
+        return [idx for layer in self.install_layers(items) for idx in layer]
+
+    def task_prerequisites(
+        self,
+        items: Iterable[Union[int, str, PackageInfo]],
+    ) -> dict[int, list[int]]:
+        """Prerequisites for running one task per package (e.g. with 
+        TaskListExecutor), so that each package's task runs after the tasks of
+        the packages it transitively depends on.
+
+        Returns:
+            dict[int, list[int]]:
+                Maps each position in items to the positions of its prerequisite
+                tasks. Implied prerequisites are dropped (transitive reduction), 
+                and packages in the same dependency cycle do not wait on each
+                other.
+        """
+        idxs = [self._resolve_idx(item) for item in items]
+        pos_of = {idx: pos for pos, idx in enumerate(idxs)}
+        if len(pos_of) != len(idxs):
+            raise ValueError("Duplicate packages in items.")
+        item_bits = 0
+        for idx in idxs:
+            item_bits |= 1 << idx
+        condensed = self.condensed
+        lists = list[list[int]]()
+        for idx in idxs:
+            comp_idx = condensed.component_of(idx)
+            reached = self.reachability.closure_bits(idx) & item_bits
+            lists.append([
+                pos_of[dep_idx] for dep_idx in iter_bits(reached)
+                if condensed.component_of(dep_idx) != comp_idx
+            ])
+        reduced = transitive_reduction(CsrAdjacency.from_lists(lists))
+        return {
+            pos: list(reduced.neighbors(pos))
+            for pos in range(reduced.node_count) if reduced.degree(pos) > 0
+        }
+
+    @property
+    def reachability(self) -> ReachabilityIndex:
+        """Transitive closure index. Built on first use, and rebuilt after the
+        graph changes.
+        """
+        if self._reachability is None:
+            self._reachability = ReachabilityIndex(self.condensed)
+        return self._reachability
+
+    @property
+    def reverse_reachability(self) -> ReachabilityIndex:
+        """Transitive closure index over the reverse edges, i.e. the transitive
+        dependents of each package. Built on first use, and rebuilt after the 
+        graph changes.
+        """
+        if self._reverse_reachability is None:
+            self._reverse_reachability = ReachabilityIndex(self.condensed.reversed())
+        return self._reverse_reachability
+
+    def dependents(self, item: Union[int, str, PackageInfo], transitive: bool = True) -> list[int]:
+        """Indices of the packages that depend on the package, i.e. the packages
+        that may break if it is upgraded.
+        """
+        idx = self._resolve_idx(item)
+        if not transitive:
+            return list(self._rev.neighbors(idx))
+        return self.reverse_reachability.closure(idx)
+
+    def dependents_batch(
+        self,
+        items: Iterable[Union[int, str, PackageInfo]],
+        transitive: bool = True,
+        per_package: bool = False,
+    ) -> Union[list[int], dict[int, list[int]]]:
+        """Impact of upgrading several packages at once.
+
+        Returns:
+            With per_package, a dict from each package index to the indices of its
+            dependents. Otherwise, the sorted indices of the union of all dependents,
+            which may include some of the given packages if they depend on each other.
+        """
+        idxs = [self._resolve_idx(item) for item in items]
+        if per_package:
+            return {idx: self.dependents(idx, transitive) for idx in idxs}
+        if not transitive:
+            return sorted(set[int]().union(*(self._rev.neighbors(idx) for idx in idxs)))
+        return self.reverse_reachability.closure_union(idxs, include_self=False)
+
+    def check_required_by(self) -> list[tuple[str, str, str]]:
+        """Cross-checks the computed reverse edges against the "Required-by" field
+        reported by pip for each package.
+
+        Returns:
+            list[tuple[str, str, str]]:
+                One tuple per mismatch, containing the package name, the dependent
+                name, and the kind of mismatch: "computed_only" if the graph has the
+                edge but pip did not report it, or "reported_only" if pip reported 
+                it but the graph does not have it.
+        """
+        mismatches = list[tuple[str, str, str]]()
+        for idx in set(self.lookup.values()):
+            pkinfo = self.installed[idx]
+            computed = {
+                self.installed[dep_idx].path_safe_name: self.installed[dep_idx].name
+                for dep_idx in self._rev.neighbors(idx)
+            }
+            reported = {self._normalize_name(name): name for name in pkinfo.required_by}
+            for n_name in sorted(computed.keys() - reported.keys()):
+                mismatches.append((pkinfo.name, computed[n_name], "computed_only"))
+            for n_name in sorted(reported.keys() - computed.keys()):
+                mismatches.append((pkinfo.name, reported[n_name], "reported_only"))
+        mismatches.sort()
+        return mismatches
+
+    def depends_on(self, item: Union[int, str, PackageInfo], dep_item: Union[int, str, PackageInfo]) -> bool:
+        """Whether the package transitively depends on dep_item."""
+        return self.reachability.depends_on(self._resolve_idx(item), self._resolve_idx(dep_item))
+
+    def closure(self, item: Union[int, str, PackageInfo], include_self: bool = False) -> list[int]:
+        """Indices of all packages that the package transitively depends on."""
+        return self.reachability.closure(self._resolve_idx(item), include_self)
+
+    def closure_size(self, item: Union[int, str, PackageInfo], include_self: bool = False) -> int:
+        """Number of packages that the package transitively depends on."""
+        return self.reachability.closure_size(self._resolve_idx(item), include_self)
+
+    def closure_union(
+        self, 
+        items: Iterable[Union[int, str, PackageInfo]], 
+        include_self: bool = True,
+    ) -> list[int]:
+        """Indices of all packages that any of the packages transitively depends on,
+        computed as a single union of bitsets.
+        """
+        return self.reachability.closure_union(
+            [self._resolve_idx(item) for item in items], include_self,
+        )
+
+    def refresh(self) -> tuple[list[str], list[str], list[str]]:
+        """Updates the graph in place from the json files in the source dir.
+
+        Only the json files that were added, changed or removed since the last
+        parse are read. Files whose mtime changed but whose content hash did not
+        are not re-parsed. The _internal_id of every untouched package stays the
+        same, and a package that is removed then added back reuses its old slot.
+
+        Returns:
+            tuple[list[str], list[str], list[str]]:
+                Names of the json files that were added, changed and removed.
+        """
+        new_stats = stat_source_files(self.source_dir)
+        added = [name for name in new_stats if name not in self._file_index]
+        removed = [name for name in self._file_index if name not in new_stats]
+        changed = list[str]()
+        changed_raws = dict[str, bytes]()
+        for name, (mtime_ns, size) in new_stats.items():
+            entry = self._file_index.get(name)
+            if entry is None or (entry.mtime_ns, entry.size) == (mtime_ns, size):
+                continue
+            raw = entry.path.read_bytes()
+            entry.mtime_ns, entry.size = mtime_ns, size
+            if self._hash_bytes(raw) == entry.digest:
+                continue
+            changed.append(name)
+            changed_raws[name] = raw
+        if not (added or removed or changed):
+            return added, changed, removed
+        self._ensure_unresolved()
+        affected = set[int]()
+        replaced_deps = dict[int, list[int]]()
+        outdated = set[str](removed).union(changed)
+        still_parsed = set[int](
+            entry._internal_id for name, entry in self._file_index.items() if name not in outdated
+        )
+        for name in outdated:
+            idx = self._file_index[name]._internal_id
+            if idx not in still_parsed and idx not in self._removed_slots.values():
+                affected.update(self._remove_package(idx))
+                replaced_deps[idx] = list[int]()
+        for name in removed:
+            del self._file_index[name]
+        for name in added:
+            mtime_ns, size = new_stats[name]
+            self._file_index[name] = SourceFileEntry(self.source_dir / name, mtime_ns, size)
+        for name in changed + added:
+            entry = self._file_index[name]
+            raw = changed_raws[name] if name in changed_raws else entry.path.read_bytes()
+            idx = self._parse_json_bytes(entry, raw)
+            affected.add(idx)
+            affected.update(self._unresolved.pop(self.installed[idx].path_safe_name, ()))
+        removed_idxs = set[int](self._removed_slots.values())
+        for idx in sorted(affected):
+            if idx not in removed_idxs:
+                replaced_deps[idx] = self._resolve_dependencies_of(idx)
+        self._set_forward_adjacency(
+            self._fwd.with_replaced(replaced_deps, node_count=len(self.installed))
+        )
+        self.json_files = [entry.path for entry in self._file_index.values()]
+        self._name_index = None
+        self._generation += 1
+        return added, changed, removed
+
+    def search_alike(
+        self, 
+        pattern: str, 
+        limit: Optional[int] = None,
+        min_similarity: float = 0.3,
+    ) -> list[PackageInfo]:
+        """Finds installed packages whose names or aliases resemble the pattern.
+
+        A package matches if its name contains every "_"-separated fragment of 
+        the normalized pattern, or if the trigram similarity of its name to the 
+        pattern is at least min_similarity. Results are ranked with substring 
+        matches first, then by similarity.
+        """
+        n_pattern = self._normalize_name(pattern)
+        matches = self.name_index.search(
+            n_pattern, 
+            fragments=n_pattern.split("_"), 
+            limit=limit, 
+            min_similarity=min_similarity,
+        )
+        return [self.installed[idx] for idx, _ in matches]
+
+    @property
+    def name_index(self) -> TrigramIndex:
+        """Trigram index over the normalized names and aliases in lookup. 
+        Built on first use, and rebuilt after refresh() changes the graph.
+        """
+        if self._name_index is None:
+            self._name_index = TrigramIndex(
+                (self._normalize_name(name), idx) for name, idx in self.lookup.items()
+            )
+        return self._name_index
+
+    def _init_empty(self, source_dir: Union[Path, str]) -> None:
         if not isinstance(source_dir, Path):
             source_dir = Path(source_dir)
         assert source_dir.is_dir()
@@ -31,48 +463,161 @@ class DependencyGraph:
         self.json_files = None
         self.installed = list[PackageInfo]()
         self.lookup = dict[str, int]()
-        self.deps = dict[int, set[int]]()
-        self._list_json_files()
-        self._parse_json_files()
-        self._compute_dependencies()
-
-    def search_alike(self, pattern: str) -> list[PackageInfo]:
-        patterns = self._normalize_name(pattern).split("_")
-        idx_matches = set[int]()
-        for lookup_name, idx in self.lookup.items():
-            if all((sub_pattern in lookup_name) for sub_pattern in patterns):
-                idx_matches.add(idx)
-        return [
-            self.installed[idx] for idx in sorted(idx_matches)
-        ]
+        self._file_index = dict[str, SourceFileEntry]()
+        self._fwd = CsrAdjacency.from_lists([])
+        self._rev = CsrAdjacency.from_lists([])
+        self._condensed = None
+        self._reachability = None
+        self._reverse_reachability = None
+        self._unresolved = None
+        self._removed_slots = dict[str, int]()
+        self._name_index = None
+        self._generation = 0
 
     def _list_json_files(self):
-        self.json_files = list[Path]()
-        for entry in self.source_dir.iterdir():
-            if entry.is_file() and entry.name.endswith(".json"):
-                self.json_files.append(entry)
+        for name, (mtime_ns, size) in stat_source_files(self.source_dir).items():
+            self._file_index[name] = SourceFileEntry(self.source_dir / name, mtime_ns, size)
+        self.json_files = [entry.path for entry in self._file_index.values()]
+
+    def _load_snapshot(self, snapshot: DependencyGraphSnapshot) -> None:
+        strings = snapshot.get_strings()
+        source_files = snapshot.get_source_files()
+        file_nodes = snapshot.section(SECTION_FILE_NODES)
+        for file_idx, sid in enumerate(snapshot.section(SECTION_FILE_NAMES)):
+            name = strings[sid]
+            mtime_ns, size = source_files[name]
+            self._file_index[name] = SourceFileEntry(
+                self.source_dir / name, mtime_ns, size, _internal_id=file_nodes[file_idx],
+            )
+        self.json_files = [entry.path for entry in self._file_index.values()]
+        names = snapshot.section(SECTION_NODE_NAMES)
+        path_safe_names = snapshot.section(SECTION_NODE_PATH_SAFE_NAMES)
+        versions = snapshot.section(SECTION_NODE_VERSIONS)
+        alias_offsets = snapshot.section(SECTION_ALIAS_OFFSETS)
+        alias_targets = snapshot.section(SECTION_ALIAS_TARGETS).tolist()
+        depname_offsets = snapshot.section(SECTION_DEPNAME_OFFSETS)
+        depname_targets = snapshot.section(SECTION_DEPNAME_TARGETS).tolist()
+        reqby_offsets = snapshot.section(SECTION_REQBY_OFFSETS)
+        reqby_targets = snapshot.section(SECTION_REQBY_TARGETS).tolist()
+        for idx in range(len(names)):
+            version_sid = versions[idx]
+            pkinfo = PackageInfo(
+                strings[names[idx]],
+                path_safe_name=strings[path_safe_names[idx]],
+                version=strings[version_sid] if version_sid >= 0 else None,
+                aliases={strings[sid] for sid in alias_targets[alias_offsets[idx]:alias_offsets[idx + 1]]},
+                dependencies=[strings[sid] for sid in depname_targets[depname_offsets[idx]:depname_offsets[idx + 1]]],
+                required_by=[strings[sid] for sid in reqby_targets[reqby_offsets[idx]:reqby_offsets[idx + 1]]],
+            )
+            pkinfo._internal_id = idx
+            self.installed.append(pkinfo)
+        self._set_forward_adjacency(CsrAdjacency(
+            array("i", snapshot.section(SECTION_DEPS_OFFSETS)),
+            array("i", snapshot.section(SECTION_DEPS_TARGETS)),
+        ))
+        lookup_keys = snapshot.section(SECTION_LOOKUP_KEYS)
+        lookup_values = snapshot.section(SECTION_LOOKUP_VALUES)
+        for key_sid, idx in zip(lookup_keys, lookup_values):
+            self.lookup[strings[key_sid]] = idx
+        live_idxs = set[int](self.lookup.values())
+        for pkinfo in self.installed:
+            if pkinfo._internal_id not in live_idxs:
+                self._removed_slots[pkinfo.path_safe_name] = pkinfo._internal_id
 
     def _parse_json_files(self):
-        data: Mapping = None
-        for json_file in self.json_files:
-            with json_file.open() as f:
-                data = json.load(f)
-            name: str = data["Name"]
-            pkinfo = self._add_or_get_package(name)
-            pkinfo.version = data["Version"]
-            pkinfo.dependencies = self._split_comma(data.get("Requires", ""))
+        for entry in self._file_index.values():
+            self._parse_json_bytes(entry, entry.path.read_bytes())
+
+    def _parse_json_bytes(self, entry: SourceFileEntry, raw: bytes) -> int:
+        data: Mapping = json.loads(raw)
+        name: str = data["Name"]
+        pkinfo = self._add_or_get_package(name)
+        pkinfo.version = data["Version"]
+        pkinfo.dependencies = self._split_comma(data.get("Requires", ""))
+        pkinfo.required_by = self._split_comma(data.get("Required-by", ""))
+        entry.digest = self._hash_bytes(raw)
+        entry._internal_id = pkinfo._internal_id
+        return pkinfo._internal_id
 
     def _compute_dependencies(self):
+        self._unresolved = dict[str, set[int]]()
+        self._set_forward_adjacency(CsrAdjacency.from_lists(
+            self._resolve_dependencies_of(pkinfo._internal_id) for pkinfo in self.installed
+        ))
+
+    def _set_forward_adjacency(self, fwd: CsrAdjacency) -> None:
+        assert fwd.node_count == len(self.installed)
+        self._fwd = fwd
+        self._rev = fwd.transpose()
+        self._condensed = None
+        self._reachability = None
+        self._reverse_reachability = None
+
+    def _resolve_dependencies_of(self, idx: int) -> list[int]:
+        self._clear_unresolved_of(idx)
+        pkinfo = self.installed[idx]
+        dep_idxs = list[int]()
+        for dep_name in pkinfo.dependencies:
+            dep_pkinfo = self._try_get_package(dep_name)
+            if dep_pkinfo is None:
+                print(f"Warning: {pkinfo.name} depends on {dep_name}, but it is not installed")
+                self._unresolved.setdefault(self._normalize_name(dep_name), set()).add(idx)
+                continue
+            dep_idxs.append(dep_pkinfo._internal_id)
+        return dep_idxs
+
+    def _clear_unresolved_of(self, idx: int) -> None:
+        for dep_name in self.installed[idx].dependencies:
+            dependents = self._unresolved.get(self._normalize_name(dep_name))
+            if dependents is not None:
+                dependents.discard(idx)
+
+    def _ensure_unresolved(self) -> None:
+        if self._unresolved is not None:
+            return
+        self._unresolved = dict[str, set[int]]()
+        removed_idxs = set[int](self._removed_slots.values())
         for pkinfo in self.installed:
-            idx = pkinfo._internal_id
-            self.deps[idx] = set()
+            if pkinfo._internal_id in removed_idxs:
+                continue
             for dep_name in pkinfo.dependencies:
-                dep_pkinfo = self._try_get_package(dep_name)
-                if dep_pkinfo is None:
-                    print(f"Warning: {pkinfo.name} depends on {dep_name}, but it is not installed")
-                    continue
-                dep_idx = dep_pkinfo._internal_id
-                self.deps[idx].add(dep_idx)
+                if self._try_get_package(dep_name) is None:
+                    n_dep_name = self._normalize_name(dep_name)
+                    self._unresolved.setdefault(n_dep_name, set()).add(pkinfo._internal_id)
+
+    def _remove_package(self, idx: int) -> set[int]:
+        """Removes a package while keeping its slot, and returns the indices of
+        the packages that depended on it. The edges are dropped by the caller,
+        when the adjacency is rebuilt.
+        """
+        pkinfo = self.installed[idx]
+        dependents = set[int](self._rev.neighbors(idx))
+        self._clear_unresolved_of(idx)
+        for alias in pkinfo.aliases:
+            if self.lookup.get(alias) == idx:
+                del self.lookup[alias]
+        pkinfo.version = None
+        pkinfo.aliases = set[str]()
+        pkinfo.dependencies = list[str]()
+        pkinfo.required_by = list[str]()
+        self._removed_slots[pkinfo.path_safe_name] = idx
+        return dependents
+
+    def _resolve_idx(self, item: Union[int, str, PackageInfo]) -> int:
+        if isinstance(item, PackageInfo):
+            idx = item._internal_id
+        elif isinstance(item, int):
+            idx = item
+        elif isinstance(item, str):
+            pkinfo = self._try_get_package(item)
+            if pkinfo is None:
+                raise KeyError(f"Package not installed: {item!r}")
+            idx = pkinfo._internal_id
+        else:
+            raise TypeError(f"Unsupported item type: {type(item)}")
+        if not (0 <= idx < len(self.installed)):
+            raise KeyError(f"Invalid package index: {idx}")
+        return idx
 
     def _try_get_package(self, name: str) -> Optional[PackageInfo]:
         n_name = self._normalize_name(name)
@@ -89,10 +634,15 @@ class DependencyGraph:
             assert pkinfo._internal_id == idx
             pkinfo.aliases.add(name)
             return pkinfo
-        idx = len(self.installed)
-        pkinfo = PackageInfo(name, path_safe_name=n_name)
-        pkinfo._internal_id = idx
-        self.installed.append(pkinfo)
+        idx = self._removed_slots.pop(n_name, -1)
+        if idx >= 0:
+            pkinfo = self.installed[idx]
+            pkinfo.name = name
+        else:
+            idx = len(self.installed)
+            pkinfo = PackageInfo(name, path_safe_name=n_name)
+            pkinfo._internal_id = idx
+            self.installed.append(pkinfo)
         self.lookup[n_name] = idx
         pkinfo.aliases.add(n_name)
         if name != n_name:
@@ -100,6 +650,9 @@ class DependencyGraph:
             pkinfo.aliases.add(name)
         return pkinfo
 
+    def _hash_bytes(self, raw: bytes) -> str:
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
     def _normalize_name(self, name: str) -> str:
         return "".join(
             c if c.isalnum() else "_" for c in name.lower()
@@ -1,40 +1,103 @@
 from collections import deque
 from collections.abc import Iterable
-from typing import Any, Optional, Union
-
-import graphviz
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
 
 from pipdep_proto_20240819._internals._graphviz.graphviz_setup import init_graphviz_binpath
+from pipdep_proto_20240819._internals.csr_adjacency import CsrAdjacency
 from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.graph_writers import GRAPH_WRITERS, GraphFile
 from pipdep_proto_20240819._internals.package_info import PackageInfo
-from pipdep_proto_20240819._internals.package_set import PackageSet
+from pipdep_proto_20240819._internals.package_set import IndexedPackageSet, PackageSet
+from pipdep_proto_20240819._internals.reachability_index import transitive_reduction
+from pipdep_proto_20240819._internals.render_cache import RenderCache, make_subgraph_key
+
+if TYPE_CHECKING:
+    import graphviz
 
 
 class DependencyGraphExporter:
-    """Renders a DependencyGraph into a graphviz.Digraph object.
+    """Renders a DependencyGraph into a graphviz.Digraph object, or streams it
+    directly to a DOT, node-link JSON, or GraphML file with write(). The graphviz
+    package is only imported by export_digraph and render.
+
+    With reduce_edges, only the edges that are not implied by other paths among
+    the exported packages are emitted (transitive reduction), which cuts the
+    layout time of deep graphs. The number of dropped edges is then available
+    as dropped_edge_count.
     """
     _dg: DependencyGraph
     _included: PackageSet
     _excluded: Optional[PackageSet]
-    _filtered: Optional[PackageSet]
+    _filtered: Optional[IndexedPackageSet]
+    _reduce_edges: bool
+    _edges: Optional[list[tuple[int, int]]]
+    _dropped_edge_count: int
 
     def __init__(
         self, 
         dg: DependencyGraph,
         included: PackageSet,
         excluded: Optional[PackageSet] = None,
+        reduce_edges: bool = False,
     ) -> None:
         assert isinstance(dg, DependencyGraph)
         assert isinstance(included, PackageSet)
         if excluded is not None:
             assert isinstance(excluded, PackageSet)
-            assert excluded._idxs.isdisjoint(included._idxs)
+            if isinstance(excluded, IndexedPackageSet):
+                assert excluded.isdisjoint(included)
+            else:
+                assert excluded._idxs.isdisjoint(included._idxs)
         self._dg = dg
         self._included = included
         self._excluded = excluded
         self._filtered = None
+        self._reduce_edges = reduce_edges
+        self._edges = None
+        self._dropped_edge_count = 0
+
+    @property
+    def exported_packages(self) -> IndexedPackageSet:
+        """The packages that are exported: the included packages and what they
+        transitively depend on, without the excluded packages and what is only
+        reachable through them.
+        """
+        self._ensure_graph_built()
+        return self._filtered
+
+    @property
+    def node_count(self) -> int:
+        """Number of exported packages."""
+        return len(self.exported_packages)
 
-    def export_digraph(self, *args, **kwargs) -> graphviz.Digraph:
+    @property
+    def dropped_edge_count(self) -> int:
+        """Number of edges removed by the transitive reduction."""
+        self._ensure_edges_built()
+        return self._dropped_edge_count
+
+    @property
+    def edge_count(self) -> int:
+        """Number of exported edges, after the transitive reduction if enabled."""
+        if self._reduce_edges:
+            self._ensure_edges_built()
+            return len(self._edges)
+        return sum(1 for _ in self._iter_filtered_edges())
+
+    def write(self, file: GraphFile, format: str = "dot") -> None:
+        """Streams the graph to a path or text file object, without building a
+        graphviz.Digraph. The format is one of "dot", "json" (node-link), or 
+        "graphml".
+        """
+        fn_write = GRAPH_WRITERS.get(format)
+        if fn_write is None:
+            raise ValueError(f"Unsupported graph format: {format}")
+        self._ensure_graph_built()
+        fn_write(file, self._filtered, self._iter_filtered_edges())
+
+    def export_digraph(self, *args, **kwargs) -> "graphviz.Digraph":
+        import graphviz
         self._ensure_graph_built()
         init_graphviz_binpath()
         dot = graphviz.Digraph(*args, **kwargs)
@@ -45,33 +108,117 @@ class DependencyGraphExporter:
             name = pkinfo.name
             s_version = str(pkinfo.version)
             dot.node(str(idx), name + r"\n" + str(s_version))
+        for idx, dep_idx in self._iter_filtered_edges():
+            dot.edge(str(idx), str(dep_idx))
+        return dot
+
+    def subgraph_key(self, format: str, *args, **kwargs) -> str:
+        """Stable hash of the filtered subgraph, the output format, and the 
+        arguments that would be passed to export_digraph.
+        """
+        self._ensure_graph_built()
+        return make_subgraph_key(
+            nodes=[
+                (pkinfo._internal_id, pkinfo.name, str(pkinfo.version))
+                for pkinfo in self._filtered
+            ],
+            edges=self._iter_filtered_edges(),
+            options={"format": format, "args": args, "kwargs": kwargs},
+        )
+
+    def render(
+        self,
+        directory: Union[Path, str],
+        filename: str,
+        format: str = "png",
+        cache: Optional[RenderCache] = None,
+        *args,
+        **kwargs,
+    ) -> Path:
+        """Renders the graph to "<directory>/<filename>.<format>", and returns 
+        that path. With a cache, a previously rendered identical subgraph is 
+        copied from the cache instead of running the dot layout again.
+        Extra arguments are passed to export_digraph.
+        """
+        output_path = Path(directory) / f"{filename}.{format}"
+        key = None
+        if cache is not None:
+            key = self.subgraph_key(format, *args, **kwargs)
+            if cache.get_to(key, format, output_path) is not None:
+                return output_path
+        dot = self.export_digraph(*args, **kwargs)
+        rendered_path = Path(dot.render(
+            directory=directory,
+            filename=filename,
+            format=format,
+            cleanup=False,
+        ))
+        if cache is not None:
+            cache.put(key, format, rendered_path)
+        return rendered_path
+
+    def _iter_filtered_edges(self) -> Iterable[tuple[int, int]]:
+        if self._reduce_edges:
+            self._ensure_edges_built()
+            return iter(self._edges)
+        return self._iter_induced_edges()
+
+    def _iter_induced_edges(self) -> Iterable[tuple[int, int]]:
+        self._ensure_graph_built()
+        filtered = self._filtered
         for pkinfo in filtered:
-            assert isinstance(pkinfo, PackageInfo)
             idx = pkinfo._internal_id
-            dep_idx_set = self._dg.deps[idx]
-            for dep_idx in dep_idx_set:
-                if dep_idx in self._filtered:
-                    dot.edge(str(idx), str(dep_idx))
-        return dot
+            for dep_idx in self._dg.iter_dependencies(idx):
+                if dep_idx in filtered:
+                    yield (idx, dep_idx)
+
+    def _ensure_edges_built(self) -> None:
+        if self._edges is not None:
+            return
+        edges = list[tuple[int, int]](self._iter_induced_edges())
+        if self._reduce_edges:
+            ### The reduction is computed on the induced subgraph, relabeled to
+            ### 0..n-1, so that paths through excluded packages are not used.
+            local_to_idx = [pkinfo._internal_id for pkinfo in self._filtered]
+            idx_to_local = {idx: local for local, idx in enumerate(local_to_idx)}
+            lists = [list[int]() for _ in local_to_idx]
+            for idx, dep_idx in edges:
+                lists[idx_to_local[idx]].append(idx_to_local[dep_idx])
+            reduced = transitive_reduction(CsrAdjacency.from_lists(lists))
+            reduced_edges = [
+                (local_to_idx[local], local_to_idx[dep_local])
+                for local in range(reduced.node_count)
+                for dep_local in reduced.neighbors(local)
+            ]
+            self._dropped_edge_count = len(edges) - len(reduced_edges)
+            edges = reduced_edges
+        self._edges = edges
 
     def _ensure_graph_built(self) -> None:
         if self._filtered is not None:
             return
-        included = self._included._idxs
-        excluded = self._excluded._idxs if self._excluded is not None else set[int]()
+        ### Packages removed by refresh() keep their slot, but are not exported.
+        included = [idx for idx in self._included._idxs if not self._dg.is_removed(idx)]
+        closure_bits = self._dg.reachability.closure_union_bits(included)
+        if self._excluded is None or len(self._excluded) == 0:
+            self._filtered = IndexedPackageSet.from_bits(self._dg, closure_bits)
+            return
+        excluded = self._excluded._idxs
+        if not any((closure_bits >> idx) & 1 for idx in excluded):
+            ### None of the excluded packages are reachable, so they cut nothing.
+            self._filtered = IndexedPackageSet.from_bits(self._dg, closure_bits)
+            return
         added = set[int](included)
         visited = set[int]()
         queue = deque[int](included)
         while len(queue) > 0:
             cur_idx = queue.popleft()
             visited.add(cur_idx)
-            cur_deps = self._dg.deps[cur_idx]
-            for dep_idx in cur_deps:
+            for dep_idx in self._dg.iter_dependencies(cur_idx):
                 if dep_idx in added:
                     continue
                 if dep_idx in excluded:
                     continue
                 added.add(dep_idx)
                 queue.append(dep_idx)
-        self._filtered = PackageSet()
-        self._filtered.add_resolved(self._dg, visited)
+        self._filtered = IndexedPackageSet.from_indices(self._dg, visited)
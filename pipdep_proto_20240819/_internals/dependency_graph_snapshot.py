@@ -0,0 +1,287 @@
+from array import array
+from collections.abc import Iterable
+import mmap
+import os
+from pathlib import Path
+import struct
+import sys
+from typing import Optional, Union
+
+###
+### Compiled single-file snapshot of a DependencyGraph.
+###
+### Layout (native byte order, recorded in the header):
+###     header:     magic, format version, byte order, section count
+###     toc:        (offset, nbytes) for each section
+###     sections:   each aligned to 8 bytes; see SECTION_* below.
+###
+### All strings (file names, package names, versions, aliases, dependency and
+### required-by names) are interned into one string table. Per-package columns
+### and the deps adjacency (CSR: offsets + targets) are stored as flat integer
+### arrays, which are read back through memoryview casts over the mapped file.
+###
+
+SNAPSHOT_MAGIC = b"PIPDEPG\0"
+SNAPSHOT_FORMAT_VERSION = 3
+SNAPSHOT_SUFFIX = ".dgsnap"
+
+_HEADER = struct.Struct("<8sIII")
+_TOC_ENTRY = struct.Struct("<QQ")
+_BYTEORDER_CODES = {"little": 1, "big": 2}
+
+(
+    SECTION_STR_OFFSETS,
+    SECTION_STR_BLOB,
+    SECTION_FILE_NAMES,
+    SECTION_FILE_MTIMES,
+    SECTION_FILE_SIZES,
+    SECTION_FILE_NODES,
+    SECTION_NODE_NAMES,
+    SECTION_NODE_PATH_SAFE_NAMES,
+    SECTION_NODE_VERSIONS,
+    SECTION_ALIAS_OFFSETS,
+    SECTION_ALIAS_TARGETS,
+    SECTION_DEPNAME_OFFSETS,
+    SECTION_DEPNAME_TARGETS,
+    SECTION_REQBY_OFFSETS,
+    SECTION_REQBY_TARGETS,
+    SECTION_LOOKUP_KEYS,
+    SECTION_LOOKUP_VALUES,
+    SECTION_DEPS_OFFSETS,
+    SECTION_DEPS_TARGETS,
+) = range(19)
+_SECTION_COUNT = 19
+
+_SECTION_TYPECODES = {
+    SECTION_STR_OFFSETS: "q",
+    SECTION_STR_BLOB: "B",
+    SECTION_FILE_NAMES: "i",
+    SECTION_FILE_MTIMES: "q",
+    SECTION_FILE_SIZES: "q",
+    SECTION_FILE_NODES: "i",
+    SECTION_NODE_NAMES: "i",
+    SECTION_NODE_PATH_SAFE_NAMES: "i",
+    SECTION_NODE_VERSIONS: "i",
+    SECTION_ALIAS_OFFSETS: "i",
+    SECTION_ALIAS_TARGETS: "i",
+    SECTION_DEPNAME_OFFSETS: "i",
+    SECTION_DEPNAME_TARGETS: "i",
+    SECTION_REQBY_OFFSETS: "i",
+    SECTION_REQBY_TARGETS: "i",
+    SECTION_LOOKUP_KEYS: "i",
+    SECTION_LOOKUP_VALUES: "i",
+    SECTION_DEPS_OFFSETS: "i",
+    SECTION_DEPS_TARGETS: "i",
+}
+
+
+def default_snapshot_path(source_dir: Union[Path, str]) -> Path:
+    """Returns the default snapshot path for a source dir, which is a sibling
+    file named after the source dir.
+    """
+    source_dir = Path(source_dir)
+    return source_dir.with_name(source_dir.name + SNAPSHOT_SUFFIX)
+
+
+def stat_source_files(source_dir: Path) -> dict[str, tuple[int, int]]:
+    """Lists the json files in the source dir, with their mtime (ns) and size.
+    This is a single directory scan; no file is opened.
+    """
+    results = dict[str, tuple[int, int]]()
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                st = entry.stat()
+                results[entry.name] = (st.st_mtime_ns, st.st_size)
+    return results
+
+
+class DependencyGraphSnapshot:
+    """Read-only view of a compiled snapshot file.
+
+    The file is mapped with mmap, and each section is exposed as a memoryview
+    cast to its integer type. Call close() (or use as a context manager) to
+    release the mapping once the columns are no longer needed.
+    """
+    _mm: Optional[mmap.mmap]
+    _sections: list[memoryview]
+
+    def __init__(self, snapshot_path: Union[Path, str]) -> None:
+        self._mm = None
+        self._sections = list[memoryview]()
+        with open(snapshot_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError("Empty snapshot file.")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse_sections()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self) -> "DependencyGraphSnapshot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for section in self._sections:
+            section.release()
+        self._sections.clear()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def section(self, section_id: int) -> memoryview:
+        return self._sections[section_id]
+
+    def get_string(self, sid: int) -> Optional[str]:
+        if sid < 0:
+            return None
+        offsets = self._sections[SECTION_STR_OFFSETS]
+        blob = self._sections[SECTION_STR_BLOB]
+        return str(blob[offsets[sid]:offsets[sid + 1]], "utf-8")
+
+    def get_strings(self) -> list[str]:
+        """Decodes the whole string table at once."""
+        offsets = self._sections[SECTION_STR_OFFSETS].tolist()
+        blob = bytes(self._sections[SECTION_STR_BLOB])
+        return [
+            blob[offsets[sid]:offsets[sid + 1]].decode("utf-8")
+            for sid in range(len(offsets) - 1)
+        ]
+
+    def get_source_files(self) -> dict[str, tuple[int, int]]:
+        names = self._sections[SECTION_FILE_NAMES]
+        mtimes = self._sections[SECTION_FILE_MTIMES]
+        sizes = self._sections[SECTION_FILE_SIZES]
+        return {
+            self.get_string(names[idx]): (mtimes[idx], sizes[idx])
+            for idx in range(len(names))
+        }
+
+    def is_valid_for(self, source_dir: Path) -> bool:
+        """Checks that the snapshot was compiled from the current json files
+        in the source dir, by comparing file names, mtimes and sizes.
+        """
+        return self.get_source_files() == stat_source_files(source_dir)
+
+    def _parse_sections(self) -> None:
+        mm = self._mm
+        if len(mm) < _HEADER.size + _SECTION_COUNT * _TOC_ENTRY.size:
+            raise ValueError("Truncated snapshot file.")
+        magic, format_version, byteorder_code, section_count = _HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Not a dependency graph snapshot file.")
+        if format_version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version: {format_version}")
+        if byteorder_code != _BYTEORDER_CODES[sys.byteorder]:
+            raise ValueError("Snapshot was written with a different byte order.")
+        if section_count != _SECTION_COUNT:
+            raise ValueError(f"Unexpected snapshot section count: {section_count}")
+        whole = memoryview(mm)
+        try:
+            for section_id in range(section_count):
+                offset, nbytes = _TOC_ENTRY.unpack_from(mm, _HEADER.size + section_id * _TOC_ENTRY.size)
+                if offset + nbytes > len(mm):
+                    raise ValueError("Truncated snapshot file.")
+                try:
+                    section = whole[offset:offset + nbytes].cast(_SECTION_TYPECODES[section_id])
+                except TypeError as exc:
+                    ### Misaligned section size or offset.
+                    raise ValueError(f"Corrupt snapshot section {section_id}: {exc}") from exc
+                self._sections.append(section)
+        finally:
+            whole.release()
+
+
+def write_snapshot(
+    snapshot_path: Union[Path, str],
+    source_files: dict[str, tuple[int, int]],
+    file_names: Iterable[str],
+    file_nodes: Iterable[int],
+    installed: Iterable,
+    lookup: dict[str, int],
+    deps_offsets: Iterable[int],
+    deps_targets: Iterable[int],
+) -> None:
+    """Writes a compiled snapshot file. The file is written to a temporary
+    name first, then moved into place, so that readers never see a partial file.
+
+    Args:
+        source_files: dict[str, tuple[int, int]]
+            File name to (mtime_ns, size), as returned by stat_source_files().
+        file_names: Iterable[str]
+            Json file names in the order they were parsed.
+        file_nodes: Iterable[int]
+            The _internal_id of the package parsed from each json file.
+        installed: Iterable[PackageInfo]
+            Installed packages, in _internal_id order.
+    """
+    strings = dict[str, int]()
+
+    def intern(s: Optional[str]) -> int:
+        if s is None:
+            return -1
+        sid = strings.get(s)
+        if sid is None:
+            sid = len(strings)
+            strings[s] = sid
+        return sid
+
+    sections = [array(_SECTION_TYPECODES[section_id]) for section_id in range(_SECTION_COUNT)]
+    for file_name, file_node in zip(file_names, file_nodes):
+        mtime_ns, size = source_files[file_name]
+        sections[SECTION_FILE_NODES].append(file_node)
+        sections[SECTION_FILE_NAMES].append(intern(file_name))
+        sections[SECTION_FILE_MTIMES].append(mtime_ns)
+        sections[SECTION_FILE_SIZES].append(size)
+    sections[SECTION_ALIAS_OFFSETS].append(0)
+    sections[SECTION_DEPNAME_OFFSETS].append(0)
+    sections[SECTION_REQBY_OFFSETS].append(0)
+    for pkinfo in installed:
+        sections[SECTION_NODE_NAMES].append(intern(pkinfo.name))
+        sections[SECTION_NODE_PATH_SAFE_NAMES].append(intern(pkinfo.path_safe_name))
+        sections[SECTION_NODE_VERSIONS].append(intern(pkinfo.version))
+        sections[SECTION_ALIAS_TARGETS].extend(intern(alias) for alias in sorted(pkinfo.aliases))
+        sections[SECTION_ALIAS_OFFSETS].append(len(sections[SECTION_ALIAS_TARGETS]))
+        sections[SECTION_DEPNAME_TARGETS].extend(intern(dep_name) for dep_name in pkinfo.dependencies)
+        sections[SECTION_DEPNAME_OFFSETS].append(len(sections[SECTION_DEPNAME_TARGETS]))
+        sections[SECTION_REQBY_TARGETS].extend(intern(name) for name in pkinfo.required_by)
+        sections[SECTION_REQBY_OFFSETS].append(len(sections[SECTION_REQBY_TARGETS]))
+    for key, idx in lookup.items():
+        sections[SECTION_LOOKUP_KEYS].append(intern(key))
+        sections[SECTION_LOOKUP_VALUES].append(idx)
+    sections[SECTION_DEPS_OFFSETS].extend(deps_offsets)
+    sections[SECTION_DEPS_TARGETS].extend(deps_targets)
+    blob = bytearray()
+    sections[SECTION_STR_OFFSETS].append(0)
+    for s in strings:
+        blob += s.encode("utf-8")
+        sections[SECTION_STR_OFFSETS].append(len(blob))
+    sections[SECTION_STR_BLOB] = array("B", blob)
+
+    snapshot_path = Path(snapshot_path)
+    tmp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+    toc_size = _HEADER.size + _SECTION_COUNT * _TOC_ENTRY.size
+    offset = _align8(toc_size)
+    toc = list[tuple[int, int]]()
+    for section in sections:
+        nbytes = len(section) * section.itemsize
+        toc.append((offset, nbytes))
+        offset = _align8(offset + nbytes)
+    with tmp_path.open("wb") as f:
+        f.write(_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, _BYTEORDER_CODES[sys.byteorder], _SECTION_COUNT,
+        ))
+        for entry in toc:
+            f.write(_TOC_ENTRY.pack(*entry))
+        for section, (offset, nbytes) in zip(sections, toc):
+            f.write(b"\0" * (offset - f.tell()))
+            section.tofile(f)
+    os.replace(tmp_path, snapshot_path)
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
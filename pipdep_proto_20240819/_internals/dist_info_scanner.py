@@ -0,0 +1,184 @@
+from collections.abc import Iterable, Mapping
+from email.parser import HeaderParser
+from pathlib import Path
+import re
+import sys
+from typing import Optional, Union
+
+try:
+    from packaging.requirements import InvalidRequirement, Requirement
+except ImportError:
+    from pip._vendor.packaging.requirements import InvalidRequirement, Requirement
+
+###
+### In-process replacement for running "pip show <name>" once per package.
+### Reads "*.dist-info/METADATA" (or "*.egg-info/PKG-INFO") directly from
+### each search path, and emits the same dict shape as pip_get_installed_props.
+###
+
+DIST_INFO_PROP_NAMES = (
+    "Name",
+    "Version",
+    "Summary",
+    "Home-page",
+    "Author",
+    "Author-email",
+    "License",
+    "Location",
+    "Requires",
+    "Required-by",
+)
+
+
+def canonicalize_dist_name(name: str) -> str:
+    """Normalizes a distribution name as in PEP 503."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def scan_installed_props(
+    search_paths: Optional[Iterable[Union[str, Path]]] = None,
+) -> list[dict[str, str]]:
+    """Scans the search paths for installed distributions, and returns one
+    property dict per distribution, in the same shape as "pip show".
+
+    Args:
+        search_paths: Optional[Iterable[Union[str, Path]]]
+            Directories to scan, such as a site-packages dir. Defaults to sys.path.
+            When the same distribution is found on more than one path, the first
+            one wins, matching the import-time shadowing order.
+
+    Remarks:
+        The "Required-by" field is computed by inverting the "Requires" fields
+        of the whole scan, therefore it only reflects the scanned paths.
+    """
+    if search_paths is None:
+        search_paths = sys.path
+    found = dict[str, tuple[dict[str, str], list[str]]]()
+    for search_path in search_paths:
+        search_path = Path(search_path) if search_path else Path.cwd()
+        if not search_path.is_dir():
+            continue
+        for meta_path in _iter_metadata_files(search_path):
+            scanned = _read_metadata_file(meta_path, search_path)
+            if scanned is None:
+                continue
+            canon_name = canonicalize_dist_name(scanned[0]["Name"])
+            if canon_name in found:
+                continue
+            found[canon_name] = scanned
+    required_by = dict[str, list[str]]((canon_name, []) for canon_name in found)
+    for prop_dict, requires in found.values():
+        for req_name in requires:
+            req_canon_name = canonicalize_dist_name(req_name)
+            if req_canon_name in required_by:
+                required_by[req_canon_name].append(prop_dict["Name"])
+    results = list[dict[str, str]]()
+    for canon_name, (prop_dict, requires) in found.items():
+        prop_dict["Requires"] = ", ".join(requires)
+        prop_dict["Required-by"] = ", ".join(sorted(required_by[canon_name], key=str.lower))
+        results.append({key: prop_dict[key] for key in DIST_INFO_PROP_NAMES})
+    return results
+
+
+def diff_installed_props(
+    left: Iterable[Mapping[str, str]],
+    right: Iterable[Mapping[str, str]],
+    prop_names: Iterable[str] = ("Version", "Requires", "Required-by"),
+) -> list[tuple[str, str, Optional[str], Optional[str]]]:
+    """Cross-checks two collections of property dicts, such as the output of
+    scan_installed_props against the output of pip_get_installed_props.
+
+    Returns:
+        list[tuple[str, str, Optional[str], Optional[str]]]:
+            One tuple per mismatch, containing the canonical package name, the
+            property name, the left value and the right value. A package missing
+            from one side is reported with the property name "Name".
+    """
+    left_map = {canonicalize_dist_name(d["Name"]): d for d in left}
+    right_map = {canonicalize_dist_name(d["Name"]): d for d in right}
+    mismatches = list[tuple[str, str, Optional[str], Optional[str]]]()
+    for canon_name in sorted(left_map.keys() | right_map.keys()):
+        left_dict = left_map.get(canon_name)
+        right_dict = right_map.get(canon_name)
+        if left_dict is None or right_dict is None:
+            mismatches.append((
+                canon_name,
+                "Name",
+                left_dict and left_dict["Name"],
+                right_dict and right_dict["Name"],
+            ))
+            continue
+        for prop_name in prop_names:
+            left_value = _normalize_prop_value(prop_name, left_dict.get(prop_name, ""))
+            right_value = _normalize_prop_value(prop_name, right_dict.get(prop_name, ""))
+            if left_value != right_value:
+                mismatches.append((canon_name, prop_name, left_dict.get(prop_name), right_dict.get(prop_name)))
+    return mismatches
+
+
+def _iter_metadata_files(search_path: Path) -> Iterable[Path]:
+    try:
+        entries = sorted(search_path.iterdir())
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.endswith(".dist-info"):
+            meta_path = entry / "METADATA"
+        elif entry.name.endswith(".egg-info"):
+            meta_path = entry / "PKG-INFO" if entry.is_dir() else entry
+        else:
+            continue
+        if meta_path.is_file():
+            yield meta_path
+
+
+def _read_metadata_file(meta_path: Path, location: Path) -> Optional[tuple[dict[str, str], list[str]]]:
+    with meta_path.open("r", encoding="utf-8", errors="replace") as f:
+        headers = HeaderParser().parse(f)
+    name = headers.get("Name")
+    if not name:
+        return None
+    requires = list[str]()
+    requires_seen = set[str]()
+    for req_str in headers.get_all("Requires-Dist") or ():
+        req_name = _get_requirement_name(req_str)
+        if req_name is None:
+            continue
+        req_canon_name = canonicalize_dist_name(req_name)
+        if req_canon_name in requires_seen:
+            continue
+        requires_seen.add(req_canon_name)
+        requires.append(req_name)
+    requires.sort(key=str.lower)
+    prop_dict = {
+        "Name": name,
+        "Version": headers.get("Version", ""),
+        "Summary": headers.get("Summary", ""),
+        "Home-page": headers.get("Home-page", ""),
+        "Author": headers.get("Author", ""),
+        "Author-email": headers.get("Author-email", ""),
+        "License": headers.get("License", "").splitlines()[0] if headers.get("License") else "",
+        "Location": str(location),
+    }
+    return prop_dict, requires
+
+
+def _get_requirement_name(req_str: str) -> Optional[str]:
+    """Returns the name of a "Requires-Dist" requirement, or None if the
+    requirement does not apply to the running interpreter without extras,
+    in the same way as "pip show".
+    """
+    try:
+        req = Requirement(req_str)
+    except InvalidRequirement:
+        return None
+    if req.marker is not None and not req.marker.evaluate({"extra": ""}):
+        return None
+    return req.name
+
+
+def _normalize_prop_value(prop_name: str, value: str) -> str:
+    if prop_name in ("Requires", "Required-by"):
+        names = (canonicalize_dist_name(item.strip()) for item in value.split(","))
+        return ", ".join(sorted(name for name in names if name))
+    return value.strip()
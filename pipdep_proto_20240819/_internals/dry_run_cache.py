@@ -0,0 +1,211 @@
+from dataclasses import asdict
+import hashlib
+from importlib.metadata import PackageNotFoundError, version as dist_version
+import json
+import os
+from pathlib import Path
+import sqlite3
+import sys
+import sysconfig
+import time
+from typing import Optional, Union
+
+from pipdep_proto_20240819._internals.dist_info_scanner import canonicalize_dist_name, scan_installed_props
+from pipdep_proto_20240819._internals.pip_dry_run import DryRunRow
+
+DRY_RUN_CACHE_KEY_VERSION = 2
+
+### A find-links dir is fingerprinted by the names, sizes and mtimes of its
+### files. A remote index cannot be fingerprinted, so only its URL is part of
+### the key, and the cache TTL bounds how stale a resolution against it can be.
+DEFAULT_INDEX_FINGERPRINT = "index:default"
+
+
+def make_dry_run_key(
+    requirement: str,
+    environment: Optional[str],
+    index: str,
+    pip_version: str,
+) -> str:
+    """Stable hash of everything that determines a dry-run resolution.
+
+    The Python version, implementation and platform of the running interpreter
+    are always part of the key, since PipDryRunTask runs pip with it, and the
+    resolution depends on them through markers and wheel tags.
+
+    Args:
+        requirement: str
+            The requirement string, as passed to pip.
+        environment: Optional[str]
+            Fingerprint of the installed packages that pip resolves against,
+            from installed_environment_fingerprint(). None when pip ignores
+            the installed packages (--ignore-installed).
+        index: str
+            Fingerprint of the package source, from index_fingerprint().
+        pip_version: str
+    """
+    payload = {
+        "v": DRY_RUN_CACHE_KEY_VERSION,
+        "requirement": requirement.strip(),
+        "environment": environment,
+        "index": index,
+        "pip": pip_version,
+        "python": list(sys.version_info[:2]),
+        "implementation": sys.implementation.name,
+        "platform": sysconfig.get_platform(),
+    }
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def installed_environment_fingerprint(search_paths: Optional[list[Union[Path, str]]] = None) -> str:
+    """Hash of the names and versions of the distributions installed for the
+    running interpreter (sys.path by default), i.e. what pip resolves against
+    without --ignore-installed.
+    """
+    pairs = sorted(
+        (canonicalize_dist_name(props["Name"]), props["Version"])
+        for props in scan_installed_props(search_paths)
+    )
+    text = json.dumps(pairs, separators=(",", ":"))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def index_fingerprint(
+    find_links: Union[Path, str, None] = None,
+    index_url: Optional[str] = None,
+) -> str:
+    """Fingerprint of the package source: the file listing of a local
+    find-links dir, or the index URL.
+    """
+    if find_links is None:
+        return f"index:{index_url}" if index_url is not None else DEFAULT_INDEX_FINGERPRINT
+    listing = list[tuple[str, int, int]]()
+    with os.scandir(find_links) as dir_entries:
+        for dir_entry in dir_entries:
+            if dir_entry.is_file():
+                st = dir_entry.stat()
+                listing.append((dir_entry.name, st.st_size, st.st_mtime_ns))
+    listing.sort()
+    text = json.dumps(listing, separators=(",", ":"))
+    return "find-links:" + hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def pip_version() -> str:
+    """Version of the pip that PipDryRunTask runs, i.e. that of sys.executable."""
+    try:
+        return dist_version("pip")
+    except PackageNotFoundError:
+        return ""
+
+
+class DryRunCache:
+    """SQLite store of parsed dry-run reports, keyed by make_dry_run_key(),
+    with a TTL and size-bounded LRU eviction.
+
+    Only successful resolutions are stored. An entry expires ttl_secs after it
+    was stored; hits do not extend it. The size bound is on the total length
+    of the stored rows (as JSON), and the least recently used entries are
+    evicted first.
+    """
+    _db_path: Path
+    _ttl_secs: float
+    _max_bytes: int
+    _conn: sqlite3.Connection
+
+    def __init__(
+        self,
+        db_path: Union[Path, str],
+        ttl_secs: float = 7 * 24 * 3600.0,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        assert ttl_secs > 0.0
+        assert isinstance(max_bytes, int) and max_bytes > 0
+        self._db_path = Path(db_path)
+        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._ttl_secs = ttl_secs
+        self._max_bytes = max_bytes
+        self._conn = sqlite3.connect(self._db_path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dry_runs ("
+                " key TEXT PRIMARY KEY,"
+                " requirement TEXT NOT NULL,"
+                " rows_json TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " used_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS dry_runs_used_at ON dry_runs (used_at)")
+
+    def __enter__(self) -> "DryRunCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @property
+    def db_path(self) -> Path:
+        return self._db_path
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM dry_runs").fetchone()[0]
+
+    def get(self, key: str, requirement: Optional[str] = None) -> Optional[list[DryRunRow]]:
+        """Returns the stored rows, or None on a miss or an expired entry. The
+        rows are relabelled with requirement, if given, since equivalent
+        requirement strings may share a key.
+        """
+        now = time.time()
+        found = self._conn.execute(
+            "SELECT rows_json, created_at FROM dry_runs WHERE key = ?", (key,),
+        ).fetchone()
+        if found is None:
+            return None
+        rows_json, created_at = found
+        with self._conn:
+            if now - created_at > self._ttl_secs:
+                self._conn.execute("DELETE FROM dry_runs WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE dry_runs SET used_at = ? WHERE key = ?", (now, key))
+        rows = [DryRunRow(**row) for row in json.loads(rows_json)]
+        if requirement is not None:
+            for row in rows:
+                row.requirement = requirement
+        return rows
+
+    def put(self, key: str, requirement: str, rows: list[DryRunRow]) -> None:
+        """Stores the rows of one resolution, then evicts old entries."""
+        rows_json = json.dumps([asdict(row) for row in rows], separators=(",", ":"))
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dry_runs VALUES (?, ?, ?, ?, ?, ?)",
+                (key, requirement, rows_json, len(rows_json), now, now),
+            )
+        self.evict(keep=key)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Deletes the expired entries, then the least recently used entries
+        until the total size fits. Returns the number of entries deleted.
+        """
+        with self._conn:
+            deleted = self._conn.execute(
+                "DELETE FROM dry_runs WHERE created_at < ?", (time.time() - self._ttl_secs,),
+            ).rowcount
+            total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM dry_runs").fetchone()[0]
+            if total_bytes <= self._max_bytes:
+                return deleted
+            evicted_keys = list[str]()
+            for key, size in self._conn.execute("SELECT key, size FROM dry_runs ORDER BY used_at"):
+                if total_bytes <= self._max_bytes:
+                    break
+                if key == keep:
+                    continue
+                evicted_keys.append(key)
+                total_bytes -= size
+            self._conn.executemany("DELETE FROM dry_runs WHERE key = ?", [(key,) for key in evicted_keys])
+        return deleted + len(evicted_keys)
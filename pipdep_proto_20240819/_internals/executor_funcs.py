@@ -1,22 +1,51 @@
 from collections.abc import Iterable
-import multiprocessing
-import multiprocessing.pool
+from functools import partial
 import os
+import queue
 import subprocess
 import tempfile
 import time
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 
+from pipdep_proto_20240819._internals._subprocs.process_group import (
+    SIGKILL,
+    new_process_group_kwargs,
+    signal_process_group,
+)
 
-def subprocess_run_with_outtext(args: Iterable[str]) -> list[str]:
+
+def subprocess_run_with_outtext(
+    args: Iterable[str],
+    merge_stderr: bool = True,
+    check: bool = True,
+    timeout_secs: Optional[float] = None,
+) -> list[str]:
+    """Runs the command, and returns the lines of its stdout, and of stderr if
+    merge_stderr (otherwise stderr is discarded). With check, raises if the 
+    command failed; otherwise the output is returned regardless.
+
+    The command runs in its own process group (session). With timeout_secs,
+    the whole group is killed on expiry, and TimeoutError is raised.
+    """
     returncode: int
     text: Iterable[str] = []
     tmp_fd, tmp_name = tempfile.mkstemp(text=True)
     try:
         tmp_file = os.fdopen(tmp_fd, "w+")
-        subp_result = subprocess.run(args, stderr=subprocess.STDOUT, stdout=tmp_file)
-        returncode = subp_result.returncode
-        if returncode == 0:
+        stderr = subprocess.STDOUT if merge_stderr else subprocess.DEVNULL
+        with subprocess.Popen(
+            args, 
+            stderr=stderr, 
+            stdout=tmp_file, 
+            **new_process_group_kwargs(),
+        ) as proc:
+            try:
+                returncode = proc.wait(timeout_secs)
+            except subprocess.TimeoutExpired:
+                signal_process_group(proc, SIGKILL)
+                proc.wait()
+                raise TimeoutError(f"command {args} did not finish in {timeout_secs} seconds.")
+        if returncode == 0 or not check:
             tmp_file.seek(0)
             text = tmp_file.readlines()
     finally:
@@ -26,11 +55,41 @@ def subprocess_run_with_outtext(args: Iterable[str]) -> list[str]:
         except:
             pass
         pass
-    if returncode != 0:
+    if returncode != 0 and check:
         raise Exception(f"command {args} failed with code {returncode}.")
     return [line.rstrip("\n") for line in text]
 
 
+def subprocess_run_with_outerr(
+    args: Iterable[str],
+    timeout_secs: Optional[float] = None,
+) -> tuple[int, list[str], list[str]]:
+    """Runs the command, and returns its exit code and the lines of its stdout
+    and stderr, without raising if it failed. With timeout_secs, the process
+    group is killed on expiry, and TimeoutError is raised.
+    """
+    with tempfile.TemporaryFile("w+") as out_file, tempfile.TemporaryFile("w+") as err_file:
+        with subprocess.Popen(
+            args,
+            stderr=err_file,
+            stdout=out_file,
+            **new_process_group_kwargs(),
+        ) as proc:
+            try:
+                returncode = proc.wait(timeout_secs)
+            except subprocess.TimeoutExpired:
+                signal_process_group(proc, SIGKILL)
+                proc.wait()
+                raise TimeoutError(f"command {args} did not finish in {timeout_secs} seconds.")
+        out_file.seek(0)
+        err_file.seek(0)
+        return (
+            returncode,
+            [line.rstrip("\n") for line in out_file.readlines()],
+            [line.rstrip("\n") for line in err_file.readlines()],
+        )
+
+
 def multiprocess_map_async_then(
     pool: Any, 
     fn: Callable, 
@@ -39,32 +98,92 @@ def multiprocess_map_async_then(
     fn_failure: Callable,
     fn_patience: Callable,
     wait_time: float=1.0,
+    max_pending: Optional[int]=None,
+    timeout_secs: Optional[float]=None,
+    worker_count: Optional[int]=None,
+) -> None:
+    """Applies fn to each arg on the pool, and calls fn_success(arg, result) or
+    fn_failure(arg, exc) on the calling thread as soon as each call finishes.
+
+    Completions are signalled by the apply_async callbacks, so nothing is 
+    polled. At most max_pending calls are submitted at a time (default: four
+    per worker, with worker_count defaulting to os.cpu_count()), and args is
+    consumed lazily, so that a huge or generated arg list does not have to be
+    held in memory. fn_patience() is checked after every completion, and at
+    least every wait_time seconds; once it returns False, no more calls are
+    submitted and pending results are abandoned.
+    With timeout_secs, a call still pending that long after its submission is
+    reported to fn_failure with a TimeoutError, its result is ignored, and it
+    no longer counts against max_pending. The pool worker itself cannot be
+    interrupted, so fn should bound its own run time (e.g. with the 
+    timeout_secs of subprocess_run_with_outtext()); otherwise later calls 
+    queue behind the hung ones, and time out in turn.
+    """
+    if max_pending is None:
+        max_pending = 4 * (worker_count or os.cpu_count() or 1)
+    assert max_pending >= 1
+    completions = queue.SimpleQueue()
+    pending = dict[int, tuple[Any, float]]()
+    arg_iter = enumerate(args)
+    is_exhausted = False
+
+    def submit_more() -> None:
+        nonlocal is_exhausted
+        while not is_exhausted and len(pending) < max_pending:
+            try:
+                idx, arg = next(arg_iter)
+            except StopIteration:
+                is_exhausted = True
+                return
+            pending[idx] = (arg, time.monotonic())
+            call_args = arg if isinstance(arg, tuple) else (arg,)
+            pool.apply_async(
+                fn,
+                args=call_args,
+                callback=partial(_put_completion, completions, idx, True),
+                error_callback=partial(_put_completion, completions, idx, False),
+            )
+
+    submit_more()
+    while len(pending) > 0 and fn_patience():
+        timeout = wait_time
+        if timeout_secs is not None:
+            ### pending is in submission order, so the first entry expires first.
+            _, submitted_at = next(iter(pending.values()))
+            timeout = min(timeout, max(0.0, submitted_at + timeout_secs - time.monotonic()))
+        try:
+            idx, is_success, value = completions.get(timeout=timeout)
+        except queue.Empty:
+            _fail_expired(pending, timeout_secs, fn_failure)
+            submit_more()
+            continue
+        if idx not in pending:
+            ### Already reported as timed out.
+            continue
+        arg, _ = pending.pop(idx)
+        if is_success:
+            fn_success(arg, value)
+        else:
+            fn_failure(arg, value)
+        submit_more()
+
+
+def _put_completion(completions: queue.SimpleQueue, idx: int, is_success: bool, value: Any) -> None:
+    ### Called on the pool's result handler thread.
+    completions.put((idx, is_success, value))
+
+
+def _fail_expired(
+    pending: dict[int, tuple[Any, float]],
+    timeout_secs: Optional[float],
+    fn_failure: Callable,
 ) -> None:
-    pool_apply_async = pool.apply_async
-    count = len(args)
-    args = list(args)
-    async_results: list[multiprocessing.pool.ApplyResult] = [None] * count
-    for idx, arg in enumerate(args):
-        if not isinstance(arg, tuple):
-            arg = (arg,)
-        async_results[idx] = pool_apply_async(fn, args=arg)
-    idx_pending = set[int](range(count))
-    while len(idx_pending) > 0 and fn_patience():
-        new_idx_outcomes = list[tuple[int, bool]]()
-        for idx in idx_pending:
-            async_result = async_results[idx]
-            if not async_result.ready():
-                continue
-            outcome = async_result.successful()
-            new_idx_outcomes.append((idx, outcome))
-        for idx, outcome in new_idx_outcomes:
-            if outcome:
-                fn_success(args[idx], async_results[idx].get())
-            else:
-                async_result = async_results[idx]
-                try:
-                    exc = async_result.get()
-                except Exception as exc:
-                    fn_failure(args[idx], exc)
-            idx_pending.remove(idx)
-        time.sleep(wait_time)
+    if timeout_secs is None:
+        return
+    now = time.monotonic()
+    while len(pending) > 0:
+        idx, (arg, submitted_at) = next(iter(pending.items()))
+        if now - submitted_at < timeout_secs:
+            break
+        del pending[idx]
+        fn_failure(arg, TimeoutError(f"No result after {timeout_secs} seconds."))
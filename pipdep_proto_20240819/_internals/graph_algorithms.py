@@ -0,0 +1,96 @@
+from array import array
+
+from pipdep_proto_20240819._internals.csr_adjacency import CsrAdjacency
+
+
+def strongly_connected_components(adj: CsrAdjacency) -> list[list[int]]:
+    """Computes the strongly connected components with Tarjan's algorithm.
+
+    The traversal uses an explicit stack, so that deep dependency chains are
+    not limited by the Python recursion limit.
+
+    Returns:
+        list[list[int]]:
+            The components, in reverse topological order: every component is
+            listed after all components that it has an edge to.
+    """
+    node_count = adj.node_count
+    offsets = adj.offsets
+    targets = adj.targets
+    index = [-1] * node_count
+    low = [0] * node_count
+    on_stack = [False] * node_count
+    stack = list[int]()
+    components = list[list[int]]()
+    counter = 0
+    for root in range(node_count):
+        if index[root] >= 0:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [[root, offsets[root]]]
+        while work:
+            frame = work[-1]
+            v, pos = frame
+            if pos < offsets[v + 1]:
+                frame[1] = pos + 1
+                w = targets[pos]
+                if index[w] < 0:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append([w, offsets[w]])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+            if low[v] == index[v]:
+                component = list[int]()
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                component.sort()
+                components.append(component)
+    return components
+
+
+def component_ids(components: list[list[int]], node_count: int) -> array:
+    """Maps each node to the position of its component in the components list."""
+    comp_of = array("i", [-1]) * node_count
+    for comp_idx, component in enumerate(components):
+        for idx in component:
+            comp_of[idx] = comp_idx
+    return comp_of
+
+
+def condensation(adj: CsrAdjacency) -> tuple[list[list[int]], array, CsrAdjacency]:
+    """Collapses each strongly connected component into a single node.
+
+    Returns:
+        tuple[list[list[int]], array, CsrAdjacency]:
+            The components (as from strongly_connected_components), the component
+            index of each node, and the adjacency between components, which is
+            a DAG without self-loops.
+    """
+    components = strongly_connected_components(adj)
+    comp_of = component_ids(components, adj.node_count)
+    comp_lists = list[set[int]]()
+    for comp_idx, component in enumerate(components):
+        successors = set[int]()
+        for idx in component:
+            for dep_idx in adj.neighbors(idx):
+                dep_comp_idx = comp_of[dep_idx]
+                if dep_comp_idx != comp_idx:
+                    successors.add(dep_comp_idx)
+        comp_lists.append(successors)
+    return components, comp_of, CsrAdjacency.from_lists(comp_lists)
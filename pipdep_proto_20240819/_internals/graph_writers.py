@@ -0,0 +1,102 @@
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+import json
+from pathlib import Path
+from typing import Callable, TextIO, Union
+from xml.sax.saxutils import escape as xml_escape, quoteattr as xml_quoteattr
+
+from pipdep_proto_20240819._internals.package_info import PackageInfo
+
+###
+### Streaming graph writers.
+### Nodes and edges are written one at a time, as they are produced by the
+### iterables, so that memory use does not depend on the graph size. None of
+### these writers require the graphviz package.
+###
+
+GraphFile = Union[str, Path, TextIO]
+
+
+def write_dot(
+    file: GraphFile,
+    nodes: Iterable[PackageInfo],
+    edges: Iterable[tuple[int, int]],
+    graph_name: str = "",
+) -> None:
+    """Writes a DOT digraph, in the same layout as graphviz.Digraph.source."""
+    with _open_for_write(file) as f:
+        header = f"digraph {_dot_quote(graph_name)} {{\n" if graph_name else "digraph {\n"
+        f.write(header)
+        for pkinfo in nodes:
+            label = _dot_quote(pkinfo.name + "\\n" + str(pkinfo.version))
+            f.write(f"\t{pkinfo._internal_id} [label={label}]\n")
+        for idx, dep_idx in edges:
+            f.write(f"\t{idx} -> {dep_idx}\n")
+        f.write("}\n")
+
+
+def write_node_link_json(
+    file: GraphFile,
+    nodes: Iterable[PackageInfo],
+    edges: Iterable[tuple[int, int]],
+) -> None:
+    """Writes a JSON document in node-link form (as used by networkx and d3)."""
+    with _open_for_write(file) as f:
+        f.write('{"directed": true, "multigraph": false, "graph": {}, "nodes": [')
+        sep = "\n"
+        for pkinfo in nodes:
+            node = {"id": pkinfo._internal_id, "name": pkinfo.name, "version": pkinfo.version}
+            f.write(sep + json.dumps(node))
+            sep = ",\n"
+        f.write('\n], "links": [')
+        sep = "\n"
+        for idx, dep_idx in edges:
+            f.write(sep + json.dumps({"source": idx, "target": dep_idx}))
+            sep = ",\n"
+        f.write("\n]}\n")
+
+
+def write_graphml(
+    file: GraphFile,
+    nodes: Iterable[PackageInfo],
+    edges: Iterable[tuple[int, int]],
+) -> None:
+    """Writes a GraphML document, with name and version as node attributes."""
+    with _open_for_write(file) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+        f.write('  <key id="name" for="node" attr.name="name" attr.type="string"/>\n')
+        f.write('  <key id="version" for="node" attr.name="version" attr.type="string"/>\n')
+        f.write('  <graph id="G" edgedefault="directed">\n')
+        for pkinfo in nodes:
+            node_id = xml_quoteattr(f"n{pkinfo._internal_id}")
+            name = xml_escape(pkinfo.name)
+            version = xml_escape(str(pkinfo.version))
+            f.write(
+                f'    <node id={node_id}><data key="name">{name}</data>'
+                f'<data key="version">{version}</data></node>\n'
+            )
+        for idx, dep_idx in edges:
+            f.write(f'    <edge source="n{idx}" target="n{dep_idx}"/>\n')
+        f.write("  </graph>\n")
+        f.write("</graphml>\n")
+
+
+GRAPH_WRITERS: dict[str, Callable[..., None]] = {
+    "dot": write_dot,
+    "json": write_node_link_json,
+    "graphml": write_graphml,
+}
+
+
+@contextmanager
+def _open_for_write(file: GraphFile) -> Iterator[TextIO]:
+    if isinstance(file, (str, Path)):
+        with open(file, "w", encoding="utf-8", newline="\n") as f:
+            yield f
+    else:
+        yield file
+
+
+def _dot_quote(s: str) -> str:
+    return '"' + s.replace('"', '\\"') + '"'
@@ -20,6 +20,10 @@ class PackageInfo:
         dependencies: set[str]
             List of package names that this package depends on.
             The names are not normalized; each name is used as it appears on the json.
+        required_by: list[str]
+            List of package names that depend on this package, as reported by pip
+            in the "Required-by" field. Used for cross-checking the computed
+            reverse dependencies; not used for building the graph.
         _internal_id: int = -1
             Internal identifier for the package.
     """
@@ -28,4 +32,5 @@ class PackageInfo:
     version: VerStr = None
     aliases: set[str] = dataclasses.field(default_factory=set[str])
     dependencies: set[str] = dataclasses.field(default_factory=set[str])
+    required_by: list[str] = dataclasses.field(default_factory=list[str])
     _internal_id: int = -1
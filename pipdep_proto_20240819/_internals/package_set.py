@@ -1,8 +1,9 @@
-from collections.abc import Collection, Iterable
-from typing import Any, Union, overload
+from collections.abc import Collection, Iterable, Set as AbstractSet
+from typing import Any, Optional, Union, overload
 
 from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
 from pipdep_proto_20240819._internals.package_info import PackageInfo
+from pipdep_proto_20240819._internals.reachability_index import bits_from_indices, iter_bits
 
 
 class PackageSet(Collection[PackageInfo]):
@@ -30,6 +31,7 @@ class PackageSet(Collection[PackageInfo]):
             items = [items]
         else:
             assert isinstance(items, Iterable)
+            items = list(items)
             assert all(isinstance(item, (int, str, PackageInfo)) for item in items)
         dg_count = len(dg.installed)
         invalid_items = list[Any]()
@@ -54,7 +56,7 @@ class PackageSet(Collection[PackageInfo]):
                     print(f"Error: Invalid item: {repr(item)}")
                     print("    Installed packages are indexed from 0 to", (dg_count - 1))
                 elif isinstance(item, str):
-                    alikes = dg.search_alike(item)
+                    alikes = dg.search_alike(item, limit=10)
                     if len(alikes) >= 1:
                         print(f"Error: Ambiguous item: {repr(item)}")
                         print("    Did you mean:")
@@ -87,3 +89,161 @@ class PackageSet(Collection[PackageInfo]):
 
     def __iter__(self) -> Iterable[PackageInfo]:
         yield from self._infos
+
+
+class IndexedPackageSet(PackageSet):
+    """PackageSet bound to a DependencyGraph, with membership stored as a bitset
+    over _internal_id (a Python int, where bit i is set if package i is a member).
+
+    Membership tests are O(1), strings are resolved through the graph's lookup
+    table, and the set operators |, &, - and ^ are whole-word bitwise operations.
+    The other operand may be any PackageSet, or a builtin set of _internal_id
+    values, on either side; the result is always an IndexedPackageSet.
+    Iteration is in _internal_id order.
+    """
+    _dg: DependencyGraph
+    _bits: int
+
+    def __init__(
+        self, 
+        dg: DependencyGraph,
+        items: Optional[Iterable[Union[int, str, PackageInfo]]] = None,
+    ) -> None:
+        assert isinstance(dg, DependencyGraph)
+        self._dg = dg
+        self._bits = 0
+        if items is not None:
+            self.add_resolved(dg, items)
+
+    @classmethod
+    def from_bits(cls, dg: DependencyGraph, bits: int) -> "IndexedPackageSet":
+        assert isinstance(bits, int) and bits >= 0
+        assert bits.bit_length() <= len(dg.installed)
+        pkset = cls(dg)
+        pkset._bits = bits
+        return pkset
+
+    @classmethod
+    def from_range(cls, dg: DependencyGraph, start: int, stop: int) -> "IndexedPackageSet":
+        """Packages with start <= _internal_id < stop."""
+        assert 0 <= start <= stop <= len(dg.installed)
+        return cls.from_bits(dg, ((1 << (stop - start)) - 1) << start)
+
+    @classmethod
+    def from_indices(cls, dg: DependencyGraph, idxs: Iterable[int]) -> "IndexedPackageSet":
+        """Bulk construction from indices, such as a list or a NumPy integer array."""
+        if hasattr(idxs, "tolist"):
+            idxs = idxs.tolist()
+        return cls.from_bits(dg, cls._checked_bits(idxs, len(dg.installed)))
+
+    @property
+    def bits(self) -> int:
+        return self._bits
+
+    @property
+    def _idxs(self) -> set[int]:
+        return set[int](iter_bits(self._bits))
+
+    @property
+    def _infos(self) -> list[PackageInfo]:
+        installed = self._dg.installed
+        return [installed[idx] for idx in iter_bits(self._bits)]
+
+    def add(self, pkinfo: PackageInfo) -> None:
+        self._bits |= 1 << pkinfo._internal_id
+
+    def add_resolved(
+        self,
+        dg: DependencyGraph,
+        items: Union[int, str, PackageInfo, Iterable[int], Iterable[str], Iterable[PackageInfo], Iterable[Union[int, str, PackageInfo]]],
+    ) -> None:
+        assert dg is self._dg
+        super().add_resolved(dg, items)
+
+    def __len__(self) -> int:
+        return self._bits.bit_count()
+
+    def __contains__(self, item: Union[int, str, PackageInfo]) -> bool:
+        if isinstance(item, int):
+            idx = item
+        elif isinstance(item, str):
+            pkinfo = self._dg._try_get_package(item)
+            if pkinfo is None:
+                return False
+            idx = pkinfo._internal_id
+        elif isinstance(item, PackageInfo):
+            idx = item._internal_id
+        else:
+            return False
+        return idx >= 0 and bool((self._bits >> idx) & 1)
+
+    def __iter__(self) -> Iterable[PackageInfo]:
+        installed = self._dg.installed
+        for idx in iter_bits(self._bits):
+            yield installed[idx]
+
+    def __or__(self, other: Union[PackageSet, AbstractSet[int]]) -> "IndexedPackageSet":
+        other_bits = self._coerce_bits(other)
+        if other_bits is None:
+            return NotImplemented
+        return self.from_bits(self._dg, self._bits | other_bits)
+
+    def __and__(self, other: Union[PackageSet, AbstractSet[int]]) -> "IndexedPackageSet":
+        other_bits = self._coerce_bits(other)
+        if other_bits is None:
+            return NotImplemented
+        return self.from_bits(self._dg, self._bits & other_bits)
+
+    def __sub__(self, other: Union[PackageSet, AbstractSet[int]]) -> "IndexedPackageSet":
+        other_bits = self._coerce_bits(other)
+        if other_bits is None:
+            return NotImplemented
+        return self.from_bits(self._dg, self._bits & ~other_bits)
+
+    def __xor__(self, other: Union[PackageSet, AbstractSet[int]]) -> "IndexedPackageSet":
+        other_bits = self._coerce_bits(other)
+        if other_bits is None:
+            return NotImplemented
+        return self.from_bits(self._dg, self._bits ^ other_bits)
+
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def __rsub__(self, other: Union[PackageSet, AbstractSet[int]]) -> "IndexedPackageSet":
+        other_bits = self._coerce_bits(other)
+        if other_bits is None:
+            return NotImplemented
+        return self.from_bits(self._dg, other_bits & ~self._bits)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, IndexedPackageSet):
+            return NotImplemented
+        return self._dg is other._dg and self._bits == other._bits
+
+    __hash__ = None
+
+    def isdisjoint(self, other: PackageSet) -> bool:
+        other_bits = self._coerce_bits(other)
+        assert other_bits is not None
+        return (self._bits & other_bits) == 0
+
+    def _coerce_bits(self, other: object) -> Optional[int]:
+        if isinstance(other, IndexedPackageSet):
+            assert other._dg is self._dg
+            return other._bits
+        if isinstance(other, PackageSet):
+            return bits_from_indices(other._idxs, len(self._dg.installed))
+        if isinstance(other, (set, frozenset)):
+            return self._checked_bits(other, len(self._dg.installed))
+        return None
+
+    @staticmethod
+    def _checked_bits(idxs: Iterable[int], count: int) -> int:
+        if not isinstance(idxs, (list, tuple, set, frozenset)):
+            idxs = list(idxs)
+        if len(idxs) == 0:
+            return 0
+        if min(idxs) < 0 or max(idxs) >= count:
+            raise ValueError(f"Invalid items: {[idx for idx in idxs if not (0 <= idx < count)]}")
+        return bits_from_indices(idxs, count)
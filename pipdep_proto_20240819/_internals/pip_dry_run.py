@@ -0,0 +1,365 @@
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+import errno
+import json
+import multiprocessing.pool
+import os
+from pathlib import Path
+import queue
+from typing import TYPE_CHECKING, Callable, Optional, Union
+
+from pipdep_proto_20240819._internals._subprocs.pip_worker_pool import PIP_MODULE_ARGS, PipWorkerPool, PipWorkerTask
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTaskReturnCode
+from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+from pipdep_proto_20240819._internals._subprocs.task_run_report import TaskRunRecord
+
+if TYPE_CHECKING:
+    from pipdep_proto_20240819._internals.dry_run_cache import DryRunCache
+
+###
+### Concurrent "pip install --dry-run" calls cannot share a pip cache dir, so
+### each of the pool_size concurrent tasks borrows one of a fixed set of cache
+### dirs, "<cache_root>/slot_<i>". The dirs are kept between runs, so a later
+### run reuses what an earlier one downloaded. A slot dir is seeded once from
+### a base cache with hardlinks only; across devices it is left unseeded rather
+### than filled with a full copy, and seeding is tried again on its next use.
+### pip replaces cache entries by writing a new
+### file and renaming it over the old one, so the hardlinked base files are
+### never modified through a slot's cache.
+###
+
+SEEDED_MARKER_NAME = ".seeded"
+
+### Number of stderr lines of a failed dry run kept for the failure report.
+DRY_RUN_ERR_TAIL_LINES = 20
+
+
+@dataclass
+class DryRunRow:
+    """One package that a requirement resolved to.
+
+    Attributes:
+        requirement: str
+            The requirement that was resolved.
+        name: str
+        version: str
+        requested: bool
+            Whether the package was the requirement itself, rather than a
+            dependency of it.
+        url: Optional[str]
+            Where pip would download the package from.
+    """
+    requirement: str
+    name: str
+    version: str
+    requested: bool
+    url: Optional[str]
+
+
+def seed_cache_dir(base_cache_dir: Optional[Path], cache_dir: Path) -> Path:
+    """Creates cache_dir as a hardlinked replica of base_cache_dir (if given).
+    Files are never copied: if base_cache_dir is on another device, seeding 
+    stops, and cache_dir fills up on its own. Does nothing if cache_dir was 
+    already seeded; a seeding that stopped is not marked as done.
+    """
+    marker = cache_dir / SEEDED_MARKER_NAME
+    if marker.is_file():
+        return cache_dir
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    is_complete = True
+    if base_cache_dir is not None and base_cache_dir.is_dir():
+        is_complete = _link_tree(base_cache_dir, cache_dir)
+    if is_complete:
+        marker.touch()
+    return cache_dir
+
+
+def _link_tree(src_root: Path, dest_root: Path) -> bool:
+    """Hardlinks the files of src_root into dest_root. Returns False if it
+    stopped because the two are on different devices.
+    """
+    for dirpath, _, filenames in os.walk(src_root):
+        dest_dir = dest_root / Path(dirpath).relative_to(src_root)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        for filename in filenames:
+            dest = dest_dir / filename
+            if dest.exists():
+                continue
+            try:
+                os.link(Path(dirpath) / filename, dest)
+            except OSError as e:
+                if e.errno == errno.EXDEV:
+                    return False
+                ### Unreadable or vanished entries are simply not seeded.
+    return True
+
+
+class CacheDirSlots:
+    """Fixed set of pip cache dirs, "<cache_root>/slot_<i>" for i in 
+    range(count), lent to one running task at a time. Tasks using it must
+    run in the process that owns it, e.g. on a ThreadPool.
+    """
+    _cache_root: Path
+    _base_cache_dir: Optional[Path]
+    _free: queue.SimpleQueue
+
+    def __init__(
+        self,
+        cache_root: Union[Path, str],
+        count: int,
+        base_cache_dir: Union[Path, str, None] = None,
+    ) -> None:
+        assert isinstance(count, int) and count >= 1
+        self._cache_root = Path(cache_root)
+        self._base_cache_dir = Path(base_cache_dir) if base_cache_dir is not None else None
+        self._free = queue.SimpleQueue()
+        for slot_idx in range(count):
+            self._free.put(slot_idx)
+
+    @property
+    def cache_root(self) -> Path:
+        return self._cache_root
+
+    @contextmanager
+    def acquire(self) -> Iterator[Path]:
+        """Lends a free slot's cache dir, seeded on first use. Blocks while
+        all slots are in use.
+        """
+        slot_idx = self._free.get()
+        try:
+            yield seed_cache_dir(self._base_cache_dir, self._cache_root / f"slot_{slot_idx}")
+        finally:
+            self._free.put(slot_idx)
+
+
+class PipDryRunTask(PipWorkerTask):
+    """Resolves one requirement with "pip install --dry-run --report".
+
+    With cache_slots, pip uses a cache dir borrowed from it for the duration
+    of the run; otherwise pip's default cache dir. With find_links,
+    pip is run with --no-index against that local directory only, so that the
+    resolution works offline. With a pip_pool, pip runs in one of its warm
+    worker processes instead of a new interpreter. When pip fails, the last
+    lines of its stderr are kept in err_tail.
+    """
+    _requirement: str
+    _report_path: Path
+    _cache_slots: Optional[CacheDirSlots]
+    _base_args: list[str]
+    _err_tail: list[str]
+
+    def __init__(
+        self,
+        requirement: str,
+        report_path: Union[Path, str],
+        cache_slots: Optional[CacheDirSlots] = None,
+        find_links: Union[Path, str, None] = None,
+        ignore_installed: bool = True,
+        extra_args: Iterable[str] = (),
+        timeout_secs: Optional[float] = None,
+        pip_pool: Optional[PipWorkerPool] = None,
+    ) -> None:
+        self._requirement = requirement
+        self._report_path = Path(report_path)
+        self._cache_slots = cache_slots
+        args = [
+            "install",
+            "--dry-run",
+            "--quiet",
+            "--disable-pip-version-check",
+            "--report", str(self._report_path),
+        ]
+        if ignore_installed:
+            args.append("--ignore-installed")
+        if find_links is not None:
+            args.extend(["--no-index", "--find-links", str(find_links)])
+        args.extend(extra_args)
+        args.append(requirement)
+        self._base_args = PIP_MODULE_ARGS + args
+        self._err_tail = list[str]()
+        super().__init__(args, pool=pip_pool, timeout_secs=timeout_secs)
+
+    @property
+    def requirement(self) -> str:
+        return self._requirement
+
+    @property
+    def report_path(self) -> Path:
+        return self._report_path
+
+    @property
+    def err_tail(self) -> list[str]:
+        """Last lines of pip's stderr, if the last run failed."""
+        return self._err_tail
+
+    def run(self) -> Union[ShellTaskReturnCode, Exception]:
+        self._err_tail = list[str]()
+        outcome = self._run_with_cache_slot()
+        if outcome != 0 and self._err_path is not None:
+            self._err_tail = _read_tail_lines(self._err_path, DRY_RUN_ERR_TAIL_LINES)
+        return outcome
+
+    def _run_with_cache_slot(self) -> Union[ShellTaskReturnCode, Exception]:
+        try:
+            self._report_path.parent.mkdir(parents=True, exist_ok=True)
+            self._report_path.unlink(missing_ok=True)
+        except Exception as e:
+            self._outcome = e
+            return e
+        if self._cache_slots is None:
+            self._args = list(self._base_args)
+            return super().run()
+        try:
+            with self._cache_slots.acquire() as cache_dir:
+                self._args = self._base_args[:-1] + ["--cache-dir", str(cache_dir), self._base_args[-1]]
+                return super().run()
+        except Exception as e:
+            self._outcome = e
+            return e
+
+
+def _read_tail_lines(path: Path, max_lines: int, max_bytes: int = 64 * 1024) -> list[str]:
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.fstat(f.fileno()).st_size - max_bytes))
+            data = f.read()
+    except OSError:
+        return []
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return [line for line in lines if line.strip()][-max_lines:]
+
+
+def parse_dry_run_report(requirement: str, report_path: Union[Path, str]) -> list[DryRunRow]:
+    """Reads a pip --report JSON file (format version 1) into table rows."""
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    rows = list[DryRunRow]()
+    for item in report.get("install", []):
+        metadata = item.get("metadata", {})
+        rows.append(DryRunRow(
+            requirement=requirement,
+            name=metadata.get("name", ""),
+            version=metadata.get("version", ""),
+            requested=bool(item.get("requested", False)),
+            url=item.get("download_info", {}).get("url"),
+        ))
+    return rows
+
+
+def run_pip_dry_runs(
+    requirements: Iterable[str],
+    work_dir: Union[Path, str],
+    pool_size: int = 4,
+    base_cache_dir: Union[Path, str, None] = None,
+    find_links: Union[Path, str, None] = None,
+    text_callback: Optional[Callable[[str], None]] = None,
+    cache: Optional["DryRunCache"] = None,
+    ignore_installed: bool = True,
+    pip_pool: Optional[PipWorkerPool] = None,
+    **executor_kwargs,
+) -> tuple[list[DryRunRow], dict[str, str]]:
+    """Resolves the requirements concurrently, and merges the reports.
+
+    The reports are written to "<work_dir>/reports". The pip caches are the
+    pool_size dirs "<work_dir>/caches/slot_<i>", which are reused by later runs
+    with the same work_dir. Extra keyword arguments are passed to 
+    TaskListExecutor.
+
+    With a DryRunCache, requirements whose key (see make_dry_run_key()) is
+    cached are not run, and new successful resolutions are stored. Without
+    ignore_installed, pip resolves against the packages installed for this
+    interpreter, so their fingerprint is then part of the key.
+    With a pip_pool, the resolutions run in its warm pip workers.
+
+    Returns:
+        tuple[list[DryRunRow], dict[str, str]]:
+            The merged rows, sorted by requirement and package name, and the
+            requirements that failed to resolve, with the reason: the task
+            status, pip's exit code, and the last lines of pip's stderr.
+    """
+    work_dir = Path(work_dir)
+    requirements = list(requirements)
+    rows = list[DryRunRow]()
+    failures = dict[str, str]()
+    keys = dict[str, str]()
+    if cache is not None:
+        ### Imported here, since dry_run_cache imports this module.
+        from pipdep_proto_20240819._internals.dry_run_cache import (
+            index_fingerprint,
+            installed_environment_fingerprint,
+            make_dry_run_key,
+            pip_version,
+        )
+        environment = None if ignore_installed else installed_environment_fingerprint()
+        index = index_fingerprint(find_links)
+        pip_ver = pip_version()
+        misses = list[str]()
+        for requirement in requirements:
+            key = make_dry_run_key(requirement, environment, index, pip_ver)
+            cached_rows = cache.get(key, requirement)
+            if cached_rows is None:
+                keys[requirement] = key
+                misses.append(requirement)
+            else:
+                rows.extend(cached_rows)
+        requirements = misses
+    if requirements:
+        cache_slots = CacheDirSlots(work_dir / "caches", pool_size, base_cache_dir)
+        tasks = [
+            PipDryRunTask(
+                requirement,
+                report_path=work_dir / "reports" / f"{task_idx}.json",
+                cache_slots=cache_slots,
+                find_links=find_links,
+                ignore_installed=ignore_installed,
+                pip_pool=pip_pool,
+            )
+            for task_idx, requirement in enumerate(requirements)
+        ]
+        tle = TaskListExecutor(tasks, pool_size, text_callback, **executor_kwargs)
+        ### The work is in the pip subprocesses; threads are enough to drive them.
+        with multiprocessing.pool.ThreadPool(pool_size) as pool:
+            tle.run(pool)
+        for task, record in zip(tasks, tle.records):
+            if record.status != "SUCCESS":
+                failures[task.requirement] = _describe_failure(task, record)
+                continue
+            try:
+                task_rows = parse_dry_run_report(task.requirement, task.report_path)
+            except (OSError, ValueError) as e:
+                failures[task.requirement] = f"unreadable report: {e}"
+                continue
+            if cache is not None:
+                cache.put(keys[task.requirement], task.requirement, task_rows)
+            rows.extend(task_rows)
+    rows.sort(key=lambda row: (row.requirement, row.name.lower()))
+    return rows, failures
+
+
+def _describe_failure(task: PipDryRunTask, record: TaskRunRecord) -> str:
+    details = list[str]()
+    if isinstance(task.outcome, Exception):
+        details.append(f"{type(task.outcome).__name__}: {task.outcome}")
+    elif task.outcome is not None:
+        details.append(f"exit code {task.outcome}")
+    if record.stats is not None and record.stats.stop_reason is not None:
+        details.append(record.stats.stop_reason)
+    reason = record.status + (f" ({', '.join(details)})" if details else "")
+    if task.err_tail:
+        reason += "\n" + "\n".join(f"    {line}" for line in task.err_tail)
+    return reason
+
+
+def format_dry_run_table(rows: list[DryRunRow]) -> list[str]:
+    """Aligned text table, one line per row."""
+    header = ("requirement", "package", "version", "requested")
+    table = [header] + [
+        (row.requirement, row.name, row.version, "yes" if row.requested else "")
+        for row in rows
+    ]
+    widths = [max(len(line[col]) for line in table) for col in range(len(header))]
+    return [
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip()
+        for line in table
+    ]
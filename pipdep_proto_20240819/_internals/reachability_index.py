@@ -0,0 +1,143 @@
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import Union
+
+from pipdep_proto_20240819._internals.condensed_graph import CondensedGraph
+from pipdep_proto_20240819._internals.csr_adjacency import CsrAdjacency
+
+
+class ReachabilityIndex:
+    """Transitive closure of a dependency graph, stored as one bitset per
+    strongly connected component.
+
+    Each bitset is a Python int, where bit i is set if node i is reachable
+    (through zero or more edges) from the members of the component. All members
+    of a component share the same closure, so cycles are stored only once.
+    The bitsets are computed in a single pass over the condensation DAG, in
+    reverse topological order, so that every component ORs in the already
+    computed closures of its successors. A CondensedGraph can be passed in
+    place of the adjacency, to reuse its components.
+    """
+    _node_count: int
+    _comp_of: array
+    _cyclic: list[bool]
+    _comp_bits: list[int]
+
+    def __init__(self, adj: Union[CsrAdjacency, CondensedGraph]) -> None:
+        if isinstance(adj, CondensedGraph):
+            condensed = adj
+        else:
+            condensed = CondensedGraph(adj)
+        self._node_count = condensed.node_count
+        self._comp_of = condensed._comp_of
+        self._cyclic = condensed._cyclic
+        components = condensed.components
+        comp_adj = condensed.component_adjacency
+        comp_bits = self._comp_bits = [0] * condensed.component_count
+        for comp_idx in condensed.sinks_first_order():
+            bits = 0
+            for idx in components[comp_idx]:
+                bits |= 1 << idx
+            for succ_idx in comp_adj.neighbors(comp_idx):
+                bits |= comp_bits[succ_idx]
+            comp_bits[comp_idx] = bits
+
+    @property
+    def node_count(self) -> int:
+        return self._node_count
+
+    def closure_bits(self, idx: int, include_self: bool = False) -> int:
+        bits = self._comp_bits[self._comp_of[idx]]
+        if not include_self:
+            bits &= ~(1 << idx)
+        return bits
+
+    def depends_on(self, idx: int, dep_idx: int) -> bool:
+        """Whether dep_idx is reachable from idx through one or more edges."""
+        if idx == dep_idx:
+            return self._cyclic[self._comp_of[idx]]
+        return bool((self._comp_bits[self._comp_of[idx]] >> dep_idx) & 1)
+
+    def closure(self, idx: int, include_self: bool = False) -> list[int]:
+        return list(iter_bits(self.closure_bits(idx, include_self)))
+
+    def closure_size(self, idx: int, include_self: bool = False) -> int:
+        return self.closure_bits(idx, include_self).bit_count()
+
+    def closure_union_bits(self, idxs: Iterable[int], include_self: bool = True) -> int:
+        """Union of the closures of several nodes, as a single bitset.
+        Without include_self, a given node is only included if it is reachable
+        from one of the given nodes through one or more edges.
+        """
+        bits = 0
+        if include_self:
+            comp_of = self._comp_of
+            comp_bits = self._comp_bits
+            for comp_idx in set(comp_of[idx] for idx in idxs):
+                bits |= comp_bits[comp_idx]
+        else:
+            for idx in idxs:
+                reached = self.closure_bits(idx, include_self=self._cyclic[self._comp_of[idx]])
+                bits |= reached
+        return bits
+
+    def closure_union(self, idxs: Iterable[int], include_self: bool = True) -> list[int]:
+        return list(iter_bits(self.closure_union_bits(idxs, include_self)))
+
+
+def transitive_reduction(adj: CsrAdjacency) -> CsrAdjacency:
+    """Removes the edges that are implied by other paths.
+
+    The reduction is computed over the condensation DAG: an edge between two
+    components is kept only if the target component is not reachable from 
+    another successor of the source component, and only one edge is kept per
+    remaining pair of components. Edges inside a component (dependency cycles)
+    are all kept, since a minimal equivalent subgraph of a cycle is not unique.
+    """
+    condensed = CondensedGraph(adj)
+    comp_of = condensed._comp_of
+    comp_adj = condensed.component_adjacency
+    comp_reach = ReachabilityIndex(comp_adj)
+    kept_pairs = set[tuple[int, int]]()
+    for comp_idx in range(comp_adj.node_count):
+        successors = comp_adj.neighbors(comp_idx)
+        implied = 0
+        for succ_idx in successors:
+            implied |= comp_reach.closure_bits(succ_idx, include_self=False)
+        for succ_idx in successors:
+            if not (implied >> succ_idx) & 1:
+                kept_pairs.add((comp_idx, succ_idx))
+    lists = list[list[int]]()
+    for idx in range(adj.node_count):
+        comp_idx = comp_of[idx]
+        kept = list[int]()
+        for dep_idx in adj.neighbors(idx):
+            dep_comp_idx = comp_of[dep_idx]
+            if dep_comp_idx == comp_idx:
+                kept.append(dep_idx)
+            elif (comp_idx, dep_comp_idx) in kept_pairs:
+                kept_pairs.discard((comp_idx, dep_comp_idx))
+                kept.append(dep_idx)
+        lists.append(kept)
+    return CsrAdjacency.from_lists(lists)
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Iterates over the positions of the set bits, in ascending order."""
+    s = bin(bits)[:1:-1]
+    pos = s.find("1")
+    while pos >= 0:
+        yield pos
+        pos = s.find("1", pos + 1)
+
+
+def bits_from_indices(idxs: Iterable[int], count: int) -> int:
+    """Bitset with the given positions set, all of which must be in [0, count).
+    The digits are collected in a bytearray and converted to an int once,
+    rather than growing the int one bit at a time.
+    """
+    digits = bytearray(b"0") * count
+    one = ord("1")
+    for idx in idxs:
+        digits[idx] = one
+    return int(digits[::-1] or b"0", 2)
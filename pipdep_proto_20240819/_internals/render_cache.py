@@ -0,0 +1,116 @@
+from collections.abc import Iterable, Mapping
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Any, Optional, Union
+
+RENDER_CACHE_KEY_VERSION = 1
+
+
+def make_subgraph_key(
+    nodes: Iterable[tuple[int, str, str]],
+    edges: Iterable[tuple[int, int]],
+    options: Mapping[str, Any],
+) -> str:
+    """Stable content hash of a filtered subgraph and its render options.
+
+    Args:
+        nodes: Iterable[tuple[int, str, str]]
+            (index, name, version) of each node.
+        edges: Iterable[tuple[int, int]]
+            (from index, to index) of each edge.
+        options: Mapping[str, Any]
+            Render options, including the output format. Values that are not
+            JSON serializable are hashed through their repr().
+    """
+    payload = {
+        "v": RENDER_CACHE_KEY_VERSION,
+        "nodes": sorted(list(node) for node in nodes),
+        "edges": sorted(list(edge) for edge in edges),
+        "options": options,
+    }
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Local directory of rendered outputs, keyed by make_subgraph_key(), with
+    size-bounded LRU eviction.
+
+    Each entry is a single file named "<key>.<format>". The file mtime is
+    refreshed on every hit and used as the LRU order.
+    """
+    _cache_dir: Path
+    _max_bytes: int
+
+    def __init__(self, cache_dir: Union[Path, str], max_bytes: int = 256 * 1024 * 1024) -> None:
+        assert isinstance(max_bytes, int) and max_bytes > 0
+        self._cache_dir = Path(cache_dir)
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+
+    @property
+    def cache_dir(self) -> Path:
+        return self._cache_dir
+
+    def get(self, key: str, format: str) -> Optional[Path]:
+        """Returns the cached file, or None on a miss."""
+        path = self._entry_path(key, format)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_to(self, key: str, format: str, output_path: Union[Path, str]) -> Optional[Path]:
+        """Copies the cached file to output_path on a hit, and returns output_path."""
+        cached_path = self.get(key, format)
+        if cached_path is None:
+            return None
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached_path, output_path)
+        return output_path
+
+    def put(self, key: str, format: str, rendered_path: Union[Path, str]) -> Path:
+        """Copies a rendered file into the cache, then evicts old entries."""
+        path = self._entry_path(key, format)
+        tmp_fd, tmp_name = tempfile.mkstemp(dir=self._cache_dir, suffix=".tmp")
+        os.close(tmp_fd)
+        try:
+            shutil.copyfile(rendered_path, tmp_name)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[Path] = None) -> list[Path]:
+        """Deletes the least recently used entries until the total size fits."""
+        entries = list[tuple[int, int, Path]]()
+        total_bytes = 0
+        with os.scandir(self._cache_dir) as dir_entries:
+            for dir_entry in dir_entries:
+                if not dir_entry.is_file() or dir_entry.name.endswith(".tmp"):
+                    continue
+                st = dir_entry.stat()
+                entries.append((st.st_mtime_ns, st.st_size, Path(dir_entry.path)))
+                total_bytes += st.st_size
+        entries.sort()
+        evicted = list[Path]()
+        for _, size, path in entries:
+            if total_bytes <= self._max_bytes:
+                break
+            if keep is not None and path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+            evicted.append(path)
+        return evicted
+
+    def _entry_path(self, key: str, format: str) -> Path:
+        return self._cache_dir / f"{key}.{format}"
@@ -0,0 +1,113 @@
+from array import array
+from collections.abc import Iterable
+from typing import Optional
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to names, for fuzzy name search.
+
+    Each name is indexed under the trigrams of the name padded with "$" on both
+    ends, so that prefixes and suffixes weigh in the similarity. Each name maps
+    to an integer value; several names may share the same value (aliases).
+    """
+    _names: list[str]
+    _values: array
+    _gram_counts: array
+    _postings: dict[str, array]
+
+    def __init__(self, items: Iterable[tuple[str, int]]) -> None:
+        self._names = list[str]()
+        self._values = array("i")
+        self._gram_counts = array("i")
+        self._postings = dict[str, array]()
+        seen = set[tuple[str, int]]()
+        for name, value in items:
+            if (name, value) in seen:
+                continue
+            seen.add((name, value))
+            pos = len(self._names)
+            grams = make_trigrams(name)
+            self._names.append(name)
+            self._values.append(value)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                posting = self._postings.get(gram)
+                if posting is None:
+                    posting = self._postings[gram] = array("i")
+                posting.append(pos)
+
+    def search(
+        self,
+        pattern: str,
+        fragments: Optional[list[str]] = None,
+        limit: Optional[int] = None,
+        min_similarity: float = 0.3,
+    ) -> list[tuple[int, float]]:
+        """Finds the values whose names resemble the pattern.
+
+        A name matches if it contains every fragment as a substring, or if its
+        trigram Jaccard similarity to the pattern is at least min_similarity.
+        Substring matches are ranked first, then by similarity, best first.
+
+        Args:
+            pattern: str
+                The pattern, normalized in the same way as the indexed names.
+            fragments: Optional[list[str]]
+                Substrings that must all appear in a name for a substring match.
+                Defaults to [pattern].
+
+        Returns:
+            list[tuple[int, float]]:
+                The matching values with their best similarity, one per value.
+        """
+        if fragments is None:
+            fragments = [pattern]
+        fragments = [fragment for fragment in fragments if fragment]
+        pattern_grams = make_trigrams(pattern)
+        common_counts = dict[int, int]()
+        for gram in pattern_grams:
+            for pos in self._postings.get(gram, ()):
+                common_counts[pos] = common_counts.get(pos, 0) + 1
+        substring_positions = self._find_substring_matches(fragments)
+        best = dict[int, tuple[bool, float]]()
+        for pos in substring_positions.union(common_counts):
+            common = common_counts.get(pos, 0)
+            union = len(pattern_grams) + self._gram_counts[pos] - common
+            similarity = common / union if union > 0 else 0.0
+            is_substring = pos in substring_positions
+            if not is_substring and similarity < min_similarity:
+                continue
+            value = self._values[pos]
+            rank = (is_substring, similarity)
+            if value not in best or rank > best[value]:
+                best[value] = rank
+        ranked = sorted(best.items(), key=lambda item: (not item[1][0], -item[1][1], item[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(value, similarity) for value, (_, similarity) in ranked]
+
+    def _find_substring_matches(self, fragments: list[str]) -> set[int]:
+        if not fragments:
+            return set[int](range(len(self._names)))
+        candidates: Optional[set[int]] = None
+        for fragment in fragments:
+            if len(fragment) < 3:
+                continue
+            for start in range(len(fragment) - 2):
+                posting = set[int](self._postings.get(fragment[start:start + 3], ()))
+                candidates = posting if candidates is None else candidates & posting
+                if not candidates:
+                    return set[int]()
+        if candidates is None:
+            ### Only fragments shorter than a trigram: fall back to a scan.
+            candidates = range(len(self._names))
+        names = self._names
+        return set[int](
+            pos for pos in candidates
+            if all(fragment in names[pos] for fragment in fragments)
+        )
+
+
+def make_trigrams(name: str) -> set[str]:
+    padded = "$" + name + "$"
+    return set(padded[start:start + 3] for start in range(len(padded) - 2))
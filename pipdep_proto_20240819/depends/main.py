@@ -9,8 +9,16 @@ if __name__ == "__main__":
     print_banner()
     workspace_dir = os.getcwd()
     source_dir = path_join(workspace_dir, "data/mock/google_colab_python3.10_20240819")
-    dg = DependencyGraph(source_dir)
+    dg = DependencyGraph.from_snapshot(source_dir)
     print_banner()
-    for pkinfo in dg.installed:
+    for pkinfo in dg.iter_installed():
         print(pkinfo)
     print_banner()
+    for name, dependent_name, kind in dg.check_required_by():
+        print(f"Required-by mismatch ({kind}): {name} <- {dependent_name}")
+    print_banner()
+    for cycle in dg.dependency_cycles():
+        print("Dependency cycle: " + ", ".join(dg.installed[idx].name for idx in cycle))
+    for layer_idx, layer in enumerate(dg.install_layers()):
+        print(f"Install layer {layer_idx}: " + ", ".join(dg.installed[idx].name for idx in layer))
+    print_banner()
@@ -1,21 +1,56 @@
-import multiprocessing
+import argparse
+import multiprocessing.pool
+import os
+from pathlib import Path
 
 
-from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+from pipdep_proto_20240819._internals._subprocs.pip_worker_pool import PipWorkerPool
 from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask
+from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+from pipdep_proto_20240819._internals.dry_run_cache import DryRunCache
+from pipdep_proto_20240819._internals.executor_funcs import subprocess_run_with_outtext
+from pipdep_proto_20240819._internals.pip_dry_run import format_dry_run_table, run_pip_dry_runs
 from pipdep_proto_20240819._internals.utils import print_banner
 
 
 def main():
-    packages = [
-        "numpy",
-        "opencv-python",
-        "opencv-contrib-python",
-        "numba",
-        "Cython",
-        "pandas",
-        "requests",
-    ]
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--find-links",
+        default=None,
+        help="Resolve offline against this directory of wheels (--no-index).",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=None,
+        help="Number of concurrent pip processes. Defaults to the CPU count.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Resolve every package, without reading or writing the result cache.",
+    )
+    parser.add_argument(
+        "--warm-pip",
+        action="store_true",
+        help="Run pip in long-lived worker processes instead of one interpreter per package.",
+    )
+    parser.add_argument(
+        "packages",
+        nargs="*",
+        default=[
+            "numpy",
+            "opencv-python",
+            "opencv-contrib-python",
+            "numba",
+            "Cython",
+            "pandas",
+            "requests",
+        ],
+    )
+    cmd_args = parser.parse_args()
+    packages = cmd_args.packages
 
     ### Currently, running pip install with dry-run option will still cause
     ### the relevant packages, dependencies, and wheels to be downloaded.
@@ -26,41 +61,76 @@ def main():
     ### This is somewhat by design, and somewhat an afterthought.
     ### For future versions of pip, this behavior may change, and the command
     ### arguments should be updated.
+    ###
+    ### Concurrent dry-runs would fight over a shared pip cache, so each worker
+    ### gets its own cache dir, seeded from the user's pip cache, which is only
+    ### read from.
 
-    tasks = list[ShellTask]()
+    base_cache_dir = subprocess_run_with_outtext(["pip", "cache", "dir"])[0].strip()
 
-    tasks.extend([
-        ShellTask(["pip", "install", "--dry-run", "--ignore-installed", package_name])
-        for package_name in packages
-    ])
+    ### The complete output of each task is spilled to compressed files,
+    ### rather than kept in memory.
+    work_dir = "do_not_commit/dry_run"
+    spill_dir = f"{work_dir}/logs"
+    report_path = f"{work_dir}/run_report.json"
 
-    tasks.append(
-        ShellTask(["pip", "cache", "dir", "--verbose"])
-    )
+    ### Resolutions are cached across runs, keyed by the requirement, the
+    ### interpreter, the package source, and the pip version. pip runs with
+    ### --ignore-installed, so the installed packages are not part of the key.
+    cache = None if cmd_args.no_cache else DryRunCache(f"{work_dir}/resolutions.sqlite")
 
-    tasks.append(
-        ShellTask(["pip", "cache", "info", "--verbose"])
-    )
+    def batch_callback(batch: list[tuple[int, str, str]]) -> None:
+        print("\n".join(f"[{idx}] {stream} {line}" for idx, stream, line in batch))
 
-    tasks.append(
-        ShellTask(["pip", "cache", "list", "--verbose"])
+    POOL_SIZE = cmd_args.pool_size or min(len(packages), os.cpu_count() or 1)
+    pip_pool = PipWorkerPool(POOL_SIZE) if cmd_args.warm_pip else None
+    print_banner()
+    rows, failures = run_pip_dry_runs(
+        packages,
+        work_dir,
+        pool_size=POOL_SIZE,
+        base_cache_dir=base_cache_dir,
+        find_links=cmd_args.find_links,
+        cache=cache,
+        pip_pool=pip_pool,
+        sleep_secs=0.5,
+        report_path=report_path,
+        batch_callback=batch_callback,
+        max_lines_per_task=10000,
+        spill_dir=spill_dir,
     )
-
-    dry_run_log = list[str]()
-
-    def text_callback(text: str) -> None:
-        dry_run_log.append(text)
-        print(text)
-
-    ### POOL_SIZE must be 1 because pip install cannot be parallelized 
-    ### even in dry-run mode.
-    POOL_SIZE = 1
-    sleep_secs = 0.5
-    tle = TaskListExecutor(tasks, POOL_SIZE, text_callback, sleep_secs)
+    if pip_pool is not None:
+        pip_pool.close()
+    print_banner()
+    for line in format_dry_run_table(rows):
+        print(line)
+    for requirement, reason in failures.items():
+        print(f"Failed to resolve {requirement}: {reason}")
     print_banner()
-    with multiprocessing.Pool(POOL_SIZE) as pool:
-        tle.run(pool)
+
+    ### The dry-run downloads land in the per-slot cache dirs; show what
+    ### they hold.
+    cache_tasks = list[ShellTask]()
+    for slot_dir in sorted(Path(work_dir, "caches").glob("slot_*")):
+        cache_tasks.append(
+            ShellTask(["pip", "cache", "dir", "--verbose", "--cache-dir", str(slot_dir)])
+        )
+        cache_tasks.append(
+            ShellTask(["pip", "cache", "info", "--verbose", "--cache-dir", str(slot_dir)])
+        )
+        cache_tasks.append(
+            ShellTask(["pip", "cache", "list", "--verbose", "--cache-dir", str(slot_dir)])
+        )
+    if cache_tasks:
+        tle = TaskListExecutor(cache_tasks, POOL_SIZE, sleep_secs=0.5, batch_callback=batch_callback)
+        with multiprocessing.pool.ThreadPool(POOL_SIZE) as pool:
+            tle.run(pool)
+    if cache is not None:
+        print(f"Cached resolutions: {len(cache)} in {cache.db_path}")
+        cache.close()
     print_banner()
-    
+    print(f"Run report: {report_path}")
+    print(f"Task logs: {spill_dir}")
+
 if __name__ == "__main__":
     main()
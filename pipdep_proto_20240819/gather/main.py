@@ -1,9 +1,11 @@
+import argparse
 from collections.abc import Iterable
 import json
 import multiprocessing
 import multiprocessing.pool
 from os.path import join as path_join
 import pprint
+from functools import partial
 from typing import Optional
 
 from pipdep_proto_20240819._internals.utils import (
@@ -13,13 +15,61 @@ from pipdep_proto_20240819._internals.utils import (
 
 from pipdep_proto_20240819._internals.executor_funcs import (
     subprocess_run_with_outtext, 
+    subprocess_run_with_outerr,
     multiprocess_map_async_then,
 )
 
+from pipdep_proto_20240819._internals._subprocs.pip_worker_pool import PipWorkerPool
 
-def pip_list_installed_packages() -> list[str]:
-    args = ["pip", "list"]
-    outtext = subprocess_run_with_outtext(args)
+from pipdep_proto_20240819._internals.dist_info_scanner import (
+    canonicalize_dist_name,
+    scan_installed_props,
+    diff_installed_props,
+)
+
+
+### Time limit of each pip call; "pip show" normally takes about a second.
+DEFAULT_PIP_TIMEOUT_SECS = 120.0
+
+### Number of stderr lines included in the error of a failed pip call.
+PIP_STDERR_TAIL_LINES = 20
+
+
+def pip_run_with_outtext(
+    pip_args: list[str], 
+    pip_pool: Optional[PipWorkerPool] = None,
+    merge_stderr: bool = True,
+    check: bool = True,
+    timeout_secs: Optional[float] = None,
+) -> list[str]:
+    """Runs "pip <pip_args>" as a subprocess, or in a warm worker of pip_pool.
+    With timeout_secs, pip is killed on expiry, and TimeoutError is raised.
+    """
+    if pip_pool is None:
+        return subprocess_run_with_outtext(
+            ["pip", *pip_args], merge_stderr=merge_stderr, check=check, timeout_secs=timeout_secs,
+        )
+    return pip_pool.run_with_outtext(pip_args, merge_stderr=merge_stderr, check=check, timeout_secs=timeout_secs)
+
+
+def pip_run_with_outerr(
+    pip_args: list[str], 
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = None,
+) -> tuple[int, list[str], list[str]]:
+    """Runs "pip <pip_args>" like pip_run_with_outtext(), and returns its
+    exit code and the lines of stdout and stderr, without raising if pip failed.
+    """
+    if pip_pool is None:
+        return subprocess_run_with_outerr(["pip", *pip_args], timeout_secs=timeout_secs)
+    return pip_pool.run_with_outerr(pip_args, timeout_secs=timeout_secs)
+
+
+def pip_list_installed_packages(
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = None,
+) -> list[str]:
+    outtext = pip_run_with_outtext(["list"], pip_pool, timeout_secs=timeout_secs)
     package_names = list[str]()
     for n, line in enumerate(outtext):
         if n >= 2:
@@ -27,15 +77,83 @@ def pip_list_installed_packages() -> list[str]:
     return package_names
 
 
-def pip_show_installed(package_name: str) -> list[str]:
-    args = ["pip", "show", package_name]
-    outtext = subprocess_run_with_outtext(args)
+def pip_show_installed(
+    package_name: str, 
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = None,
+) -> list[str]:
+    outtext = pip_run_with_outtext(["show", package_name], pip_pool, timeout_secs=timeout_secs)
     return outtext
 
 
-def pip_get_installed_props(package_name: str, prop_names: Optional[Iterable[str]]) -> dict[str, str]:
-    args = ["pip", "show", package_name]
-    outtext = subprocess_run_with_outtext(args)
+def pip_get_installed_props(
+    package_name: str, 
+    prop_names: Optional[Iterable[str]],
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = None,
+) -> dict[str, str]:
+    outtext = pip_run_with_outtext(["show", package_name], pip_pool, timeout_secs=timeout_secs)
+    return _parse_prop_lines(outtext, prop_names)
+
+
+def pip_show_installed_batch(
+    package_names: Iterable[str], 
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = None,
+) -> dict[str, Optional[list[str]]]:
+    """Runs a single "pip show a b c ..." and splits the output into one
+    list of lines per package, on pip's "---" record separator.
+
+    pip reports packages that are not found on stderr (and fails only if none
+    was found), so the records are read from stdout only, and matched to the 
+    requested names by their "Name:" field. Returns the lines for each
+    requested name, or None if pip did not show it. Raises if pip failed
+    without showing any package, with the end of its stderr, since pip itself
+    may have failed rather than found nothing.
+    """
+    package_names = list(package_names)
+    returncode, outtext, errtext = pip_run_with_outerr(
+        ["show", *package_names], pip_pool, timeout_secs=timeout_secs,
+    )
+    records = list[list[str]]([[]])
+    for line in outtext:
+        if line == "---":
+            records.append([])
+            continue
+        records[-1].append(line)
+    by_canon_name = dict[str, list[str]]()
+    for record in records:
+        name = _parse_prop_lines(record, ["name"]).get("Name")
+        if name is not None:
+            by_canon_name[canonicalize_dist_name(name)] = record
+    if returncode != 0 and not by_canon_name:
+        err_tail = "\n".join(errtext[-PIP_STDERR_TAIL_LINES:])
+        raise Exception(f"pip show failed with code {returncode}: {err_tail}")
+    return {
+        package_name: by_canon_name.get(canonicalize_dist_name(package_name))
+        for package_name in package_names
+    }
+
+
+def pip_get_installed_props_batch(
+    package_names: Iterable[str], 
+    prop_names: Optional[Iterable[str]],
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = None,
+) -> tuple[list[dict[str, str]], list[str]]:
+    """Returns the property dicts of the packages found, and the names of the
+    packages that were not found.
+    """
+    records = pip_show_installed_batch(package_names, pip_pool, timeout_secs)
+    prop_dicts = [
+        _parse_prop_lines(record, prop_names) 
+        for record in records.values() if record is not None
+    ]
+    missing = [package_name for package_name, record in records.items() if record is None]
+    return prop_dicts, missing
+
+
+def _parse_prop_lines(outtext: Iterable[str], prop_names: Optional[Iterable[str]]) -> dict[str, str]:
     prop_names = frozenset(prop_name.lower() for prop_name in prop_names) if prop_names else None
     prop_dict = dict[str, str]()
     for line in outtext:
@@ -51,17 +169,56 @@ def pip_get_installed_props(package_name: str, prop_names: Optional[Iterable[str
     return prop_dict
 
 
-def fn_get_requires(package_name: str) -> dict[str, str]:
+def fn_get_requires(
+    package_name: str, 
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = None,
+) -> dict[str, str]:
     # prop_names = ["name", "requires", "required-by"]
     prop_names = None
     start_time = make_timestamp_string()
-    prop_dict = pip_get_installed_props(package_name, prop_names=prop_names)
+    prop_dict = pip_get_installed_props(
+        package_name, prop_names=prop_names, pip_pool=pip_pool, timeout_secs=timeout_secs,
+    )
     stop_time = make_timestamp_string()
     prop_dict["my_timing_start_time"] = start_time
     prop_dict["my_timing_stop_time"] = stop_time
     return prop_dict
 
 
+def fn_get_requires_batch(
+    package_names: list[str], 
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = None,
+) -> tuple[list[dict[str, str]], list[str]]:
+    prop_names = None
+    start_time = make_timestamp_string()
+    prop_dicts, missing = pip_get_installed_props_batch(
+        package_names, prop_names=prop_names, pip_pool=pip_pool, timeout_secs=timeout_secs,
+    )
+    stop_time = make_timestamp_string()
+    for prop_dict in prop_dicts:
+        prop_dict["my_timing_start_time"] = start_time
+        prop_dict["my_timing_stop_time"] = stop_time
+    return prop_dicts, missing
+
+
+def split_into_chunks(items: Iterable[str], chunk_size: int) -> list[list[str]]:
+    assert isinstance(chunk_size, int) and chunk_size >= 1
+    items = list(items)
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+
+def dist_info_get_all_props(search_paths: Optional[Iterable[str]] = None) -> list[dict[str, str]]:
+    start_time = make_timestamp_string()
+    prop_dicts = scan_installed_props(search_paths)
+    stop_time = make_timestamp_string()
+    for prop_dict in prop_dicts:
+        prop_dict["my_timing_start_time"] = start_time
+        prop_dict["my_timing_stop_time"] = stop_time
+    return prop_dicts
+
+
 def fn_save_to_drive(package_name: str) -> dict[str, str]:
     prop_dict = fn_get_requires(package_name)
     output_dir = "/content/drive/MyDrive/Colab/pipdep/test_only"
@@ -71,23 +228,144 @@ def fn_save_to_drive(package_name: str) -> dict[str, str]:
     return prop_dict
 
 
-if __name__ == "__main__":
-    print_banner()
-    package_names = pip_list_installed_packages()
-    for package_name in package_names:
-        print(package_name)
-    print_banner()
-    with multiprocessing.Pool(8) as pool:
-        def fn_success(arg, result): 
-            print_banner("-")
-            pprint.pprint(result)
+def gather_with_pip(
+    package_names: list[str], 
+    pool_size: int = 8,
+    chunk_size: int = 1,
+    use_threads: bool = False,
+    pip_pool: Optional[PipWorkerPool] = None,
+    timeout_secs: Optional[float] = DEFAULT_PIP_TIMEOUT_SECS,
+) -> list[dict[str, str]]:
+    """Runs "pip show" for all packages on a pool.
+
+    Args:
+        chunk_size: int
+            Number of packages per "pip show" call. With 1, each package is
+            shown by its own subprocess, as originally implemented.
+        use_threads: bool
+            Whether to use a thread pool instead of a process pool. The work is
+            bound by the pip subprocesses, so threads avoid the memory cost of
+            the Python worker processes.
+        pip_pool: Optional[PipWorkerPool]
+            Warm pip workers to run "pip show" in, instead of a new interpreter
+            per call. Implies use_threads, since the pool cannot be shared with
+            worker processes.
+        timeout_secs: Optional[float]
+            Time limit of each "pip show" call; a call that hangs is killed,
+            so that it frees its pool worker, and reported as failed.
+    """
+    results = list[dict[str, str]]()
+    use_threads = use_threads or pip_pool is not None
+    pool_cls = multiprocessing.pool.ThreadPool if use_threads else multiprocessing.Pool
+    with pool_cls(pool_size) as pool:
         def fn_failure(arg, exc):
             print_banner("-")
             print(f"failed: {arg} {str(exc)}")
+        def fn_success(arg, result): 
+            if chunk_size == 1:
+                result = [result], []
+            prop_dicts, missing = result
+            for prop_dict in prop_dicts:
+                print_banner("-")
+                pprint.pprint(prop_dict)
+                results.append(prop_dict)
+            for package_name in missing:
+                fn_failure(package_name, LookupError(f"package {package_name} not found by pip show."))
         def fn_patience():
             return True
-        fn = fn_get_requires
-        args = package_names
-        multiprocess_map_async_then(pool, fn, args, fn_success, fn_failure, fn_patience, wait_time=1.0)
-    print_banner()
+        if chunk_size == 1:
+            fn = fn_get_requires
+            args = package_names
+        else:
+            fn = fn_get_requires_batch
+            args = split_into_chunks(package_names, chunk_size)
+        fn = partial(fn, pip_pool=pip_pool, timeout_secs=timeout_secs)
+        multiprocess_map_async_then(
+            pool, fn, args, fn_success, fn_failure, fn_patience,
+            wait_time=1.0, worker_count=pool_size,
+        )
+    return results
 
+
+def gather_with_dist_info(search_paths: Optional[Iterable[str]] = None) -> list[dict[str, str]]:
+    results = dist_info_get_all_props(search_paths)
+    for result in results:
+        print_banner("-")
+        pprint.pprint(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--backend",
+        choices=["pip", "dist-info", "both"],
+        default="pip",
+        help="pip: one 'pip show' subprocess per package; dist-info: in-process metadata scan; "
+        "both: run both and report mismatches.",
+    )
+    parser.add_argument(
+        "--site-packages",
+        action="append",
+        default=None,
+        help="Directory to scan with the dist-info backend (repeatable). Defaults to sys.path.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1,
+        help="Number of packages per 'pip show' call with the pip backend.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of concurrent 'pip show' calls with the pip backend.",
+    )
+    parser.add_argument(
+        "--threads",
+        action="store_true",
+        help="Use a thread pool instead of a process pool with the pip backend.",
+    )
+    parser.add_argument(
+        "--timeout-secs",
+        type=float,
+        default=DEFAULT_PIP_TIMEOUT_SECS,
+        help="Time limit of each pip call with the pip backend; hung calls are killed.",
+    )
+    parser.add_argument(
+        "--warm-pip",
+        action="store_true",
+        help="Run 'pip show' in long-lived pip worker processes (implies --threads).",
+    )
+    cmd_args = parser.parse_args()
+    pip_results = None
+    dist_info_results = None
+    if cmd_args.backend in ("pip", "both"):
+        print_banner()
+        pip_pool = PipWorkerPool(cmd_args.workers) if cmd_args.warm_pip else None
+        package_names = pip_list_installed_packages(pip_pool, timeout_secs=cmd_args.timeout_secs)
+        for package_name in package_names:
+            print(package_name)
+        print_banner()
+        pip_results = gather_with_pip(
+            package_names,
+            pool_size=cmd_args.workers,
+            chunk_size=cmd_args.chunk_size,
+            use_threads=cmd_args.threads,
+            pip_pool=pip_pool,
+            timeout_secs=cmd_args.timeout_secs,
+        )
+        if pip_pool is not None:
+            pip_pool.close()
+        print_banner()
+    if cmd_args.backend in ("dist-info", "both"):
+        print_banner()
+        dist_info_results = gather_with_dist_info(cmd_args.site_packages)
+        print_banner()
+    if pip_results is not None and dist_info_results is not None:
+        mismatches = diff_installed_props(pip_results, dist_info_results)
+        for canon_name, prop_name, pip_value, dist_info_value in mismatches:
+            print(f"mismatch: {canon_name} {prop_name}: pip={pip_value!r} dist-info={dist_info_value!r}")
+        print(f"{len(mismatches)} mismatches.")
+        print_banner()
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+
+
+def write_package_json(
+    source_dir: Path,
+    name: str,
+    version: str,
+    requires: list[str] = (),
+    required_by: list[str] = (),
+) -> Path:
+    """Writes one package in the shape of the "pip show" json files."""
+    path = source_dir / f"{name}.json"
+    path.write_text(json.dumps({
+        "Name": name,
+        "Version": version,
+        "Requires": ", ".join(requires),
+        "Required-by": ", ".join(required_by),
+    }, indent=4))
+    return path
+
+
+def edges_by_name(dg: DependencyGraph) -> set[tuple[str, str]]:
+    """(package, dependency) name pairs of all edges of the graph."""
+    return {
+        (pkinfo.name, dg.installed[dep_idx].name)
+        for pkinfo in dg.installed
+        for dep_idx in dg.iter_dependencies(pkinfo._internal_id)
+    }
+
+
+@pytest.fixture
+def cyclic_source_dir(tmp_path: Path) -> Path:
+    """Six packages: appa -> appb -> appc -> appa is a dependency cycle, and
+    appa, appb and appf depend on libd -> libe. The edges appf -> libe (via
+    libd), and one of appa -> libd and appb -> libd, are implied by others.
+    """
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    write_package_json(source_dir, "appa", "1.0", ["appb", "libd"])
+    write_package_json(source_dir, "appb", "1.0", ["appc", "libd"])
+    write_package_json(source_dir, "appc", "1.0", ["appa"])
+    write_package_json(source_dir, "libd", "2.0", ["libe"])
+    write_package_json(source_dir, "libe", "3.0")
+    write_package_json(source_dir, "appf", "1.0", ["libd", "libe"])
+    return source_dir
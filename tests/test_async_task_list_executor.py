@@ -0,0 +1,80 @@
+import threading
+import time
+
+from pipdep_proto_20240819._internals._subprocs.async_task_list_executor import AsyncTaskListExecutor
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask
+
+
+def _run(tasks: list[ShellTask], max_in_flight: int = 1, **kwargs) -> list[str]:
+    messages = list[str]()
+    AsyncTaskListExecutor(tasks, max_in_flight, text_callback=messages.append, **kwargs).run()
+    return messages
+
+
+def test_output_and_status_lines():
+    tasks = [
+        ShellTask(["sh", "-c", "echo one; echo warn >&2; echo two"]),
+        ShellTask(["sh", "-c", "echo bad >&2; exit 4"]),
+    ]
+    messages = _run(tasks)
+    ### With a semaphore of 1, the tasks run one after the other. The two pipes
+    ### are read concurrently, so only the order within each stream is fixed.
+    assert [m for m in messages[:3] if " OUT " in m] == ["[0] OUT one", "[0] OUT two"]
+    assert [m for m in messages[:3] if " ERR " in m] == ["[0] ERR warn"]
+    assert messages[3:] == ["[0] SUCCESS", "[1] ERR bad", "[1] FAILURE"]
+    assert tasks[0].outcome == 0 and tasks[1].outcome == 4
+    assert tasks[0].stats.out_bytes == len(b"one\ntwo\n")
+    assert tasks[0].stats.err_bytes == len(b"warn\n")
+
+
+def test_unterminated_last_line():
+    assert _run([ShellTask(["printf", "no newline"])]) == ["[0] OUT no newline", "[0] SUCCESS"]
+
+
+def test_task_timeout():
+    start = time.monotonic()
+    messages = _run([ShellTask(["sleep", "30"], timeout_secs=0.3)])
+    assert time.monotonic() - start < 10.0
+    assert messages == ["[0] FAILURE (timeout)"]
+
+
+def test_deadline_stops_running_and_cancels_queued_tasks():
+    start = time.monotonic()
+    tasks = [ShellTask(["sleep", "30"]), ShellTask(["sleep", "30"])]
+    messages = _run(tasks, deadline_secs=0.5)
+    assert time.monotonic() - start < 10.0
+    assert messages == ["[0] FAILURE (timeout)", "[1] CANCELLED (deadline reached)"]
+    assert tasks[0].stats.stop_reason == "timeout"
+    assert tasks[1].outcome is None
+
+
+def test_cancel_from_another_thread():
+    messages = list[str]()
+    executor = AsyncTaskListExecutor(
+        [ShellTask(["sleep", "30"]), ShellTask(["sleep", "30"])], 1, text_callback=messages.append,
+    )
+    timer = threading.Timer(0.5, executor.cancel)
+    start = time.monotonic()
+    timer.start()
+    try:
+        executor.run()
+    finally:
+        timer.cancel()
+    assert time.monotonic() - start < 10.0
+    assert messages == ["[0] CANCELLED", "[1] CANCELLED (cancel() called)"]
+
+
+def test_cancel_from_the_text_callback():
+    def on_text(s: str) -> None:
+        messages.append(s)
+        if s == "[0] OUT started":
+            executor.cancel()
+
+    messages = list[str]()
+    executor = AsyncTaskListExecutor(
+        [ShellTask(["sh", "-c", "echo started; exec sleep 30"])], 1, text_callback=on_text,
+    )
+    start = time.monotonic()
+    executor.run()
+    assert time.monotonic() - start < 10.0
+    assert messages == ["[0] OUT started", "[0] CANCELLED"]
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from pipdep_proto_20240819._internals.batch_graph_exporter import BatchGraphExporter
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.dependency_graph_exporter import DependencyGraphExporter
+from pipdep_proto_20240819._internals.package_set import IndexedPackageSet
+
+
+def test_exported_packages_follow_the_closure(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    included = IndexedPackageSet.from_indices(dg, [dg.lookup["appf"]])
+    exporter = DependencyGraphExporter(dg, included)
+    assert sorted(pkinfo.name for pkinfo in exporter.exported_packages) == ["appf", "libd", "libe"]
+    assert exporter.node_count == 3
+    excluded = IndexedPackageSet.from_indices(dg, [dg.lookup["libd"]])
+    exporter = DependencyGraphExporter(dg, included, excluded)
+    assert sorted(pkinfo.name for pkinfo in exporter.exported_packages) == ["appf", "libe"]
+
+
+def test_write_sources_reports_counts(cyclic_source_dir: Path, tmp_path: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    batch = BatchGraphExporter(dg, [dg.lookup["appf"], dg.lookup["appa"]])
+    items = batch.write_sources(tmp_path)
+    assert [(item.node_count, item.edge_count) for item in items] == [(3, 3), (5, 6)]
+    assert all(item.source_path.is_file() for item in items)
@@ -0,0 +1,78 @@
+import os
+from pathlib import Path
+
+from pipdep_proto_20240819._internals.condensed_graph import CondensedGraph
+from pipdep_proto_20240819._internals.csr_adjacency import CsrAdjacency
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+
+from conftest import write_package_json
+
+
+def _names(dg: DependencyGraph, idxs) -> list[str]:
+    return sorted(dg.installed[idx].name for idx in idxs)
+
+
+def test_cycle_is_one_component(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    condensed = dg.condensed
+    assert condensed.node_count == 6
+    assert condensed.component_count == 4
+    assert [_names(dg, cycle) for cycle in dg.dependency_cycles()] == [["appa", "appb", "appc"]]
+    comp_idx = condensed.component_of(dg.lookup["appa"])
+    assert condensed.component_of(dg.lookup["appb"]) == comp_idx
+    assert condensed.component_of(dg.lookup["appc"]) == comp_idx
+    assert condensed.is_cyclic(comp_idx)
+    assert not condensed.is_cyclic(condensed.component_of(dg.lookup["libd"]))
+
+
+def test_component_adjacency_is_a_dag(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    condensed = dg.condensed
+    comp_adj = condensed.component_adjacency
+    ### The cycle's two edges into libd are merged into one component edge.
+    assert comp_adj.edge_count == 4
+    position = {comp_idx: pos for pos, comp_idx in enumerate(condensed.sinks_first_order())}
+    for comp_idx in range(condensed.component_count):
+        assert not comp_adj.has_edge(comp_idx, comp_idx)
+        for succ_idx in comp_adj.neighbors(comp_idx):
+            assert position[succ_idx] < position[comp_idx]
+
+
+def test_install_layers(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    layers = [_names(dg, layer) for layer in dg.install_layers()]
+    assert layers == [["libe"], ["libd"], ["appa", "appb", "appc", "appf"]]
+    assert dg.condensed.layer_count == 3
+    assert dg.condensed.layer_of(dg.lookup["appc"]) == 2
+    assert [_names(dg, layer) for layer in dg.install_layers(["libd"])] == [["libe"], ["libd"]]
+    install_order = [dg.installed[idx].name for idx in dg.install_order(["appf"])]
+    assert install_order == ["libe", "libd", "appf"]
+
+
+def test_reversed_layers_put_dependents_first(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    rev = dg.condensed.reversed()
+    assert rev.components == dg.condensed.components
+    layers = [_names(dg, layer) for layer in rev.layers()]
+    assert layers == [["appa", "appb", "appc", "appf"], ["libd"], ["libe"]]
+
+
+def test_self_loop_is_cyclic():
+    condensed = CondensedGraph(CsrAdjacency.from_lists([[0, 1], []]))
+    assert condensed.component_count == 2
+    assert condensed.cycles() == [[0]]
+    assert condensed.layer_of(0) == 1
+
+
+def test_condensation_is_rebuilt_after_refresh(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    assert len(dg.dependency_cycles()) == 1
+    appc_path = write_package_json(cyclic_source_dir, "appc", "1.1")
+    ### Make sure the change is visible even with a coarse mtime resolution.
+    st = appc_path.stat()
+    os.utime(appc_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000_000))
+    dg.refresh()
+    assert dg.dependency_cycles() == []
+    assert dg.condensed.component_count == 6
+    layers = [_names(dg, layer) for layer in dg.install_layers()]
+    assert layers == [["appc", "libe"], ["libd"], ["appb", "appf"], ["appa"]]
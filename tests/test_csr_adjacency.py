@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from pipdep_proto_20240819._internals.csr_adjacency import CsrAdjacency, CsrAdjacencyView
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+
+from conftest import edges_by_name
+
+
+def test_from_lists_sorts_and_dedups():
+    adj = CsrAdjacency.from_lists([[2, 1, 2], [], [0]])
+    assert (adj.node_count, adj.edge_count) == (3, 3)
+    assert list(adj.offsets) == [0, 2, 2, 3]
+    assert [list(adj.neighbors(idx)) for idx in range(3)] == [[1, 2], [], [0]]
+    assert [adj.degree(idx) for idx in range(3)] == [2, 0, 1]
+    assert adj.has_edge(0, 2) and not adj.has_edge(2, 1)
+
+
+def test_transpose_and_with_replaced():
+    adj = CsrAdjacency.from_lists([[1, 2], [2], []])
+    assert [list(adj.transpose().neighbors(idx)) for idx in range(3)] == [[], [0], [0, 1]]
+    replaced = adj.with_replaced({1: [0, 0]}, node_count=4)
+    assert [list(replaced.neighbors(idx)) for idx in range(4)] == [[1, 2], [0], [], []]
+
+
+def test_view_iterates_like_a_dict():
+    adj = CsrAdjacency.from_lists([[1, 2], [2], []])
+    view = CsrAdjacencyView(adj)
+    assert dict(view) == {0: frozenset({1, 2}), 1: frozenset({2}), 2: frozenset()}
+    assert list(view) == [0, 1, 2] and len(view) == 3
+    assert list(view.items())[1] == (1, frozenset({2}))
+    assert 2 in view and 3 not in view and "0" not in view
+    assert view.get(3) is None
+    with pytest.raises(KeyError):
+        view[-1]
+
+
+def test_graph_deps_view_matches_edges(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    names = {pkinfo._internal_id: pkinfo.name for pkinfo in dg.installed}
+    from_view = {
+        (names[idx], names[dep_idx])
+        for idx, dep_idxs in dg.deps.items()
+        for dep_idx in dep_idxs
+    }
+    assert from_view == edges_by_name(dg)
+    assert len(from_view) == 8
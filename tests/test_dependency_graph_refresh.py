@@ -0,0 +1,90 @@
+import io
+import os
+from pathlib import Path
+
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.dependency_graph_exporter import DependencyGraphExporter
+from pipdep_proto_20240819._internals.package_set import IndexedPackageSet
+
+from conftest import edges_by_name, write_package_json
+
+
+def _ids_by_name(dg: DependencyGraph) -> dict[str, int]:
+    return {pkinfo.name: pkinfo._internal_id for pkinfo in dg.installed}
+
+
+def _bump_mtime(path: Path) -> None:
+    ### Make sure the change is visible even with a coarse mtime resolution.
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000_000))
+
+
+def test_refresh_without_changes(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    assert dg.refresh() == ([], [], [])
+
+
+def test_refresh_after_editing_one_file(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    ids_before = _ids_by_name(dg)
+    libd_path = write_package_json(cyclic_source_dir, "libd", "2.1")
+    _bump_mtime(libd_path)
+
+    assert dg.refresh() == ([], ["libd.json"], [])
+
+    assert _ids_by_name(dg) == ids_before
+    libd = dg.installed[dg.lookup["libd"]]
+    assert libd.version == "2.1"
+    assert list(dg.iter_dependencies(libd._internal_id)) == []
+    assert not dg.depends_on("appa", "libe")
+    assert dg.depends_on("appf", "libe")
+    fresh = DependencyGraph(cyclic_source_dir)
+    assert edges_by_name(dg) == edges_by_name(fresh)
+    assert sorted(dg.installed[idx].name for idx in dg.closure("appa")) == ["appb", "appc", "libd"]
+
+
+def test_refresh_ignores_touched_but_unchanged_file(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    _bump_mtime(cyclic_source_dir / "appf.json")
+    assert dg.refresh() == ([], [], [])
+    assert dg.refresh() == ([], [], [])
+
+
+def test_refresh_after_removing_and_re_adding_a_file(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    libe_idx = dg.lookup["libe"]
+    libe_path = cyclic_source_dir / "libe.json"
+    libe_raw = libe_path.read_bytes()
+    libe_path.unlink()
+
+    assert dg.refresh() == ([], [], ["libe.json"])
+    assert "libe" not in dg.lookup
+    assert dg.installed[libe_idx].version is None
+    assert list(dg.iter_dependencies(dg.lookup["libd"])) == []
+    assert list(dg.iter_dependencies(dg.lookup["appf"])) == [dg.lookup["libd"]]
+
+    libe_path.write_bytes(libe_raw)
+    _bump_mtime(libe_path)
+    assert dg.refresh() == (["libe.json"], [], [])
+    assert dg.lookup["libe"] == libe_idx
+    assert edges_by_name(dg) == edges_by_name(DependencyGraph(cyclic_source_dir))
+
+
+def test_removed_package_is_hidden_from_listings_and_exports(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    libe_idx = dg.lookup["libe"]
+    (cyclic_source_dir / "libe.json").unlink()
+    dg.refresh()
+
+    assert dg.is_removed(libe_idx)
+    assert not dg.is_removed(dg.lookup["libd"])
+    assert [pkinfo.name for pkinfo in dg.iter_installed()] == ["appa", "appb", "libd", "appf", "appc"]
+    assert len(dg.installed) == 6
+
+    everything = IndexedPackageSet.from_range(dg, 0, len(dg.installed))
+    exporter = DependencyGraphExporter(dg, everything)
+    dot = io.StringIO()
+    exporter.write(dot, "dot")
+    assert "libe" not in dot.getvalue()
+    assert "libd" in dot.getvalue()
+    assert exporter.edge_count == 6
@@ -0,0 +1,81 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.dependency_graph_snapshot import (
+    DependencyGraphSnapshot,
+    _HEADER,
+    _TOC_ENTRY,
+)
+
+from conftest import edges_by_name, write_package_json
+
+
+def test_snapshot_round_trip(cyclic_source_dir: Path, tmp_path: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    snapshot_path = dg.to_snapshot(tmp_path / "graph.dgsnap")
+    loaded = DependencyGraph.from_snapshot(cyclic_source_dir, snapshot_path, rebuild_if_stale=False)
+    assert [(p.name, p.version) for p in loaded.installed] == [(p.name, p.version) for p in dg.installed]
+    assert loaded.lookup == dg.lookup
+    assert list(loaded.forward_adjacency.offsets) == list(dg.forward_adjacency.offsets)
+    assert list(loaded.forward_adjacency.targets) == list(dg.forward_adjacency.targets)
+    assert sorted(loaded.installed[loaded.lookup["appf"]].dependencies) == ["libd", "libe"]
+    assert edges_by_name(loaded) == edges_by_name(dg)
+
+
+def test_stale_snapshot_is_rejected(cyclic_source_dir: Path, tmp_path: Path):
+    snapshot_path = DependencyGraph(cyclic_source_dir).to_snapshot(tmp_path / "graph.dgsnap")
+    write_package_json(cyclic_source_dir, "libe", "3.0.1")
+    with DependencyGraphSnapshot(snapshot_path) as snapshot:
+        assert not snapshot.is_valid_for(cyclic_source_dir)
+    with pytest.raises(ValueError):
+        DependencyGraph.from_snapshot(cyclic_source_dir, snapshot_path, rebuild_if_stale=False)
+
+
+def test_stale_snapshot_is_rebuilt_and_rewritten(cyclic_source_dir: Path, tmp_path: Path):
+    snapshot_path = DependencyGraph(cyclic_source_dir).to_snapshot(tmp_path / "graph.dgsnap")
+    write_package_json(cyclic_source_dir, "libe", "3.0.1")
+    dg = DependencyGraph.from_snapshot(cyclic_source_dir, snapshot_path)
+    assert dg.installed[dg.lookup["libe"]].version == "3.0.1"
+    reloaded = DependencyGraph.from_snapshot(cyclic_source_dir, snapshot_path, rebuild_if_stale=False)
+    assert reloaded.installed[reloaded.lookup["libe"]].version == "3.0.1"
+
+
+def test_removed_json_file_makes_snapshot_stale(cyclic_source_dir: Path, tmp_path: Path):
+    snapshot_path = DependencyGraph(cyclic_source_dir).to_snapshot(tmp_path / "graph.dgsnap")
+    os.remove(cyclic_source_dir / "appf.json")
+    with pytest.raises(ValueError):
+        DependencyGraph.from_snapshot(cyclic_source_dir, snapshot_path, rebuild_if_stale=False)
+
+
+def _corrupt_truncated(data: bytes) -> bytes:
+    return data[:_HEADER.size + 4]
+
+
+def _corrupt_misaligned_section(data: bytes) -> bytes:
+    bad = bytearray(data)
+    for section_id in range(_HEADER.unpack_from(bad, 0)[3]):
+        toc_offset = _HEADER.size + section_id * _TOC_ENTRY.size
+        offset, nbytes = _TOC_ENTRY.unpack_from(bad, toc_offset)
+        if nbytes > 1:
+            _TOC_ENTRY.pack_into(bad, toc_offset, offset, nbytes - 1)
+            return bytes(bad)
+    raise AssertionError("No section to corrupt.")
+
+
+def _corrupt_magic(data: bytes) -> bytes:
+    return b"NOTASNAP" + data[8:]
+
+
+@pytest.mark.parametrize("corrupt", [_corrupt_truncated, _corrupt_misaligned_section, _corrupt_magic])
+def test_corrupt_snapshot_is_rebuilt(cyclic_source_dir: Path, tmp_path: Path, corrupt):
+    expected = DependencyGraph(cyclic_source_dir)
+    snapshot_path = expected.to_snapshot(tmp_path / "graph.dgsnap")
+    snapshot_path.write_bytes(corrupt(snapshot_path.read_bytes()))
+    with pytest.raises(ValueError):
+        DependencyGraph.from_snapshot(cyclic_source_dir, snapshot_path, rebuild_if_stale=False)
+    dg = DependencyGraph.from_snapshot(cyclic_source_dir, snapshot_path)
+    assert edges_by_name(dg) == edges_by_name(expected)
+    DependencyGraph.from_snapshot(cyclic_source_dir, snapshot_path, rebuild_if_stale=False)
@@ -0,0 +1,60 @@
+from collections.abc import Iterable
+from pathlib import Path
+
+from pipdep_proto_20240819._internals.dist_info_scanner import diff_installed_props, scan_installed_props
+
+
+def _write_dist_info(site_dir: Path, name: str, version: str, requires_dist: Iterable[str] = ()) -> None:
+    dist_info_dir = site_dir / f"{name.replace('-', '_')}-{version}.dist-info"
+    dist_info_dir.mkdir(parents=True)
+    lines = ["Metadata-Version: 2.1", f"Name: {name}", f"Version: {version}"]
+    lines += [f"Requires-Dist: {req}" for req in requires_dist]
+    (dist_info_dir / "METADATA").write_text("\n".join(lines) + "\n")
+
+
+def _by_name(prop_dicts: list[dict[str, str]]) -> dict[str, dict[str, str]]:
+    return {d["Name"]: d for d in prop_dicts}
+
+
+def test_scan_inverts_requires(tmp_path: Path):
+    site_dir = tmp_path / "site"
+    _write_dist_info(site_dir, "App-One", "1.0", [
+        "lib_two>=2",
+        "Lib-Two",
+        "libthree; extra == 'full'",
+        "libfour; python_version < '3'",
+    ])
+    _write_dist_info(site_dir, "lib_two", "2.1", ["libthree"])
+    _write_dist_info(site_dir, "libthree", "0.3")
+    props = _by_name(scan_installed_props([site_dir]))
+    assert sorted(props) == ["App-One", "lib_two", "libthree"]
+    ### Extras and markers that do not apply are dropped, and duplicates are merged.
+    assert props["App-One"]["Requires"] == "lib_two"
+    assert props["lib_two"]["Required-by"] == "App-One"
+    assert props["libthree"]["Required-by"] == "lib_two"
+    assert props["libthree"]["Location"] == str(site_dir)
+
+
+def test_first_search_path_wins(tmp_path: Path):
+    _write_dist_info(tmp_path / "first", "libthree", "0.3")
+    _write_dist_info(tmp_path / "second", "LibThree", "0.1")
+    props = scan_installed_props([tmp_path / "missing", tmp_path / "first", tmp_path / "second"])
+    assert [(d["Name"], d["Version"]) for d in props] == [("libthree", "0.3")]
+
+
+def test_diff_reports_mismatches(tmp_path: Path):
+    site_dir = tmp_path / "site"
+    _write_dist_info(site_dir, "app-one", "1.0", ["lib-two"])
+    _write_dist_info(site_dir, "lib-two", "2.1")
+    scanned = scan_installed_props([site_dir])
+    pip_like = [
+        {"Name": "App_One", "Version": "1.0", "Requires": "Lib_Two", "Required-by": ""},
+        {"Name": "lib-two", "Version": "2.0", "Requires": "", "Required-by": "app-one"},
+        {"Name": "extra-pkg", "Version": "1.0", "Requires": "", "Required-by": ""},
+    ]
+    ### Names in Requires and Required-by are compared after canonicalization.
+    assert diff_installed_props(scanned, pip_like) == [
+        ("extra-pkg", "Name", None, "extra-pkg"),
+        ("lib-two", "Version", "2.1", "2.0"),
+    ]
+    assert diff_installed_props(scanned, scanned) == []
@@ -0,0 +1,91 @@
+from pathlib import Path
+import sys
+import time
+
+from pipdep_proto_20240819._internals.dry_run_cache import (
+    DryRunCache,
+    index_fingerprint,
+    make_dry_run_key,
+)
+from pipdep_proto_20240819._internals.pip_dry_run import DryRunRow
+
+
+def _rows(requirement: str, *names: str) -> list[DryRunRow]:
+    return [
+        DryRunRow(requirement, name, "1.0", requested=(pos == 0), url=f"file:///{name}-1.0.whl")
+        for pos, name in enumerate(names)
+    ]
+
+
+def test_hit_and_miss(tmp_path: Path):
+    with DryRunCache(tmp_path / "cache.sqlite") as cache:
+        key = make_dry_run_key("appa", None, "index:default", "24.0")
+        assert cache.get(key) is None
+        cache.put(key, "appa", _rows("appa", "appa", "libd"))
+        assert len(cache) == 1
+        assert cache.get(key) == _rows("appa", "appa", "libd")
+        ### Equivalent requirement strings share a key; rows get the caller's label.
+        assert cache.get(key, "appa ") == _rows("appa ", "appa", "libd")
+        assert cache.get(make_dry_run_key("appb", None, "index:default", "24.0")) is None
+    with DryRunCache(tmp_path / "cache.sqlite") as reopened:
+        assert reopened.get(key) == _rows("appa", "appa", "libd")
+
+
+def test_key_covers_every_input(monkeypatch):
+    base = make_dry_run_key("appa", None, "index:default", "24.0")
+    assert make_dry_run_key(" appa\n", None, "index:default", "24.0") == base
+    variants = [
+        make_dry_run_key("appa==2", None, "index:default", "24.0"),
+        make_dry_run_key("appa", "env-fingerprint", "index:default", "24.0"),
+        make_dry_run_key("appa", None, "find-links:0123", "24.0"),
+        make_dry_run_key("appa", None, "index:default", "24.1"),
+    ]
+    assert len(set(variants) | {base}) == 5
+    monkeypatch.setattr(sys, "version_info", (2, 7, 18, "final", 0))
+    assert make_dry_run_key("appa", None, "index:default", "24.0") != base
+
+
+def test_entries_expire_after_ttl(tmp_path: Path):
+    with DryRunCache(tmp_path / "cache.sqlite", ttl_secs=0.2) as cache:
+        cache.put("k1", "appa", _rows("appa", "appa"))
+        assert cache.get("k1") is not None
+        time.sleep(0.3)
+        ### A hit does not extend the TTL.
+        assert cache.get("k1") is None
+        assert len(cache) == 0
+        cache.put("k2", "appb", _rows("appb", "appb"))
+        time.sleep(0.3)
+        assert cache.evict() == 1
+        assert len(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path):
+    ### Room for exactly two entries.
+    rows = _rows("req", "pkg")
+    with DryRunCache(tmp_path / "probe.sqlite") as probe:
+        probe.put("probe", "req", rows)
+        entry_size = probe._conn.execute("SELECT size FROM dry_runs").fetchone()[0]
+    with DryRunCache(tmp_path / "cache.sqlite", max_bytes=2 * entry_size) as cache:
+        cache.put("k1", "req", rows)
+        time.sleep(0.01)
+        cache.put("k2", "req", rows)
+        time.sleep(0.01)
+        assert cache.get("k1") is not None
+        time.sleep(0.01)
+        cache.put("k3", "req", rows)
+        assert len(cache) == 2
+        assert cache.get("k2") is None
+        assert cache.get("k1") is not None
+        assert cache.get("k3") is not None
+
+
+def test_find_links_fingerprint_follows_the_listing(tmp_path: Path):
+    find_links = tmp_path / "wheels"
+    find_links.mkdir()
+    (find_links / "appa-1.0-py3-none-any.whl").write_bytes(b"a")
+    first = index_fingerprint(find_links)
+    assert first.startswith("find-links:")
+    assert index_fingerprint(find_links) == first
+    (find_links / "appa-1.1-py3-none-any.whl").write_bytes(b"b")
+    assert index_fingerprint(find_links) != first
+    assert index_fingerprint(index_url="https://example.invalid/simple") == "index:https://example.invalid/simple"
@@ -0,0 +1,84 @@
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+
+import pytest
+
+from pipdep_proto_20240819._internals.executor_funcs import (
+    multiprocess_map_async_then,
+    subprocess_run_with_outerr,
+    subprocess_run_with_outtext,
+)
+
+
+def test_map_reports_every_arg():
+    successes = dict[int, int]()
+    failures = dict[int, Exception]()
+
+    def square(x: int) -> int:
+        if x == 3:
+            raise ValueError("three")
+        return x * x
+
+    with ThreadPool(2) as pool:
+        multiprocess_map_async_then(
+            pool, square, range(10),
+            fn_success=successes.__setitem__,
+            fn_failure=failures.__setitem__,
+            fn_patience=lambda: True,
+            max_pending=3,
+        )
+    assert successes == {x: x * x for x in range(10) if x != 3}
+    assert list(failures) == [3] and isinstance(failures[3], ValueError)
+
+
+def test_map_returns_when_the_window_is_full_of_hung_calls():
+    ### Two calls hang and fill the whole window; once they are reported as
+    ### timed out, the remaining calls run on the pool's third worker.
+    release = threading.Event()
+    successes = list[str]()
+    failures = dict[str, Exception]()
+
+    def work(arg: str) -> str:
+        if arg.startswith("hang"):
+            release.wait(30.0)
+        return arg
+
+    start = time.monotonic()
+    with ThreadPool(3) as pool:
+        try:
+            multiprocess_map_async_then(
+                pool, work, ["hang1", "hang2", "a", "b"],
+                fn_success=lambda arg, result: successes.append(result),
+                fn_failure=failures.__setitem__,
+                fn_patience=lambda: True,
+                wait_time=0.05,
+                max_pending=2,
+                timeout_secs=0.3,
+            )
+        finally:
+            release.set()
+    assert time.monotonic() - start < 10.0
+    assert sorted(successes) == ["a", "b"]
+    assert sorted(failures) == ["hang1", "hang2"]
+    assert all(isinstance(exc, TimeoutError) for exc in failures.values())
+
+
+def test_subprocess_timeout_kills_the_command():
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        subprocess_run_with_outtext(["sh", "-c", "sleep 30"], timeout_secs=0.3)
+    assert time.monotonic() - start < 10.0
+
+
+def test_subprocess_output_and_check():
+    assert subprocess_run_with_outtext(["sh", "-c", "echo out; echo err >&2"]) == ["out", "err"]
+    assert subprocess_run_with_outtext(["sh", "-c", "echo out; echo err >&2"], merge_stderr=False) == ["out"]
+    with pytest.raises(Exception):
+        subprocess_run_with_outtext(["sh", "-c", "exit 2"])
+    assert subprocess_run_with_outtext(["sh", "-c", "echo partial; exit 2"], check=False) == ["partial"]
+
+
+def test_subprocess_outerr_keeps_the_streams_apart():
+    returncode, out_lines, err_lines = subprocess_run_with_outerr(["sh", "-c", "echo out; echo err >&2; exit 3"])
+    assert (returncode, out_lines, err_lines) == (3, ["out"], ["err"])
@@ -0,0 +1,35 @@
+import pytest
+
+from pipdep_proto_20240819.gather import main as gather_main
+from pipdep_proto_20240819.gather.main import (
+    pip_get_installed_props_batch,
+    pip_show_installed_batch,
+    split_into_chunks,
+)
+
+
+def test_batch_matches_records_by_name():
+    ### pip itself is always installed; the stderr warning about the missing
+    ### name must not be parsed as a record.
+    records = pip_show_installed_batch(["PIP", "no-such-package-xyz"], timeout_secs=60.0)
+    assert list(records) == ["PIP", "no-such-package-xyz"]
+    assert records["no-such-package-xyz"] is None
+    assert "Name: pip" in records["PIP"]
+    prop_dicts, missing = pip_get_installed_props_batch(["pip", "no-such-package-xyz"], None, timeout_secs=60.0)
+    assert [prop_dict["Name"] for prop_dict in prop_dicts] == ["pip"]
+    assert all("WARNING" not in key for key in prop_dicts[0])
+    assert missing == ["no-such-package-xyz"]
+
+
+def test_batch_raises_when_pip_fails_outright(monkeypatch):
+    def failing_pip(pip_args, pip_pool=None, timeout_secs=None):
+        return 2, [], ["Traceback (most recent call last):", "ImportError: broken pip"]
+
+    monkeypatch.setattr(gather_main, "pip_run_with_outerr", failing_pip)
+    with pytest.raises(Exception, match="(?s)code 2.*broken pip"):
+        pip_show_installed_batch(["appa", "appb"])
+
+
+def test_split_into_chunks():
+    assert split_into_chunks("abcde", 2) == [["a", "b"], ["c", "d"], ["e"]]
+    assert split_into_chunks([], 3) == []
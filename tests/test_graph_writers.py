@@ -0,0 +1,96 @@
+import io
+import json
+from pathlib import Path
+import re
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.dependency_graph_exporter import DependencyGraphExporter
+from pipdep_proto_20240819._internals.graph_writers import write_dot
+from pipdep_proto_20240819._internals.package_set import IndexedPackageSet
+
+from conftest import edges_by_name
+
+GRAPHML_NS = {"g": "http://graphml.graphdrawing.org/xmlns"}
+
+
+def _exporter(dg: DependencyGraph, reduce_edges: bool = False) -> DependencyGraphExporter:
+    included = IndexedPackageSet.from_range(dg, 0, len(dg.installed))
+    return DependencyGraphExporter(dg, included, reduce_edges=reduce_edges)
+
+
+def _names_of(dg: DependencyGraph, edges: set[tuple[int, int]]) -> set[tuple[str, str]]:
+    return {(dg.installed[idx].name, dg.installed[dep_idx].name) for idx, dep_idx in edges}
+
+
+def _read_dot(text: str) -> tuple[dict[int, str], set[tuple[int, int]]]:
+    labels = {int(m[1]): m[2] for m in re.finditer(r'^\t(\d+) \[label="(.*)"\]$', text, re.MULTILINE)}
+    edges = {(int(m[1]), int(m[2])) for m in re.finditer(r"^\t(\d+) -> (\d+)$", text, re.MULTILINE)}
+    return labels, edges
+
+
+def _read_json(text: str) -> tuple[dict[int, str], set[tuple[int, int]]]:
+    doc = json.loads(text)
+    assert doc["directed"] is True
+    labels = {node["id"]: node["name"] for node in doc["nodes"]}
+    edges = {(link["source"], link["target"]) for link in doc["links"]}
+    return labels, edges
+
+
+def _read_graphml(text: str) -> tuple[dict[int, str], set[tuple[int, int]]]:
+    graph = ET.fromstring(text).find("g:graph", GRAPHML_NS)
+    labels = {
+        int(node.get("id")[1:]): node.find("g:data[@key='name']", GRAPHML_NS).text
+        for node in graph.findall("g:node", GRAPHML_NS)
+    }
+    edges = {
+        (int(edge.get("source")[1:]), int(edge.get("target")[1:]))
+        for edge in graph.findall("g:edge", GRAPHML_NS)
+    }
+    return labels, edges
+
+
+@pytest.mark.parametrize("format, fn_read", [
+    ("dot", _read_dot),
+    ("json", _read_json),
+    ("graphml", _read_graphml),
+])
+def test_writers_round_trip(cyclic_source_dir: Path, tmp_path: Path, format: str, fn_read):
+    dg = DependencyGraph(cyclic_source_dir)
+    path = tmp_path / f"graph.{format}"
+    _exporter(dg).write(path, format)
+    labels, edges = fn_read(path.read_text(encoding="utf-8"))
+    assert len(labels) == len(dg.installed)
+    assert all(dg.installed[idx].name in label for idx, label in labels.items())
+    assert _names_of(dg, edges) == edges_by_name(dg)
+
+
+def test_write_to_a_text_stream_with_reduced_edges(cyclic_source_dir: Path):
+    ### appa and appb sit on the cycle appa -> appb -> appc -> appa, so only
+    ### one of their edges to libd is kept; libd -> libe makes appf -> libe
+    ### redundant.
+    dg = DependencyGraph(cyclic_source_dir)
+    exporter = _exporter(dg, reduce_edges=True)
+    stream = io.StringIO()
+    exporter.write(stream, "json")
+    _, edges = _read_json(stream.getvalue())
+    assert len(edges) == exporter.edge_count == 6
+    assert exporter.dropped_edge_count == 2
+    kept = _names_of(dg, edges)
+    assert kept <= edges_by_name(dg)
+    assert ("appf", "libe") not in kept
+    assert len(kept & {("appa", "libd"), ("appb", "libd")}) == 1
+
+
+def test_dot_quotes_and_graph_name():
+    stream = io.StringIO()
+    write_dot(stream, [], [], graph_name='say "hi"')
+    assert stream.getvalue() == 'digraph "say \\"hi\\"" {\n}\n'
+
+
+def test_unsupported_format(cyclic_source_dir: Path, tmp_path: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    with pytest.raises(ValueError, match="Unsupported graph format"):
+        _exporter(dg).write(tmp_path / "graph.gexf", "gexf")
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pytest
+
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.package_set import IndexedPackageSet, PackageSet
+from pipdep_proto_20240819._internals.reachability_index import bits_from_indices
+
+
+def _names(pkset: IndexedPackageSet) -> list[str]:
+    return sorted(pkinfo.name for pkinfo in pkset)
+
+
+def test_bits_from_indices():
+    assert bits_from_indices([], 0) == 0
+    assert bits_from_indices([0, 3, 3, 5], 8) == 0b101001
+
+
+def test_from_indices(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    pkset = IndexedPackageSet.from_indices(dg, [dg.lookup["libe"], dg.lookup["appa"], dg.lookup["libe"]])
+    assert _names(pkset) == ["appa", "libe"]
+    assert pkset.bits == (1 << dg.lookup["appa"]) | (1 << dg.lookup["libe"])
+    assert len(IndexedPackageSet.from_indices(dg, [])) == 0
+    with pytest.raises(ValueError, match="Invalid items"):
+        IndexedPackageSet.from_indices(dg, [0, len(dg.installed)])
+    with pytest.raises(ValueError, match="Invalid items"):
+        IndexedPackageSet.from_indices(dg, [-1])
+
+
+def test_operators_on_either_side(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    apps = IndexedPackageSet(dg, ["appa", "appb", "appc"])
+    plain = PackageSet()
+    plain.add_resolved(dg, ["appa", "libd"])
+    idxs = {dg.lookup["appa"], dg.lookup["libd"]}
+    for other in (plain, idxs, frozenset(idxs)):
+        assert _names(apps | other) == _names(other | apps) == ["appa", "appb", "appc", "libd"]
+        assert _names(apps & other) == _names(other & apps) == ["appa"]
+        assert _names(apps ^ other) == _names(other ^ apps) == ["appb", "appc", "libd"]
+        assert _names(apps - other) == ["appb", "appc"]
+        assert _names(other - apps) == ["libd"]
+        assert isinstance(other | apps, IndexedPackageSet)
+    with pytest.raises(ValueError, match="Invalid items"):
+        apps | {len(dg.installed)}
+    with pytest.raises(TypeError):
+        apps | ["appa"]
@@ -0,0 +1,177 @@
+import base64
+import errno
+import hashlib
+import os
+from pathlib import Path
+import zipfile
+
+from pipdep_proto_20240819._internals import pip_dry_run
+from pipdep_proto_20240819._internals.dry_run_cache import DryRunCache
+from pipdep_proto_20240819._internals.pip_dry_run import (
+    SEEDED_MARKER_NAME,
+    CacheDirSlots,
+    DryRunRow,
+    format_dry_run_table,
+    run_pip_dry_runs,
+    seed_cache_dir,
+)
+
+
+def _record_line(arcname: str, data: bytes) -> str:
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode("ascii")
+    return f"{arcname},sha256={digest},{len(data)}"
+
+
+def build_wheel(find_links: Path, name: str, version: str, requires: list[str] = ()) -> Path:
+    """Writes a minimal pure-Python wheel, without any build tools."""
+    dist_info = f"{name}-{version}.dist-info"
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    metadata += "".join(f"Requires-Dist: {req}\n" for req in requires)
+    files = {
+        f"{name}/__init__.py": b"",
+        f"{dist_info}/METADATA": metadata.encode("utf-8"),
+        f"{dist_info}/WHEEL": b"Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    record = [_record_line(arcname, data) for arcname, data in files.items()]
+    record.append(f"{dist_info}/RECORD,,")
+    files[f"{dist_info}/RECORD"] = ("\n".join(record) + "\n").encode("utf-8")
+    wheel_path = find_links / f"{name}-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(wheel_path, "w") as zf:
+        for arcname, data in files.items():
+            zf.writestr(arcname, data)
+    return wheel_path
+
+
+def _make_base_cache(tmp_path: Path) -> Path:
+    base = tmp_path / "base_cache"
+    (base / "http" / "a").mkdir(parents=True)
+    (base / "http" / "a" / "entry").write_bytes(b"cached")
+    return base
+
+
+def test_seed_cache_dir_hardlinks_once(tmp_path: Path):
+    base = _make_base_cache(tmp_path)
+    slot = seed_cache_dir(base, tmp_path / "slot_0")
+    seeded = slot / "http" / "a" / "entry"
+    assert seeded.read_bytes() == b"cached"
+    assert os.stat(seeded).st_ino == os.stat(base / "http" / "a" / "entry").st_ino
+    assert (slot / SEEDED_MARKER_NAME).is_file()
+    (base / "http" / "a" / "later").write_bytes(b"new")
+    seed_cache_dir(base, slot)
+    assert not (slot / "http" / "a" / "later").exists()
+
+
+def test_seeding_across_devices_is_not_marked_done(tmp_path: Path, monkeypatch):
+    base = _make_base_cache(tmp_path)
+
+    def cross_device_link(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(pip_dry_run.os, "link", cross_device_link)
+    slot = seed_cache_dir(base, tmp_path / "slot_0")
+    assert slot.is_dir()
+    assert not (slot / SEEDED_MARKER_NAME).exists()
+    assert not (slot / "http" / "a" / "entry").exists()
+    monkeypatch.undo()
+    seed_cache_dir(base, slot)
+    assert (slot / "http" / "a" / "entry").read_bytes() == b"cached"
+    assert (slot / SEEDED_MARKER_NAME).is_file()
+
+
+def test_cache_slots_are_reused(tmp_path: Path):
+    slots = CacheDirSlots(tmp_path / "caches", 2)
+    with slots.acquire() as first:
+        with slots.acquire() as second:
+            assert {first.name, second.name} == {"slot_0", "slot_1"}
+    with slots.acquire() as again:
+        assert again.name in ("slot_0", "slot_1")
+    assert sorted(path.name for path in (tmp_path / "caches").iterdir()) == ["slot_0", "slot_1"]
+
+
+def test_failure_reason_has_exit_code_and_stderr(tmp_path: Path):
+    find_links = tmp_path / "wheels"
+    find_links.mkdir()
+    rows, failures = run_pip_dry_runs(
+        ["no-such-package-xyz"],
+        tmp_path / "work",
+        pool_size=1,
+        find_links=find_links,
+        text_callback=lambda s: None,
+        sleep_secs=0.05,
+    )
+    assert rows == []
+    reason = failures["no-such-package-xyz"]
+    assert reason.startswith("FAILURE (exit code 1)")
+    assert "no-such-package-xyz" in reason.split("\n", 1)[1]
+
+
+def test_resolves_offline_against_find_links(tmp_path: Path):
+    find_links = tmp_path / "wheels"
+    find_links.mkdir()
+    build_wheel(find_links, "tinyapp", "1.0", ["tinylib>=2"])
+    build_wheel(find_links, "tinylib", "1.0")
+    build_wheel(find_links, "tinylib", "2.1")
+    build_wheel(find_links, "tinyother", "0.3")
+    work_dir = tmp_path / "work"
+    messages = list[str]()
+
+    with DryRunCache(tmp_path / "resolutions.sqlite") as cache:
+        rows, failures = run_pip_dry_runs(
+            ["tinyapp", "tinyother==0.3"],
+            work_dir,
+            pool_size=2,
+            find_links=find_links,
+            cache=cache,
+            text_callback=messages.append,
+            sleep_secs=0.05,
+        )
+        assert failures == {}
+        assert [(row.requirement, row.name, row.version, row.requested) for row in rows] == [
+            ("tinyapp", "tinyapp", "1.0", True),
+            ("tinyapp", "tinylib", "2.1", False),
+            ("tinyother==0.3", "tinyother", "0.3", True),
+        ]
+        assert all(row.url.startswith("file:") and row.url.endswith(".whl") for row in rows)
+        assert "[0] SUCCESS" in messages and "[1] SUCCESS" in messages
+        assert sorted(path.name for path in (work_dir / "caches").iterdir()) == ["slot_0", "slot_1"]
+        assert len(cache) == 2
+
+        ### The second run is answered from the cache, without running pip.
+        messages.clear()
+        cached_rows, failures = run_pip_dry_runs(
+            ["tinyapp", "tinyother==0.3"],
+            work_dir,
+            pool_size=2,
+            find_links=find_links,
+            cache=cache,
+            text_callback=messages.append,
+        )
+        assert failures == {}
+        assert cached_rows == rows
+        assert messages == []
+
+        ### A new wheel changes the find-links fingerprint, so pip runs again.
+        build_wheel(find_links, "tinylib", "2.2")
+        new_rows, _ = run_pip_dry_runs(
+            ["tinyapp"],
+            work_dir,
+            pool_size=1,
+            find_links=find_links,
+            cache=cache,
+            text_callback=messages.append,
+            sleep_secs=0.05,
+        )
+        assert [(row.name, row.version) for row in new_rows] == [("tinyapp", "1.0"), ("tinylib", "2.2")]
+        assert "[0] SUCCESS" in messages
+
+
+def test_format_dry_run_table():
+    rows = [
+        DryRunRow("tinyapp", "tinyapp", "1.0", True, None),
+        DryRunRow("tinyapp", "tinylib", "2.1", False, None),
+    ]
+    assert format_dry_run_table(rows) == [
+        "requirement  package  version  requested",
+        "tinyapp      tinyapp  1.0      yes",
+        "tinyapp      tinylib  2.1",
+    ]
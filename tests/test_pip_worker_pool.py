@@ -0,0 +1,46 @@
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+from pipdep_proto_20240819._internals._subprocs.pip_worker_pool import PipWorkerPool, PipWorkerTask
+from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+
+
+def test_workers_are_recycled_after_max_commands():
+    with PipWorkerPool(max_workers=1, max_commands_per_worker=2) as pool:
+        for _ in range(5):
+            assert pool.run_with_outtext(["--version"])[0].startswith("pip ")
+        ### Commands 1-2, 3-4 and 5 each ran on a fresh worker.
+        assert pool.workers_started == 3
+
+
+def test_failed_command_keeps_the_worker():
+    with PipWorkerPool(max_workers=1) as pool:
+        returncode, out_lines, err_lines = pool.run_with_outerr(["show", "no-such-package-pipdep"])
+        assert returncode == 1
+        assert out_lines == []
+        assert any("not found" in line for line in err_lines)
+        with pytest.raises(Exception, match="failed with code 1"):
+            pool.run_with_outtext(["show", "no-such-package-pipdep"])
+        assert pool.run_with_outtext(["show", "no-such-package-pipdep"], check=False) == err_lines
+        assert pool.workers_started == 1
+
+
+def test_closed_pool_rejects_commands():
+    pool = PipWorkerPool(max_workers=1)
+    pool.close()
+    with pytest.raises(Exception, match="closed"):
+        pool.run_with_outtext(["--version"])
+
+
+def test_tasks_share_the_warm_workers():
+    messages = list[str]()
+    with PipWorkerPool(max_workers=2, max_commands_per_worker=3) as pip_pool:
+        tasks = [PipWorkerTask(["--version"], pool=pip_pool) for _ in range(4)]
+        executor = TaskListExecutor(tasks, max_in_flight=2, text_callback=messages.append, sleep_secs=0.05)
+        with ThreadPool(2) as pool:
+            executor.run(pool)
+        ### Two at a time, so at least two workers; at most one is recycled.
+        assert 2 <= pip_pool.workers_started <= 3
+    assert [record.status for record in executor.records] == ["SUCCESS"] * 4
+    assert sum(1 for message in messages if " OUT pip " in message) == 4
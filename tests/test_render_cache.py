@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+
+from pipdep_proto_20240819._internals.render_cache import RenderCache, make_subgraph_key
+
+
+def _rendered(tmp_path: Path, name: str, size: int = 40) -> Path:
+    path = tmp_path / name
+    path.write_bytes(name.encode("ascii")[:1] * size)
+    return path
+
+
+def _age(path: Path, secs: int) -> None:
+    ### Fixed mtimes in the distant past, so that the LRU order does not
+    ### depend on the file system timestamp resolution.
+    os.utime(path, ns=(secs * 10**9, secs * 10**9))
+
+
+def test_subgraph_key_ignores_order():
+    key = make_subgraph_key([(0, "a", "1"), (1, "b", "2")], [(0, 1)], {"format": "png"})
+    assert key == make_subgraph_key([(1, "b", "2"), (0, "a", "1")], iter([(0, 1)]), {"format": "png"})
+    assert key != make_subgraph_key([(0, "a", "1"), (1, "b", "2")], [(0, 1)], {"format": "svg"})
+    assert key != make_subgraph_key([(0, "a", "1"), (1, "b", "3")], [(0, 1)], {"format": "png"})
+
+
+def test_get_to_copies_a_hit(tmp_path: Path):
+    cache = RenderCache(tmp_path / "cache")
+    assert cache.get("k", "png") is None
+    cache.put("k", "png", _rendered(tmp_path, "a"))
+    output_path = tmp_path / "out" / "graph.png"
+    assert cache.get_to("k", "png", output_path) == output_path
+    assert output_path.read_bytes() == b"a" * 40
+    assert cache.get_to("k", "svg", tmp_path / "out" / "graph.svg") is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path: Path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=100)
+    _age(cache.put("a", "png", _rendered(tmp_path, "a")), 1)
+    _age(cache.put("b", "png", _rendered(tmp_path, "b")), 2)
+    ### The hit makes "a" the most recent, so "b" goes when "c" overflows.
+    assert cache.get("a", "png") is not None
+    cache.put("c", "png", _rendered(tmp_path, "c"))
+    assert cache.get("b", "png") is None
+    assert cache.get("a", "png") is not None
+    assert cache.get("c", "png") is not None
+    assert sorted(path.name for path in cache.cache_dir.iterdir()) == ["a.png", "c.png"]
+
+
+def test_new_entry_is_kept_even_if_oversized(tmp_path: Path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=100)
+    _age(cache.put("a", "png", _rendered(tmp_path, "a")), 1)
+    cache.put("big", "png", _rendered(tmp_path, "big", size=150))
+    assert sorted(path.name for path in cache.cache_dir.iterdir()) == ["big.png"]
+    assert cache.evict(keep=cache.cache_dir / "big.png") == []
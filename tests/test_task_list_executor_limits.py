@@ -0,0 +1,153 @@
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+import threading
+import time
+
+import pytest
+
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask
+from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+
+
+def _run(tasks: list[ShellTask], max_in_flight: int = 1, **kwargs) -> tuple[TaskListExecutor, list[str]]:
+    messages = list[str]()
+    executor = TaskListExecutor(
+        tasks,
+        max_in_flight=max_in_flight,
+        text_callback=messages.append,
+        sleep_secs=0.05,
+        **kwargs,
+    )
+    with ThreadPool(max_in_flight) as pool:
+        executor.run(pool)
+    return executor, messages
+
+
+def _fail_once_task(marker_path: Path) -> ShellTask:
+    ### Fails on the first attempt, and succeeds once the marker file exists.
+    script = f'if [ -e "{marker_path}" ]; then echo ok; else touch "{marker_path}"; exit 1; fi'
+    return ShellTask(["sh", "-c", script])
+
+
+def test_retry_succeeds_on_second_attempt(tmp_path: Path):
+    executor, messages = _run(
+        [_fail_once_task(tmp_path / "marker")],
+        max_attempts=3,
+        retry_backoff_secs=0.0,
+    )
+    record = executor.records[0]
+    assert record.status == "SUCCESS"
+    assert record.attempts == 2
+    assert "[0] FAILURE, RETRY 2/3 in 0.0s" in messages
+    assert "[0] OUT ok" in messages
+    assert executor.run_report()["summary"]["retries"] == 1
+
+
+def test_retries_are_exhausted():
+    executor, messages = _run(
+        [ShellTask(["sh", "-c", "exit 1"]), ShellTask(["sh", "-c", "echo after"])],
+        prerequisites={1: [0]},
+        max_attempts=3,
+        retry_backoff_secs=0.01,
+    )
+    assert [record.status for record in executor.records] == ["FAILURE", "SKIPPED"]
+    assert executor.records[0].attempts == 3
+    assert messages.count("[0] FAILURE") == 1
+    assert "[0] FAILURE, RETRY 3/3 in 0.0s" in messages
+    summary = executor.run_report()["summary"]
+    assert summary["retries"] == 2
+    assert (summary["failed"], summary["skipped"]) == (1, 1)
+
+
+class _NoResetTask:
+    """Conforms to TaskProtocol, but cannot be reset for a retry."""
+    out_path = None
+    err_path = None
+
+    def set_fio_paths(self, out_path: Path, err_path: Path) -> None:
+        pass
+
+    def run(self) -> None:
+        pass
+
+    def has_exited(self) -> bool:
+        return True
+
+
+def test_retries_require_reset():
+    with pytest.raises(TypeError, match="reset"):
+        TaskListExecutor([_NoResetTask()], max_in_flight=1, max_attempts=2)
+    ### Without retries, reset() is not needed.
+    TaskListExecutor([_NoResetTask()], max_in_flight=1)
+
+
+def test_task_timeout_stops_the_process():
+    start = time.monotonic()
+    executor, messages = _run([ShellTask(["sleep", "30"], timeout_secs=0.3)])
+    assert time.monotonic() - start < 10.0
+    record = executor.records[0]
+    assert record.status == "FAILURE"
+    assert record.stats.stop_reason == "timeout"
+    assert "[0] FAILURE (timeout)" in messages
+
+
+def test_deadline_stops_running_and_cancels_queued_tasks():
+    start = time.monotonic()
+    executor, messages = _run(
+        [ShellTask(["sleep", "30"]), ShellTask(["sleep", "30"])],
+        deadline_secs=0.5,
+        max_attempts=2,
+    )
+    assert time.monotonic() - start < 10.0
+    running, queued = executor.records
+    assert running.status == "FAILURE"
+    assert running.stats.stop_reason == "timeout"
+    ### No retry after the deadline.
+    assert running.attempts == 1
+    assert queued.status == "CANCELLED"
+    assert queued.attempts == 0
+    assert "[1] CANCELLED (deadline reached)" in messages
+    summary = executor.run_report()["summary"]
+    assert (summary["failed"], summary["cancelled"], summary["retries"]) == (1, 1, 0)
+
+
+def test_cancel_from_another_thread():
+    executor = TaskListExecutor(
+        [ShellTask(["sleep", "30"]), ShellTask(["sleep", "30"])],
+        max_in_flight=1,
+        text_callback=lambda s: None,
+        sleep_secs=0.05,
+    )
+    timer = threading.Timer(0.5, executor.cancel)
+    start = time.monotonic()
+    timer.start()
+    try:
+        with ThreadPool(1) as pool:
+            executor.run(pool)
+    finally:
+        timer.cancel()
+    assert time.monotonic() - start < 10.0
+    running, queued = executor.records
+    assert running.status == "CANCELLED"
+    assert running.stats.stop_reason == "cancelled"
+    assert queued.status == "CANCELLED"
+    assert executor.run_report()["summary"]["cancelled"] == 2
+
+
+def test_cancel_from_the_text_callback():
+    def on_text(s: str) -> None:
+        if s == "[0] OUT started":
+            executor.cancel()
+
+    executor = TaskListExecutor(
+        [ShellTask(["sh", "-c", "echo started; exec sleep 30"])],
+        max_in_flight=1,
+        text_callback=on_text,
+        sleep_secs=0.05,
+    )
+    start = time.monotonic()
+    with ThreadPool(1) as pool:
+        executor.run(pool)
+    assert time.monotonic() - start < 10.0
+    assert executor.records[0].status == "CANCELLED"
+    assert executor.records[0].stats.stop_reason == "cancelled"
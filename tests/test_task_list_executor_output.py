@@ -0,0 +1,58 @@
+import gzip
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+from typing import Any
+
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask
+from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+
+
+def _run(tasks: list[ShellTask], max_in_flight: int = 2, **kwargs) -> list[tuple[str, Any]]:
+    ### Text messages and batches in one sequence, to check their relative order.
+    events = list[tuple[str, Any]]()
+    executor = TaskListExecutor(
+        tasks,
+        max_in_flight=max_in_flight,
+        text_callback=lambda s: events.append(("text", s)),
+        sleep_secs=0.05,
+        batch_callback=lambda batch: events.append(("batch", batch)),
+        **kwargs,
+    )
+    with ThreadPool(max_in_flight) as pool:
+        executor.run(pool)
+    return events
+
+
+def _count_task(label: str, count: int) -> ShellTask:
+    script = f'for i in $(seq 1 {count}); do echo {label} $i; echo {label} err $i >&2; done'
+    return ShellTask(["sh", "-c", script])
+
+
+def test_batches_carry_the_lines_and_text_only_statuses():
+    events = _run([_count_task("a", 50), _count_task("b", 50)])
+    texts = [payload for kind, payload in events if kind == "text"]
+    assert sorted(texts) == ["[0] SUCCESS", "[1] SUCCESS"]
+    batches = [payload for kind, payload in events if kind == "batch"]
+    assert all(len(batch) > 0 for batch in batches)
+    lines = [line for batch in batches for line in batch]
+    for idx, label in enumerate(("a", "b")):
+        assert [line for i, kind, line in lines if i == idx and kind == "OUT"] == [f"{label} {n}" for n in range(1, 51)]
+        assert [line for i, kind, line in lines if i == idx and kind == "ERR"] == [f"{label} err {n}" for n in range(1, 51)]
+
+
+def test_last_lines_come_before_the_status():
+    events = _run([_count_task("a", 20)], max_in_flight=1)
+    status_pos = events.index(("text", "[0] SUCCESS"))
+    assert all(pos < status_pos for pos, (kind, _) in enumerate(events) if kind == "batch")
+
+
+def test_spill_keeps_the_complete_output_when_lines_are_capped(tmp_path: Path):
+    spill_dir = tmp_path / "spill"
+    events = _run([_count_task("a", 200)], max_in_flight=1, max_lines_per_task=5, spill_dir=spill_dir)
+    delivered = [line for kind, batch in events if kind == "batch" for _, _, line in batch]
+    assert len(delivered) < 400
+    assert ("text", f"[0] DROPPED {400 - len(delivered)} lines") in events
+    out_text = gzip.decompress((spill_dir / "task_0.out.gz").read_bytes()).decode("utf-8")
+    err_text = gzip.decompress((spill_dir / "task_0.err.gz").read_bytes()).decode("utf-8")
+    assert out_text.splitlines() == [f"a {n}" for n in range(1, 201)]
+    assert err_text.splitlines() == [f"a err {n}" for n in range(1, 201)]
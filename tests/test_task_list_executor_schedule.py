@@ -0,0 +1,88 @@
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import pytest
+
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask
+from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+
+
+def _log_task(log_path: Path, label: str, exit_code: int = 0) -> ShellTask:
+    ### Appends its label to the shared log, so the start order can be checked.
+    return ShellTask(["sh", "-c", f'echo {label} >> "{log_path}"; exit {exit_code}'])
+
+
+def _run(tasks: list[ShellTask], max_in_flight: int = 1, **kwargs) -> tuple[TaskListExecutor, list[str]]:
+    messages = list[str]()
+    executor = TaskListExecutor(
+        tasks,
+        max_in_flight=max_in_flight,
+        text_callback=messages.append,
+        sleep_secs=0.05,
+        **kwargs,
+    )
+    with ThreadPool(max_in_flight) as pool:
+        executor.run(pool)
+    return executor, messages
+
+
+def _log(log_path: Path) -> list[str]:
+    return log_path.read_text().split()
+
+
+def test_prerequisites_run_first(tmp_path: Path):
+    log_path = tmp_path / "log"
+    tasks = [_log_task(log_path, label) for label in ("t0", "t1", "t2", "t3")]
+    ### t0 after t2, t2 after t1 and t3.
+    executor, _ = _run(tasks, max_in_flight=2, prerequisites={0: [2], 2: [1, 3]})
+    assert [record.status for record in executor.records] == ["SUCCESS"] * 4
+    order = _log(log_path)
+    assert sorted(order) == ["t0", "t1", "t2", "t3"]
+    assert order.index("t2") > max(order.index("t1"), order.index("t3"))
+    assert order[-1] == "t0"
+
+
+def test_longest_chain_starts_first(tmp_path: Path):
+    ### Task 2 heads the chain 2 -> 3 -> 4, so it starts first despite coming
+    ### later in the list; then task 3 (chain of 2) beats tasks 0 and 1, and
+    ### task 4 ties with them, so the list order decides.
+    log_path = tmp_path / "log"
+    tasks = [_log_task(log_path, f"t{idx}") for idx in range(5)]
+    _run(tasks, prerequisites={3: [2], 4: [3]})
+    assert _log(log_path) == ["t2", "t3", "t0", "t1", "t4"]
+
+
+def test_ties_keep_list_order(tmp_path: Path):
+    log_path = tmp_path / "log"
+    tasks = [_log_task(log_path, f"t{idx}") for idx in range(4)]
+    _run(tasks)
+    assert _log(log_path) == ["t0", "t1", "t2", "t3"]
+
+
+def test_dependents_of_a_failed_task_are_skipped(tmp_path: Path):
+    log_path = tmp_path / "log"
+    tasks = [
+        _log_task(log_path, "t0", exit_code=1),
+        _log_task(log_path, "t1"),
+        _log_task(log_path, "t2"),
+        _log_task(log_path, "t3"),
+    ]
+    ### t1 after t0, t2 after t1 (so transitively after t0); t3 is independent.
+    executor, messages = _run(tasks, prerequisites={1: [0], 2: [1]})
+    assert [record.status for record in executor.records] == ["FAILURE", "SKIPPED", "SKIPPED", "SUCCESS"]
+    assert sorted(_log(log_path)) == ["t0", "t3"]
+    assert "[1] SKIPPED (after [0] failed)" in messages
+    assert "[2] SKIPPED (after [0] failed)" in messages
+    assert executor.records[2].attempts == 0
+
+
+def test_cyclic_prerequisites_are_rejected():
+    tasks = [ShellTask(["true"]) for _ in range(3)]
+    with pytest.raises(ValueError, match="cycle"):
+        TaskListExecutor(tasks, max_in_flight=1, prerequisites={0: [2], 1: [0], 2: [1]})
+
+
+def test_invalid_prerequisite_index_is_rejected():
+    tasks = [ShellTask(["true"]) for _ in range(2)]
+    with pytest.raises(ValueError, match="Invalid prerequisite"):
+        TaskListExecutor(tasks, max_in_flight=1, prerequisites={1: [5]})
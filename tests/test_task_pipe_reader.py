@@ -0,0 +1,83 @@
+import gzip
+from pathlib import Path
+
+from pipdep_proto_20240819._internals._subprocs.task_pipe_reader import TaskPipeReader
+
+
+def _append(path: Path, data: bytes) -> None:
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def test_partial_lines_across_reads(tmp_path: Path):
+    reader = TaskPipeReader(tmp_path)
+    _append(reader._out_path, b"first\nsec")
+    reader.catch_up()
+    assert list(reader.readline_out()) == ["first"]
+    _append(reader._out_path, "ond é\r\nthi".encode("utf-8"))
+    _append(reader._err_path, b"oops\n")
+    reader.catch_up()
+    assert list(reader.readline_out()) == ["second é"]
+    assert list(reader.readline_err()) == ["oops"]
+    ### Nothing new: the unterminated tail stays pending until the task is closed.
+    reader.catch_up()
+    assert list(reader.readline_out()) == []
+    reader.mark_closed()
+    reader.catch_up()
+    assert list(reader.readline_out()) == ["thi"]
+    assert reader.get_exceptions() == []
+    reader.unlink()
+    assert not reader._out_path.exists()
+    assert not reader._err_path.exists()
+
+
+def test_keep_ends(tmp_path: Path):
+    reader = TaskPipeReader(tmp_path, keep_ends=True)
+    _append(reader._out_path, b"a\r\nb\n")
+    reader.catch_up()
+    assert list(reader.readline_out()) == ["a\r\n", "b\n"]
+    reader.unlink()
+
+
+def test_truncated_file_is_read_from_the_start(tmp_path: Path):
+    reader = TaskPipeReader(tmp_path)
+    _append(reader._out_path, b"attempt 1, line 1\nattempt 1, line 2\n")
+    reader.catch_up()
+    assert len(list(reader.readline_out())) == 2
+    reader._out_path.write_bytes(b"attempt 2\n")
+    reader.catch_up()
+    assert list(reader.readline_out()) == ["attempt 2"]
+    reader.unlink()
+
+
+def test_max_lines_keeps_newest_and_counts_dropped(tmp_path: Path):
+    reader = TaskPipeReader(tmp_path, max_lines=3)
+    _append(reader._out_path, b"".join(b"out %d\n" % i for i in range(5)))
+    _append(reader._err_path, b"err 0\nerr 1\n")
+    reader.catch_up()
+    assert list(reader.readline_out()) == ["out 2", "out 3", "out 4"]
+    assert list(reader.readline_err()) == ["err 0", "err 1"]
+    assert reader.dropped_line_count == 2
+    _append(reader._out_path, b"out 5\nout 6\n")
+    reader.catch_up()
+    assert list(reader.readline_out()) == ["out 5", "out 6"]
+    assert reader.dropped_line_count == 2
+    reader.unlink()
+
+
+def test_spill_files_hold_the_complete_output(tmp_path: Path):
+    spill_prefix = tmp_path / "spill" / "task_0"
+    reader = TaskPipeReader(tmp_path, max_lines=1, spill_prefix=spill_prefix)
+    _append(reader._out_path, b"one\ntwo\n")
+    reader.catch_up()
+    _append(reader._out_path, b"three")
+    _append(reader._err_path, b"warn\n")
+    reader.mark_closed()
+    reader.catch_up()
+    assert list(reader.readline_out()) == ["three"]
+    reader.close()
+    out_spill = spill_prefix.with_name("task_0.out.gz")
+    err_spill = spill_prefix.with_name("task_0.err.gz")
+    assert gzip.decompress(out_spill.read_bytes()) == b"one\ntwo\nthree"
+    assert gzip.decompress(err_spill.read_bytes()) == b"warn\n"
+    reader.unlink()
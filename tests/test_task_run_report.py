@@ -0,0 +1,85 @@
+import csv
+import json
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+from pipdep_proto_20240819._internals._subprocs.shell_task import ShellTask
+from pipdep_proto_20240819._internals._subprocs.task_list_executor import TaskListExecutor
+
+
+def _run(tasks: list[ShellTask], report_path: Path, **kwargs) -> tuple[TaskListExecutor, list[str]]:
+    messages = list[str]()
+    executor = TaskListExecutor(
+        tasks,
+        max_in_flight=2,
+        text_callback=messages.append,
+        sleep_secs=0.05,
+        report_path=report_path,
+        **kwargs,
+    )
+    with ThreadPool(2) as pool:
+        executor.run(pool)
+    return executor, messages
+
+
+def _tasks() -> list[ShellTask]:
+    return [
+        ShellTask(["sh", "-c", "echo hello"]),
+        ShellTask(["sh", "-c", "echo oops >&2; exit 3"]),
+        ShellTask(["sh", "-c", "echo never"]),
+    ]
+
+
+def test_json_report(tmp_path: Path):
+    report_path = tmp_path / "reports" / "run_report.json"
+    executor, messages = _run(_tasks(), report_path, prerequisites={2: [1]})
+    assert "[0] OUT hello" in messages
+    assert "[1] ERR oops" in messages
+    assert "[2] SKIPPED (after [1] failed)" in messages
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    summary = report["summary"]
+    assert summary["task_count"] == 3
+    assert summary["succeeded"] == 1
+    assert summary["failed"] == 1
+    assert summary["skipped"] == 1
+    assert summary["cancelled"] == 0
+    assert summary["retries"] == 0
+    assert summary["max_in_flight"] == 2
+    assert summary["peak_in_flight"] == 2
+    assert summary["total_out_bytes"] == len(b"hello\n")
+    assert summary["total_err_bytes"] == len(b"oops\n")
+    assert summary["dropped_lines"] == 0
+    assert summary["wall_secs"] > 0.0
+    assert 0.0 < summary["mean_slot_occupancy"] <= 1.0
+    assert summary["max_queue_wait_secs"] >= summary["mean_queue_wait_secs"] >= 0.0
+    assert summary == executor.run_report()["summary"]
+
+    rows = report["tasks"]
+    assert [row["idx"] for row in rows] == [0, 1, 2]
+    assert [row["status"] for row in rows] == ["SUCCESS", "FAILURE", "SKIPPED"]
+    assert [row["attempts"] for row in rows] == [1, 1, 0]
+    assert rows[0]["args"] == "sh -c echo hello"
+    assert rows[1]["out_bytes"] == 0 and rows[1]["err_bytes"] == 5
+    assert rows[0]["finished_at"] >= rows[0]["started_at"] >= rows[0]["submitted_at"]
+    assert rows[2]["submitted_at"] is None and rows[2]["slot_secs"] is None
+
+
+def test_csv_report(tmp_path: Path):
+    report_path = tmp_path / "run_report.csv"
+    _run(_tasks(), report_path)
+    with report_path.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["status"] for row in rows] == ["SUCCESS", "FAILURE", "SUCCESS"]
+    assert [row["out_bytes"] for row in rows] == ["6", "0", "6"]
+    assert {"queue_wait_secs", "slot_secs", "max_rss_kib", "stop_reason"} <= set(rows[0])
+
+
+def test_dropped_lines_are_counted(tmp_path: Path):
+    report_path = tmp_path / "run_report.json"
+    tasks = [ShellTask(["sh", "-c", "for i in 1 2 3 4 5 6; do echo $i; done"])]
+    _, messages = _run(tasks, report_path, max_lines_per_task=2)
+    summary = json.loads(report_path.read_text(encoding="utf-8"))["summary"]
+    out_lines = [message for message in messages if " OUT " in message]
+    assert summary["dropped_lines"] == 6 - len(out_lines)
+    assert out_lines[-2:] == ["[0] OUT 5", "[0] OUT 6"]
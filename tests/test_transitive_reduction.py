@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from pipdep_proto_20240819._internals.csr_adjacency import CsrAdjacency
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.dependency_graph_exporter import DependencyGraphExporter
+from pipdep_proto_20240819._internals.package_set import IndexedPackageSet
+from pipdep_proto_20240819._internals.reachability_index import ReachabilityIndex, transitive_reduction
+
+from conftest import edges_by_name
+
+
+def _edge_list(adj: CsrAdjacency) -> list[tuple[int, int]]:
+    return [(idx, dep_idx) for idx in range(adj.node_count) for dep_idx in adj.neighbors(idx)]
+
+
+def _closures(adj: CsrAdjacency) -> list[int]:
+    reach = ReachabilityIndex(adj)
+    return [reach.closure_bits(idx, include_self=False) for idx in range(adj.node_count)]
+
+
+def test_reduction_of_cyclic_fixture(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    assert len(edges_by_name(dg)) == 8
+    reduced = transitive_reduction(dg.forward_adjacency)
+    names = {
+        (dg.installed[idx].name, dg.installed[dep_idx].name)
+        for idx, dep_idx in _edge_list(reduced)
+    }
+    assert len(names) == 6
+    ### The cycle is kept whole; only one of the two edges into libd is kept.
+    assert {("appa", "appb"), ("appb", "appc"), ("appc", "appa")} <= names
+    assert ("libd", "libe") in names
+    assert ("appf", "libd") in names
+    assert ("appf", "libe") not in names
+    assert len(names & {("appa", "libd"), ("appb", "libd")}) == 1
+    assert _closures(reduced) == _closures(dg.forward_adjacency)
+
+
+def test_reduction_of_dag():
+    ### 0 -> 1 -> 2 -> 3, plus the shortcuts 0 -> 2, 0 -> 3 and 1 -> 3.
+    adj = CsrAdjacency.from_lists([[1, 2, 3], [2, 3], [3], []])
+    reduced = transitive_reduction(adj)
+    assert _edge_list(reduced) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_exporter_reduce_edges(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+    included = IndexedPackageSet.from_range(dg, 0, len(dg.installed))
+    assert DependencyGraphExporter(dg, included).edge_count == 8
+    exporter = DependencyGraphExporter(dg, included, reduce_edges=True)
+    assert exporter.edge_count == 6
+    assert exporter.dropped_edge_count == 2
+
+
+def test_exporter_reduces_within_the_exported_subgraph(cyclic_source_dir: Path):
+    ### With libd excluded, appf -> libe is no longer implied by another exported path.
+    dg = DependencyGraph(cyclic_source_dir)
+    included = IndexedPackageSet.from_indices(dg, [dg.lookup["appf"]])
+    excluded = IndexedPackageSet.from_indices(dg, [dg.lookup["libd"]])
+    exporter = DependencyGraphExporter(dg, included, excluded, reduce_edges=True)
+    assert exporter.edge_count == 1
+    assert exporter.dropped_edge_count == 0
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from pipdep_proto_20240819._internals.dependency_graph import DependencyGraph
+from pipdep_proto_20240819._internals.trigram_index import TrigramIndex, make_trigrams
+
+
+def _index() -> TrigramIndex:
+    return TrigramIndex([
+        ("requests", 0),
+        ("requests_oauthlib", 1),
+        ("request", 2),
+        ("urllib3", 3),
+        ("rqeusts", 4),
+        ("requests", 0),
+    ])
+
+
+def test_make_trigrams_pads_both_ends():
+    assert make_trigrams("abcd") == {"$ab", "abc", "bcd", "cd$"}
+
+
+def test_substring_matches_rank_first():
+    values = [value for value, _ in _index().search("requests")]
+    ### Both names containing "requests" come first, the exact one leading;
+    ### then "request" on similarity alone, with "rqeusts" below the threshold.
+    assert values == [0, 1, 2]
+
+
+def test_min_similarity_threshold():
+    index = _index()
+    assert index.search("requsts", min_similarity=0.3) == [(0, 0.5)]
+    assert [value for value, _ in index.search("requsts", min_similarity=0.2)] == [0, 2, 4, 1]
+    assert index.search("requsts", min_similarity=0.6) == []
+    ### Substring matches are kept whatever their similarity.
+    assert [value for value, _ in index.search("oauth", min_similarity=0.9)] == [1]
+
+
+def test_search_limit_and_aliases():
+    index = TrigramIndex([("pyyaml", 7), ("yaml", 7), ("yamllint", 8)])
+    assert [value for value, _ in index.search("yaml")] == [7, 8]
+    assert index.search("yaml")[0] == (7, pytest.approx(1.0))
+    assert [value for value, _ in index.search("yaml", limit=1)] == [7]
+
+
+def test_search_alike_on_graph(cyclic_source_dir: Path):
+    dg = DependencyGraph(cyclic_source_dir)
+
+    def names(pattern: str, **kwargs) -> list[str]:
+        return [pkinfo.name for pkinfo in dg.search_alike(pattern, **kwargs)]
+
+    assert names("app") == ["appa", "appb", "appf", "appc"]
+    assert names("app", limit=2) == ["appa", "appb"]
+    assert names("APP-B") == ["appb"]
+    assert names("lib_e") == ["libe"]
+    assert names("libx") == ["libd", "libe"]
+    assert names("libx", min_similarity=0.4) == []
+    assert names("zzz", min_similarity=0.0) == []